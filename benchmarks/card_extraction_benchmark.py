@@ -0,0 +1,174 @@
+'''
+Author: Be1k0
+URL: https://github.com/Be1k0/YuQue-BdT
+'''
+
+# 文档卡片提取微基准
+#
+# 对比原先基于 HTMLParser 的整篇解析与 str.find 跳转扫描 (scan_card_tags/extract_cards) 的耗时，
+# 分别统计 “只建立索引” 与 “按锚点查找少量卡片” 两种情况，并校验两者提取结果一致。
+# 未指定 --input 时按模拟语雀服务的格式生成文档正文；--input 可传入保存下来的 /api/docs 响应 (JSON) 或正文 (HTML)
+#
+# 用法:
+#     python benchmarks/card_extraction_benchmark.py
+#     python benchmarks/card_extraction_benchmark.py --paragraphs 2000 --cards 50 --lookups 2 --runs 20
+#     python benchmarks/card_extraction_benchmark.py --input doc1.json --input doc2.html
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import urllib.parse
+from html.parser import HTMLParser
+from typing import Any, Callable, Dict, List
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from src.libs.markdown_asset_localizer import extract_cards, parse_card_payload, scan_card_tags
+
+
+class LegacyCardHTMLParser(HTMLParser):
+    """原先的实现：解析整篇文档，只收集 <card> 标签的属性"""
+
+    def __init__(self):
+        super().__init__()
+        self.cards: List[Dict[str, str]] = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag.lower() == "card":
+            self.cards.append({key: value or "" for key, value in attrs})
+
+
+def legacy_extract_cards(content: str) -> Dict[str, Dict[str, Any]]:
+    """原先的实现：解析全部卡片并立即解码所有载荷"""
+    parser = LegacyCardHTMLParser()
+    parser.feed(content)
+    result = {}
+    for attrs in parser.cards:
+        payload = parse_card_payload(attrs.get("value", ""))
+        card_id = str(payload.get("id") or attrs.get("id") or "")
+        if card_id:
+            result[card_id] = payload
+    return result
+
+
+def synthesize_body(paragraphs: int, cards: int, seed: int) -> str:
+    """按模拟语雀服务的格式生成文档正文：大量段落中穿插视频卡片与其他类型卡片"""
+    parts = []
+    every = max(1, paragraphs // max(1, cards))
+    card_index = 0
+    for i in range(paragraphs):
+        parts.append(
+            f'<p data-lake-id="p{seed}-{i}"><span>第 {i} 段正文，包含 <strong>加粗</strong>、'
+            f'<a href="https://example.com/{i}">链接</a> 与 &amp; 转义字符。</span></p>'
+        )
+        if card_index < cards and i % every == 0:
+            name = "video" if card_index % 3 else "board"
+            payload = {"id": f"c{seed}-{card_index}", "videoId": f"doc{seed}-v{card_index}", "name": f"video-{card_index}.mp4"}
+            if name == "board":
+                payload["diagramData"] = {"body": [{"type": "mindmap", "html": "x" * 2048}]}
+            value = urllib.parse.quote(json.dumps(payload))
+            parts.append(f'<card type="inline" name="{name}" value="data:{value}"></card>')
+            card_index += 1
+    return "<!doctype lake>" + "".join(parts)
+
+
+def load_input(path: str) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    if path.endswith(".json"):
+        data = json.loads(text)
+        return (data.get("data") or {}).get("content", "") if isinstance(data, dict) else ""
+    return text
+
+
+def measure(func: Callable[[], Any], runs: int) -> Dict[str, float]:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {"median_ms": round(statistics.median(timings), 3), "min_ms": round(min(timings), 3)}
+
+
+def verify(bodies: List[str]) -> int:
+    """校验新旧实现提取的卡片 ID 与载荷一致，返回卡片总数"""
+    total = 0
+    for body in bodies:
+        expected = legacy_extract_cards(body)
+        legacy_tags = LegacyCardHTMLParser()
+        legacy_tags.feed(body)
+        if scan_card_tags(body) != legacy_tags.cards:
+            raise AssertionError("卡片属性与 HTMLParser 解析结果不一致")
+        cards = extract_cards(body)
+        for card_id, payload in expected.items():
+            card = cards.get(card_id)
+            if card is None or card.payload != payload:
+                raise AssertionError(f"卡片 {card_id} 提取结果不一致")
+        total += len(expected)
+    return total
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="文档卡片提取微基准")
+    parser.add_argument("--input", action="append", default=[], help="/api/docs 响应 (JSON) 或正文 (HTML) 文件，可多次指定")
+    parser.add_argument("--docs", type=int, default=20, help="生成的文档数 (未指定 --input 时)")
+    parser.add_argument("--paragraphs", type=int, default=500, help="每篇生成文档的段落数")
+    parser.add_argument("--cards", type=int, default=20, help="每篇生成文档的卡片数")
+    parser.add_argument("--lookups", type=int, default=1, help="每篇文档按锚点查找的卡片数")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--output", help="将结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    if args.input:
+        bodies = [load_input(path) for path in args.input]
+    else:
+        bodies = [synthesize_body(args.paragraphs, args.cards, seed) for seed in range(args.docs)]
+    card_count = verify(bodies)
+
+    # 每篇文档只查找前几个卡片 ID，对应导出时 Markdown 中实际引用的锚点
+    anchors = []
+    for body in bodies:
+        ids = [card.card_id for card in extract_cards(body).cards if card.card_id]
+        anchors.append(ids[:args.lookups])
+
+    def legacy_run():
+        for body in bodies:
+            legacy_extract_cards(body)
+
+    def scan_only():
+        for body in bodies:
+            extract_cards(body)
+
+    def scan_and_lookup():
+        for body, ids in zip(bodies, anchors):
+            cards = extract_cards(body)
+            for card_id in ids:
+                cards.get(card_id).payload
+
+    result = {
+        "docs": len(bodies),
+        "cards": card_count,
+        "total_bytes": sum(len(body.encode("utf-8")) for body in bodies),
+        "legacy_html_parser": measure(legacy_run, args.runs),
+        "scan_index": measure(scan_only, args.runs),
+        "scan_and_lookup": measure(scan_and_lookup, args.runs),
+    }
+    legacy = result["legacy_html_parser"]["median_ms"]
+    for key in ("scan_index", "scan_and_lookup"):
+        median = result[key]["median_ms"]
+        result[key]["speedup"] = round(legacy / median, 1) if median else None
+
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
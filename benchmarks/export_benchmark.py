@@ -0,0 +1,302 @@
+'''
+Author: Be1k0
+URL: https://github.com/Be1k0/YuQue-BdT
+'''
+
+# 端到端导出吞吐基准
+#
+# 在子进程中启动本地模拟语雀服务 (benchmarks/mock_yuque_server.py)，将 GLOBAL_CONFIG 指向该服务与临时目录后，
+# 走真实的 YuqueClient + Scheduler 导出流程与 Markdown 资源离线化流程，统计 docs/sec、assets/sec、
+# 单篇文档耗时 p50/p99 以及进程峰值内存。每个场景在独立进程中运行，峰值内存互不影响
+#
+# 用法:
+#     python benchmarks/export_benchmark.py
+#     python benchmarks/export_benchmark.py --scenario large-book --docs 10000 --concurrency 20
+#     python benchmarks/export_benchmark.py --scenario image-heavy --latency-ms 30 --error-rate 0.01
+#     python benchmarks/export_benchmark.py --scenario binary-export --rate-limit 50 --output result.json
+
+import argparse
+import asyncio
+import contextlib
+import json
+import math
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+for _path in (ROOT_DIR, BENCH_DIR):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+# 预置场景，命令行参数会覆盖其中的同名项
+SCENARIOS: Dict[str, Dict[str, Any]] = {
+    "large-book": {"books": 1, "docs": 10000, "images_per_doc": 0, "cards_per_doc": 0, "doc_format": "md", "download_assets": False},
+    "image-heavy": {"books": 1, "docs": 200, "images_per_doc": 20, "cards_per_doc": 1, "doc_format": "md", "download_assets": True},
+    "binary-export": {"books": 1, "docs": 100, "images_per_doc": 0, "cards_per_doc": 0, "doc_format": "word", "download_assets": False},
+}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """按最近秩法计算百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def peak_rss_mb() -> float:
+    """当前进程的峰值常驻内存 (MB)"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 下单位为 KB，macOS 下为字节
+        return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    except ImportError:
+        import psutil
+        info = psutil.Process().memory_info()
+        return round(getattr(info, "peak_wset", info.rss) / (1024 * 1024), 1)
+
+
+def _serve(config: Any, ready: Any, stop: Any, result: Any) -> None:
+    """模拟服务子进程入口"""
+    from mock_yuque_server import MockYuqueServer
+
+    async def runner():
+        server = MockYuqueServer(config)
+        ready.put(await server.start())
+        await asyncio.to_thread(stop.wait)
+        result.put(server.stats.to_dict())
+        await server.stop()
+
+    asyncio.run(runner())
+
+
+@contextlib.contextmanager
+def mock_server_process(config: Any):
+    """在独立进程中运行模拟服务，避免服务端开销挤占被测事件循环"""
+    ctx = multiprocessing.get_context("spawn")
+    ready, result, stop = ctx.Queue(), ctx.Queue(), ctx.Event()
+    process = ctx.Process(target=_serve, args=(config, ready, stop, result), daemon=True)
+    process.start()
+    stats: Dict[str, Any] = {}
+    try:
+        yield ready.get(timeout=30), stats
+    finally:
+        stop.set()
+        try:
+            stats.update(result.get(timeout=10))
+        except Exception:
+            pass
+        process.join(timeout=10)
+        if process.is_alive():
+            process.terminate()
+
+
+def _configure(base_url: str, work_dir: str) -> None:
+    """将全局配置指向模拟服务与临时目录"""
+    from src.libs.constants import GLOBAL_CONFIG
+    from src.libs.tools import save_cookies
+
+    meta_dir = os.path.join(work_dir, ".meta")
+    os.makedirs(meta_dir, exist_ok=True)
+    GLOBAL_CONFIG.yuque_host = base_url
+    GLOBAL_CONFIG.yuque_referer = f"{base_url}/login"
+    GLOBAL_CONFIG.meta_dir = meta_dir
+    GLOBAL_CONFIG.cookies_file = os.path.join(meta_dir, "cookies.json")
+    GLOBAL_CONFIG.user_info_file = os.path.join(meta_dir, "user_info.json")
+    GLOBAL_CONFIG.books_info_file = os.path.join(meta_dir, "books_info.json")
+    GLOBAL_CONFIG.markdown_endpoint_file = os.path.join(meta_dir, "markdown_endpoints.json")
+    GLOBAL_CONFIG.target_output_dir = os.path.join(work_dir, "docs")
+    GLOBAL_CONFIG.export_poll_interval_ms = 100
+    save_cookies("_yuque_session=bench; yuque_ctoken=bench")
+
+
+async def _run_export(params: Dict[str, Any], base_url: str) -> Dict[str, Any]:
+    """执行一次导出与资源离线化并采集耗时"""
+    from src.core.scheduler import Scheduler
+    from src.core.yuque import YuqueClient
+    from src.libs.constants import MutualAnswer
+    from src.libs.markdown_asset_localizer import MarkdownAssetLocalizer
+    from src.libs.tools import get_cache_books_info, get_local_cookies, resolve_book_namespace
+
+    doc_latencies: List[float] = []
+
+    class TimedScheduler(Scheduler):
+        """记录每篇文档导出耗时的调度器"""
+
+        async def _download_doc(self, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await super()._download_doc(*args, **kwargs)
+            finally:
+                doc_latencies.append((time.perf_counter() - started) * 1000)
+
+    result: Dict[str, Any] = {}
+    async with YuqueClient() as client:
+        started = time.perf_counter()
+        await client.get_user_bookstacks()
+        toc_range = [resolve_book_namespace(b) for b in get_cache_books_info() or []]
+        result["book_list_seconds"] = round(time.perf_counter() - started, 3)
+
+        scheduler = TimedScheduler(client)
+        scheduler.concurrency = params["concurrency"]
+        answer = MutualAnswer(toc_range=toc_range, skip=False, line_break=True, doc_format=params["doc_format"])
+
+        started = time.perf_counter()
+        await scheduler.start_download_task(answer)
+        export_seconds = time.perf_counter() - started
+
+    docs_done = answer.downloaded_count.get()
+    result.update({
+        "docs": docs_done,
+        "failed": answer.failed_count.get(),
+        "export_seconds": round(export_seconds, 3),
+        "docs_per_sec": round(docs_done / export_seconds, 2) if export_seconds else 0.0,
+        "doc_p50_ms": round(percentile(doc_latencies, 50), 2),
+        "doc_p99_ms": round(percentile(doc_latencies, 99), 2),
+    })
+
+    if params["download_assets"]:
+        cookie_string = get_local_cookies()
+        cdn_domain = base_url.split("://", 1)[-1]
+        file_latencies: List[float] = []
+        assets = failed = 0
+        started = time.perf_counter()
+        async with YuqueClient() as asset_client:
+            for md_file in [p for p in answer.downloaded_files if p.endswith(".md")]:
+                localizer = MarkdownAssetLocalizer(
+                    cookie_string=cookie_string,
+                    max_workers=params["asset_threads"],
+                    yuque_cdn_domain=cdn_domain,
+                    session=asset_client.session,
+                )
+                file_started = time.perf_counter()
+                stats = await localizer.process_single_file(
+                    md_file_path=md_file,
+                    current_doc_meta=answer.downloaded_markdown_meta.get(md_file),
+                    has_login_cookie=True,
+                )
+                file_latencies.append((time.perf_counter() - file_started) * 1000)
+                assets += stats.direct_count + stats.card_count
+                failed += stats.failed_count
+        asset_seconds = time.perf_counter() - started
+        result.update({
+            "assets": assets,
+            "assets_failed": failed,
+            "asset_seconds": round(asset_seconds, 3),
+            "assets_per_sec": round(assets / asset_seconds, 2) if asset_seconds else 0.0,
+            "asset_file_p50_ms": round(percentile(file_latencies, 50), 2),
+            "asset_file_p99_ms": round(percentile(file_latencies, 99), 2),
+        })
+
+    return result
+
+
+def run_scenario(name: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """运行单个场景，应在独立进程中调用"""
+    from mock_yuque_server import MockConfig, make_books
+
+    config = MockConfig(
+        books=make_books(params["books"], params["docs"]),
+        markdown_kb=params["markdown_kb"],
+        images_per_doc=params["images_per_doc"],
+        cards_per_doc=params["cards_per_doc"],
+        image_kb=params["image_kb"],
+        latency_ms=params["latency_ms"],
+        jitter_ms=params["jitter_ms"],
+        error_rate=params["error_rate"],
+        rate_limit=params["rate_limit"],
+    )
+
+    with tempfile.TemporaryDirectory(prefix="yuque_bench_") as work_dir:
+        with mock_server_process(config) as (base_url, server_stats):
+            _configure(base_url, work_dir)
+            sink = sys.stdout if params["verbose"] else open(os.devnull, "w", encoding="utf-8")
+            try:
+                with contextlib.redirect_stdout(sink):
+                    result = asyncio.run(_run_export(params, base_url))
+            finally:
+                if sink is not sys.stdout:
+                    sink.close()
+
+    result["scenario"] = name
+    result["peak_rss_mb"] = peak_rss_mb()
+    result["server"] = server_stats
+    return result
+
+
+def _print_result(result: Dict[str, Any]) -> None:
+    line = (
+        f"[{result['scenario']}] docs={result['docs']} failed={result['failed']} "
+        f"{result['docs_per_sec']} docs/s p50={result['doc_p50_ms']}ms p99={result['doc_p99_ms']}ms"
+    )
+    if "assets" in result:
+        line += (
+            f" | assets={result['assets']} failed={result['assets_failed']} {result['assets_per_sec']} assets/s "
+            f"p50={result['asset_file_p50_ms']}ms p99={result['asset_file_p99_ms']}ms"
+        )
+    line += f" | peak RSS {result['peak_rss_mb']} MB"
+    print(line)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="端到端导出吞吐基准")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="要运行的场景，可重复，默认全部")
+    parser.add_argument("--books", type=int, help="知识库数量")
+    parser.add_argument("--docs", type=int, help="每个知识库的文档数")
+    parser.add_argument("--images-per-doc", type=int, help="每篇文档的图片数")
+    parser.add_argument("--cards-per-doc", type=int, help="每篇文档的视频卡片数")
+    parser.add_argument("--doc-format", choices=["md", "word", "pdf"], help="文档导出格式")
+    parser.add_argument("--download-assets", action="store_true", default=None, help="导出后执行资源离线化")
+    parser.add_argument("--markdown-kb", type=int, default=4, help="每篇 Markdown 正文大小 (KB)")
+    parser.add_argument("--image-kb", type=int, default=32, help="每张图片大小 (KB)")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="模拟服务每个请求的基础延迟")
+    parser.add_argument("--jitter-ms", type=float, default=5.0, help="模拟服务延迟随机抖动")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="模拟服务随机返回 500 的比例")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="模拟服务每秒允许的请求数，超出返回 429")
+    parser.add_argument("--concurrency", type=int, default=10, help="调度器文档并发数")
+    parser.add_argument("--asset-threads", type=int, default=10, help="资源下载线程数")
+    parser.add_argument("--output", help="将结果以 JSON 写入指定文件")
+    parser.add_argument("--verbose", action="store_true", help="输出导出过程日志")
+    args = parser.parse_args(argv)
+
+    results = []
+    for name in args.scenario or list(SCENARIOS):
+        params = dict(SCENARIOS[name])
+        for key in ("books", "docs", "images_per_doc", "cards_per_doc", "doc_format", "download_assets"):
+            value = getattr(args, key)
+            if value is not None:
+                params[key] = value
+        params.update({
+            "markdown_kb": args.markdown_kb,
+            "image_kb": args.image_kb,
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "error_rate": args.error_rate,
+            "rate_limit": args.rate_limit,
+            "concurrency": args.concurrency,
+            "asset_threads": args.asset_threads,
+            "verbose": args.verbose,
+        })
+
+        # 每个场景使用全新进程，峰值内存与全局配置互不干扰
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            result = executor.submit(run_scenario, name, params).result()
+        results.append(result)
+        _print_result(result)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
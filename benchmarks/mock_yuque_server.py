@@ -0,0 +1,354 @@
+'''
+Author: Be1k0
+URL: https://github.com/Be1k0/YuQue-BdT
+'''
+
+# 本地模拟语雀服务
+#
+# 使用 aiohttp 在本地模拟 www.yuque.com 与 CDN，提供合成的知识库页面 (decodeURIComponent 目录数据)、
+# /api/docs、/markdown、导出任务状态机以及图片/附件字节流，可配置延迟、错误率与限流，供基准测试离线使用
+#
+# 单独运行:
+#     python benchmarks/mock_yuque_server.py --port 8765 --docs 10000 --latency-ms 20
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import urllib.parse
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+
+@dataclass
+class MockBook:
+    """模拟知识库"""
+    id: int
+    login: str
+    slug: str
+    name: str
+    doc_count: int
+
+    @property
+    def namespace(self) -> str:
+        return f"{self.login}/{self.slug}"
+
+
+@dataclass
+class MockConfig:
+    """模拟服务配置"""
+    books: List[MockBook] = field(default_factory=list)
+    markdown_kb: int = 4  # 每篇 Markdown 正文大小 (KB)
+    images_per_doc: int = 0  # 每篇文档包含的图片链接数
+    cards_per_doc: int = 0  # 每篇文档包含的视频卡片链接数
+    image_kb: int = 32  # 每张图片大小 (KB)
+    attachment_kb: int = 256  # 导出文件大小 (KB)
+    toc_fanout: int = 20  # 目录层级扇出，每 N 篇文档挂在同一个父节点下
+    export_pending_polls: int = 1  # 导出任务返回 success 前的 pending 次数
+    latency_ms: float = 0.0  # 每个请求的基础延迟
+    jitter_ms: float = 0.0  # 延迟随机抖动
+    error_rate: float = 0.0  # 随机返回 500 的比例
+    rate_limit: float = 0.0  # 每秒允许的请求数，超出返回 429，0 表示不限流
+    max_inflight: int = 0  # 同时处理的请求上限，0 表示不限制
+    seed: int = 42
+
+
+class RequestStats:
+    """服务端请求统计"""
+
+    def __init__(self):
+        self.counts: Dict[str, int] = {}
+        self.status_counts: Dict[int, int] = {}
+        self.bytes_sent = 0
+        self.inflight = 0
+        self.peak_inflight = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": dict(sorted(self.counts.items())),
+            "statuses": {str(k): v for k, v in sorted(self.status_counts.items())},
+            "bytes_sent": self.bytes_sent,
+            "peak_inflight": self.peak_inflight,
+        }
+
+
+class MockYuqueServer:
+    """模拟语雀服务"""
+
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.stats = RequestStats()
+        self._random = random.Random(config.seed)
+        self._books_by_ns = {book.namespace: book for book in config.books}
+        self._books_by_id = {book.id: book for book in config.books}
+        self._export_polls: Dict[str, int] = {}
+        self._tokens = config.rate_limit
+        self._last_refill = time.monotonic()
+        self._inflight_sem = asyncio.Semaphore(config.max_inflight) if config.max_inflight > 0 else None
+        self._image_bytes = self._make_png(config.image_kb * 1024)
+        self._attachment_bytes = b"PK\x03\x04" + bytes(max(0, config.attachment_kb * 1024 - 4))
+        self._runner: Optional[web.AppRunner] = None
+        self.base_url = ""
+
+    @staticmethod
+    def _make_png(size: int) -> bytes:
+        header = b"\x89PNG\r\n\x1a\n"
+        return header + bytes(max(0, size - len(header)))
+
+    @staticmethod
+    def doc_id(book: MockBook, index: int) -> int:
+        return book.id * 1_000_000 + index
+
+    @staticmethod
+    def doc_slug(index: int) -> str:
+        return f"doc{index:06d}"
+
+    # ---------- 中间件 ----------
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler):
+        route = request.match_info.route.resource.canonical if request.match_info.route.resource else request.path
+        self.stats.counts[route] = self.stats.counts.get(route, 0) + 1
+
+        if self.config.rate_limit > 0 and not self._take_token():
+            return self._record(web.json_response({"message": "too many requests"}, status=429))
+
+        if self._inflight_sem is not None:
+            await self._inflight_sem.acquire()
+        self.stats.inflight += 1
+        self.stats.peak_inflight = max(self.stats.peak_inflight, self.stats.inflight)
+        try:
+            delay = self.config.latency_ms + self._random.uniform(0, self.config.jitter_ms)
+            if delay > 0:
+                await asyncio.sleep(delay / 1000)
+            if self.config.error_rate > 0 and self._random.random() < self.config.error_rate:
+                return self._record(web.json_response({"message": "mock error"}, status=500))
+            return self._record(await handler(request))
+        finally:
+            self.stats.inflight -= 1
+            if self._inflight_sem is not None:
+                self._inflight_sem.release()
+
+    def _take_token(self) -> bool:
+        now = time.monotonic()
+        self._tokens = min(self.config.rate_limit, self._tokens + (now - self._last_refill) * self.config.rate_limit)
+        self._last_refill = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    def _record(self, response: web.StreamResponse) -> web.StreamResponse:
+        self.stats.status_counts[response.status] = self.stats.status_counts.get(response.status, 0) + 1
+        body = getattr(response, "body", None)
+        if isinstance(body, (bytes, bytearray)):
+            self.stats.bytes_sent += len(body)
+        return response
+
+    # ---------- 数据生成 ----------
+
+    def book_payload(self, book: MockBook) -> Dict[str, Any]:
+        return {
+            "id": book.id,
+            "type": "Book",
+            "slug": book.slug,
+            "name": book.name,
+            "user_id": 1,
+            "description": "",
+            "creator_id": 1,
+            "public": 0,
+            "items_count": book.doc_count,
+            "likes_count": 0,
+            "watches_count": 0,
+            "content_updated_at": "2026-01-01T00:00:00.000Z",
+            "updated_at": "2026-01-01T00:00:00.000Z",
+            "created_at": "2026-01-01T00:00:00.000Z",
+            "namespace": book.namespace,
+            "user": {"login": book.login, "name": book.login},
+        }
+
+    def build_toc(self, book: MockBook) -> List[Dict[str, Any]]:
+        toc = []
+        fanout = max(1, self.config.toc_fanout)
+        for index in range(book.doc_count):
+            parent_index = index - index % fanout
+            parent_uuid = f"u{book.id}-{parent_index}" if parent_index != index else ""
+            toc.append({
+                "type": "DOC",
+                "title": f"文档 {index}",
+                "uuid": f"u{book.id}-{index}",
+                "url": self.doc_slug(index),
+                "id": self.doc_id(book, index),
+                "doc_id": self.doc_id(book, index),
+                "parent_uuid": parent_uuid,
+                "level": 1 if parent_uuid else 0,
+                "visible": 1,
+            })
+        return toc
+
+    def build_markdown(self, book: MockBook, slug: str) -> str:
+        lines = [f"# {slug}\n"]
+        for j in range(self.config.images_per_doc):
+            lines.append(f"![]({self.base_url}/yuque/0/2026/png/{book.id}/{slug}-{j}.png)\n")
+        doc_id = self.doc_id(book, int(slug[3:]))
+        for j in range(self.config.cards_per_doc):
+            lines.append(f"[video.mp4]({self.base_url}/docs/{doc_id}#v{j})\n")
+        paragraph = "语雀模拟正文内容，用于吞吐测试。<br/>Lorem ipsum dolor sit amet.<br>\n"
+        body_size = max(0, self.config.markdown_kb * 1024 - sum(len(line.encode('utf-8')) for line in lines))
+        repeat = max(1, body_size // len(paragraph.encode('utf-8')))
+        lines.append(paragraph * repeat)
+        return "".join(lines)
+
+    # ---------- 路由 ----------
+
+    async def handle_book_stacks(self, request: web.Request) -> web.Response:
+        return web.json_response({"data": [{"books": [self.book_payload(b) for b in self.config.books]}]})
+
+    async def handle_collab_books(self, request: web.Request) -> web.Response:
+        return web.json_response({"data": []})
+
+    async def handle_mine(self, request: web.Request) -> web.Response:
+        return web.json_response({"data": {"name": "bench", "login": "bench"}})
+
+    async def handle_book_page(self, request: web.Request) -> web.Response:
+        book = self._books_by_ns.get(f"{request.match_info['login']}/{request.match_info['book']}")
+        if not book:
+            raise web.HTTPNotFound()
+        payload = urllib.parse.quote(json.dumps({"book": {"toc": self.build_toc(book)}}, ensure_ascii=False))
+        html = (
+            "<!DOCTYPE html><html><head><title>mock</title></head><body>"
+            f'<script>window.appData = JSON.parse(decodeURIComponent("{payload}"));</script>'
+            "</body></html>"
+        )
+        return web.Response(text=html, content_type="text/html")
+
+    async def handle_docs_list(self, request: web.Request) -> web.Response:
+        book = self._books_by_id.get(int(request.query.get("book_id", "0") or 0))
+        if not book:
+            return web.json_response({"data": []})
+        return web.json_response({"data": [
+            {"id": self.doc_id(book, i), "slug": self.doc_slug(i), "type": "Doc", "title": f"文档 {i}", "word_count": 100 + i % 5000}
+            for i in range(book.doc_count)
+        ]})
+
+    async def handle_markdown(self, request: web.Request) -> web.Response:
+        book = self._books_by_ns.get(f"{request.match_info['login']}/{request.match_info['book']}")
+        if not book:
+            raise web.HTTPNotFound()
+        return web.Response(text=self.build_markdown(book, request.match_info['slug']), content_type="text/markdown")
+
+    async def handle_api_markdown(self, request: web.Request) -> web.Response:
+        return await self.handle_markdown(request)
+
+    async def handle_doc_detail(self, request: web.Request) -> web.Response:
+        slug = request.match_info['slug']
+        content = "".join(
+            '<card type="inline" name="video" '
+            f'value="data:{urllib.parse.quote(json.dumps({"id": f"v{j}", "videoId": f"{slug}-v{j}", "name": f"video-{j}.mp4"}))}"></card>'
+            for j in range(self.config.cards_per_doc)
+        )
+        return web.json_response({"data": {"content": content}})
+
+    async def handle_video(self, request: web.Request) -> web.Response:
+        video_id = request.query.get("video_id", "video")
+        return web.json_response({"data": {"info": {"origin": f"{self.base_url}/yuque/0/video/{video_id}.mp4"}}})
+
+    async def handle_export(self, request: web.Request) -> web.Response:
+        doc_id = request.match_info['doc_id']
+        payload = await request.json()
+        export_type = payload.get("type", "word")
+        key = f"{doc_id}:{export_type}"
+        polls = self._export_polls.get(key, 0)
+        if polls < self.config.export_pending_polls:
+            self._export_polls[key] = polls + 1
+            return web.json_response({"data": {"state": "pending"}})
+        self._export_polls.pop(key, None)
+        ext = {"word": "docx", "excel": "xlsx", "pdf": "pdf"}.get(export_type, export_type)
+        return web.json_response({"data": {"state": "success", "url": f"/attachments/export/{doc_id}.{ext}"}})
+
+    async def handle_attachment(self, request: web.Request) -> web.Response:
+        return web.Response(body=self._attachment_bytes, content_type="application/octet-stream")
+
+    async def handle_cdn(self, request: web.Request) -> web.Response:
+        return web.Response(body=self._image_bytes, content_type="image/png")
+
+    def build_app(self) -> web.Application:
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_get("/api/mine/book_stacks", self.handle_book_stacks)
+        app.router.add_get("/api/mine/raw_collab_books", self.handle_collab_books)
+        app.router.add_get("/api/mine", self.handle_mine)
+        app.router.add_get("/api/docs", self.handle_docs_list)
+        app.router.add_get("/api/video", self.handle_video)
+        app.router.add_post("/api/docs/{doc_id}/export", self.handle_export)
+        app.router.add_get("/api/docs/{login}/{book}/{slug}/markdown", self.handle_api_markdown)
+        app.router.add_get("/api/docs/{slug}", self.handle_doc_detail)
+        app.router.add_get("/attachments/export/{name}", self.handle_attachment)
+        app.router.add_get("/yuque/{tail:.*}", self.handle_cdn)
+        app.router.add_get("/{login}/{book}/{slug}/markdown", self.handle_markdown)
+        app.router.add_get("/{login}/{book}", self.handle_book_page)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """启动服务并返回基础地址"""
+        self._runner = web.AppRunner(self.build_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://{host}:{bound_port}"
+        return self.base_url
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+def make_books(book_count: int, docs_per_book: int) -> List[MockBook]:
+    """生成模拟知识库列表"""
+    return [
+        MockBook(id=1000 + i, login="bench", slug=f"book{i}", name=f"基准知识库{i}", doc_count=docs_per_book)
+        for i in range(book_count)
+    ]
+
+
+async def _serve_forever(args: argparse.Namespace) -> None:
+    config = MockConfig(
+        books=make_books(args.books, args.docs),
+        markdown_kb=args.markdown_kb,
+        images_per_doc=args.images_per_doc,
+        cards_per_doc=args.cards_per_doc,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+    )
+    server = MockYuqueServer(config)
+    base_url = await server.start(port=args.port)
+    print(f"模拟语雀服务已启动: {base_url}")
+    try:
+        while True:
+            await asyncio.sleep(3600)
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地模拟语雀服务")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--books", type=int, default=1)
+    parser.add_argument("--docs", type=int, default=100)
+    parser.add_argument("--markdown-kb", type=int, default=4)
+    parser.add_argument("--images-per-doc", type=int, default=0)
+    parser.add_argument("--cards-per-doc", type=int, default=0)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0)
+    try:
+        asyncio.run(_serve_forever(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,146 @@
+'''
+Author: Be1k0
+URL: https://github.com/Be1k0/YuQue-BdT
+'''
+
+# GUI 启动耗时基准
+#
+# 多次启动 main.py 并在首个窗口显示后退出，统计从进程启动到首个窗口可见的耗时 (time-to-first-window)，
+# 可与基线文件比较以发现启动性能回归；--importtime 会以 -X importtime 启动一次并汇总最耗时的导入
+#
+# 用法:
+#     python benchmarks/startup_benchmark.py --runs 5 --offscreen
+#     python benchmarks/startup_benchmark.py --save-baseline benchmarks/startup_baseline.json
+#     python benchmarks/startup_benchmark.py --baseline benchmarks/startup_baseline.json --max-regression 0.15
+#     python benchmarks/startup_benchmark.py --importtime --top 30
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN_SCRIPT = os.path.join(ROOT_DIR, "main.py")
+
+
+def _build_env(profile_path: str, offscreen: bool) -> Dict[str, str]:
+    env = os.environ.copy()
+    env["YUQUE_STARTUP_PROFILE"] = profile_path
+    env["YUQUE_STARTUP_EXIT"] = "1"
+    if offscreen:
+        env["QT_QPA_PLATFORM"] = "offscreen"
+    return env
+
+
+def run_once(offscreen: bool, timeout: float, extra_args: Optional[List[str]] = None) -> Dict[str, Any]:
+    """启动一次程序并返回启动耗时报告"""
+    fd, profile_path = tempfile.mkstemp(prefix="yuque_startup_", suffix=".json")
+    os.close(fd)
+    try:
+        cmd = [sys.executable] + (extra_args or []) + [MAIN_SCRIPT]
+        launched_wall = time.time()
+        proc = subprocess.run(
+            cmd, cwd=ROOT_DIR, env=_build_env(profile_path, offscreen),
+            capture_output=True, text=True, timeout=timeout,
+        )
+        with open(profile_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        if not content:
+            raise RuntimeError(f"未生成启动报告，退出码 {proc.returncode}:\n{proc.stderr[-2000:]}")
+
+        report = json.loads(content)
+        report["time_to_first_window_ms"] = round((report["finished_wall"] - launched_wall) * 1000, 2)
+        report["stderr"] = proc.stderr
+        return report
+    finally:
+        try:
+            os.remove(profile_path)
+        except OSError:
+            pass
+
+
+def summarize_importtime(stderr: str, top: int) -> List[Dict[str, Any]]:
+    """解析 -X importtime 输出，按累计耗时排序"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            _, payload = line.split(":", 1)
+            self_us, cumulative_us, name = payload.split("|", 2)
+            rows.append({
+                "module": name.strip(),
+                "depth": (len(name) - len(name.lstrip())) // 2,
+                "self_ms": int(self_us) / 1000,
+                "cumulative_ms": int(cumulative_us) / 1000,
+            })
+        except ValueError:
+            continue
+    rows.sort(key=lambda r: r["cumulative_ms"], reverse=True)
+    return rows[:top]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="GUI 启动耗时基准")
+    parser.add_argument("--runs", type=int, default=5, help="启动次数")
+    parser.add_argument("--offscreen", action="store_true", help="使用 Qt offscreen 平台，适合无显示环境")
+    parser.add_argument("--timeout", type=float, default=60.0, help="单次启动超时 (秒)")
+    parser.add_argument("--baseline", help="基线文件，用于回归比较")
+    parser.add_argument("--max-regression", type=float, default=0.15, help="允许相对基线变慢的比例")
+    parser.add_argument("--save-baseline", help="将本次结果保存为基线文件")
+    parser.add_argument("--importtime", action="store_true", help="以 -X importtime 启动一次并输出最耗时的导入")
+    parser.add_argument("--top", type=int, default=25, help="importtime 报告显示的条目数")
+    args = parser.parse_args(argv)
+
+    if args.importtime:
+        report = run_once(args.offscreen, args.timeout, ["-X", "importtime"])
+        print(f"{'cumulative(ms)':>15} {'self(ms)':>10}  module")
+        for row in summarize_importtime(report["stderr"], args.top):
+            print(f"{row['cumulative_ms']:>15.1f} {row['self_ms']:>10.1f}  {'  ' * row['depth']}{row['module']}")
+        print(f"\n首个窗口耗时: {report['time_to_first_window_ms']} ms")
+        print(f"启动阶段已加载的重量级模块: {', '.join(report['heavy_modules_loaded']) or '无'}")
+        return 0
+
+    samples = []
+    heavy_modules = set()
+    stages: Dict[str, List[float]] = {}
+    for i in range(args.runs):
+        report = run_once(args.offscreen, args.timeout)
+        samples.append(report["time_to_first_window_ms"])
+        heavy_modules.update(report["heavy_modules_loaded"])
+        for stage in report["stages"]:
+            stages.setdefault(stage["name"], []).append(stage["ms"])
+        print(f"第 {i + 1}/{args.runs} 次: {report['time_to_first_window_ms']} ms")
+
+    result = {
+        "runs": args.runs,
+        "median_ms": round(statistics.median(samples), 2),
+        "min_ms": round(min(samples), 2),
+        "max_ms": round(max(samples), 2),
+        "stages_median_ms": {name: round(statistics.median(values), 2) for name, values in stages.items()},
+        "heavy_modules_loaded": sorted(heavy_modules),
+    }
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        limit = baseline["median_ms"] * (1 + args.max_regression)
+        if result["median_ms"] > limit:
+            print(f"启动耗时回归: {result['median_ms']} ms > 基线 {baseline['median_ms']} ms (+{args.max_regression:.0%})")
+            return 1
+        print(f"启动耗时正常: {result['median_ms']} ms <= {round(limit, 2)} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
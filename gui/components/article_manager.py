@@ -3,38 +3,56 @@ Author: Be1k0
 URL: https://github.com/Be1k0/YuQue-BdT
 '''
 
+from itertools import compress
 from PyQt6.QtWidgets import (
     QDialog, QVBoxLayout, QLabel, QGroupBox, QHBoxLayout, 
-    QComboBox, QPushButton, QLineEdit,
-    QMessageBox, QAbstractItemView, QTreeWidget, QTreeWidgetItem, QTreeWidgetItemIterator
+    QComboBox, QPushButton, QLineEdit, QProgressBar,
+    QMessageBox, QAbstractItemView, QTreeWidget, QTreeView
 )
-from PyQt6.QtCore import Qt, QRect
-from PyQt6.QtGui import QColor, QFont, QPainter, QPen, QBrush, QCursor, QIcon
+from PyQt6.QtCore import Qt, QRect, QModelIndex, QAbstractItemModel, QSortFilterProxyModel, pyqtSignal
+from PyQt6.QtGui import QColor, QFont, QPainter, QPen, QBrush, QIcon
 from PyQt6.QtWidgets import QStyleOptionViewItem
 from src.libs.log import Log
 from src.libs.constants import MutualAnswer
 from src.libs.debug_logger import DebugLogger
 from src.libs.tools import resolve_book_namespace
+from src.libs.search_index import SearchIndex
+from src.libs.toc_tree import TocTree, mask_union, mask_difference
 from src.ui.font_utils import stabilize_combo_box_font
 from qasync import asyncSlot
-from gui.controllers.article_controller import ArticleController
 from src.ui.theme_manager import THEME_MANAGER
-from utils import static_resource_path
+from utils import static_resource_path, Debouncer
 
-class ArticleTreeWidget(QTreeWidget):
-    """文章树控件类
-    
-    用于展示文章列表，并实现父子节点的级联选中。
+class RowHighlightMixin:
+    """树控件行高亮混入类
+
+    记录鼠标所在的行，只在悬停行变化时重绘新旧两行，
+    绘制每一行时不再查询鼠标位置，重绘开销只与可见行数有关。
     """
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.setHeaderHidden(True)
-        self.setSelectionMode(QAbstractItemView.SelectionMode.MultiSelection)
-        self.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
-        self.setAnimated(True)
-        self.setExpandsOnDoubleClick(False)
-        self.setMouseTracking(True)
-        self.itemClicked.connect(self._on_item_clicked)
+    _hover_index = QModelIndex()
+
+    def _is_row_selected(self, index):
+        return self.selectionModel().isSelected(index)
+
+    def _update_row(self, index):
+        if index.isValid():
+            rect = self.visualRect(index)
+            self.viewport().update(0, rect.y(), self.viewport().width(), rect.height())
+
+    def _set_hover_index(self, index):
+        if index != self._hover_index:
+            previous = self._hover_index
+            self._hover_index = index
+            self._update_row(previous)
+            self._update_row(index)
+
+    def mouseMoveEvent(self, event):
+        self._set_hover_index(self.indexAt(event.position().toPoint()))
+        super().mouseMoveEvent(event)
+
+    def leaveEvent(self, event):
+        self._set_hover_index(QModelIndex())
+        super().leaveEvent(event)
 
     def drawRow(self, painter: QPainter, option: QStyleOptionViewItem, index):
         """自定义绘制行，添加选中和悬停的背景效果
@@ -44,11 +62,8 @@ class ArticleTreeWidget(QTreeWidget):
             option: 选项对象
             index: 行索引
         """
-        is_selected = self.selectionModel().isSelected(index)
-        
-        # 判断是否悬停
-        pos = self.viewport().mapFromGlobal(QCursor.pos())
-        is_hovered = (self.indexAt(pos) == index)
+        is_selected = self._is_row_selected(index)
+        is_hovered = index == self._hover_index
 
         if is_selected or is_hovered:
             painter.save()
@@ -81,6 +96,22 @@ class ArticleTreeWidget(QTreeWidget):
         # 调用父类方法绘制行
         super().drawRow(painter, option, index)
 
+
+class ArticleTreeWidget(RowHighlightMixin, QTreeWidget):
+    """文章树控件类
+    
+    用于展示文章列表，并实现父子节点的级联选中。
+    """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setHeaderHidden(True)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.MultiSelection)
+        self.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.setAnimated(True)
+        self.setExpandsOnDoubleClick(False)
+        self.setMouseTracking(True)
+        self.itemClicked.connect(self._on_item_clicked)
+
     def _on_item_clicked(self, item):
         """处理单击操作，自动选中/取消选中所有子节点
         
@@ -122,6 +153,363 @@ def get_article_icon(item_type: str, item=None):
     else:
         return QIcon(static_resource_path("src/ui/themes/resources/icons/yuque-doc.svg"))
 
+
+class ArticleTreeModel(QAbstractItemModel):
+    """文章目录模型
+
+    数据保存在 TocTree 的平行数组中，QModelIndex 的 internalId 即节点编号；
+    子节点通过 fetchMore 按批次暴露给视图，选中状态保存在与节点一一对应的 bytearray 中。
+    没有目录数据时可以显示若干条不可选的提示行。
+    """
+    FETCH_BATCH = 500  # 每次 fetchMore 暴露的子节点数
+    ID_ROLE = Qt.ItemDataRole.UserRole
+    ARTICLE_ROLE = Qt.ItemDataRole.UserRole + 1
+    CHECKED_ROLE = Qt.ItemDataRole.UserRole + 2
+
+    check_state_changed = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.toc = TocTree()
+        self.checked = bytearray()
+        self._fetched = {}
+        self._all_fetched = False
+        self._messages = []
+        self._icons = {}
+        self._title_font = QFont()
+        self._title_font.setBold(True)
+
+    # ---- 数据加载 ----
+
+    def set_messages(self, messages):
+        """显示提示行
+
+        Args:
+            messages: (文本, 字体, 图标) 列表，字体和图标可为 None
+        """
+        self.beginResetModel()
+        self.toc = TocTree()
+        self.checked = bytearray()
+        self._fetched = {}
+        self._all_fetched = False
+        self._messages = list(messages)
+        self.endResetModel()
+
+    def set_toc(self, toc, selected_ids=()):
+        """加载目录数据
+
+        Args:
+            toc: TocTree 对象
+            selected_ids: 需要恢复选中状态的文章 ID
+        """
+        selected = set(selected_ids or ())
+        self.beginResetModel()
+        self.toc = toc
+        self.checked = bytearray(doc_id in selected for doc_id in toc.ids) if selected else bytearray(len(toc))
+        self._fetched = {}
+        self._all_fetched = False
+        self._messages = []
+        self.endResetModel()
+
+    def fetch_all(self):
+        """一次性暴露全部节点 (用于全部展开或过滤)"""
+        if self._all_fetched or not len(self.toc):
+            return
+        self.beginResetModel()
+        self._all_fetched = True
+        self._fetched = {-1: len(self.toc.roots)}
+        for node in range(len(self.toc)):
+            count = self.toc.child_count(node)
+            if count:
+                self._fetched[node] = count
+        self.endResetModel()
+
+    def index_of(self, node):
+        """节点对应的索引 (节点需已通过 fetchMore/fetch_all 暴露)"""
+        return self.createIndex(self.toc.row[node], 0, node)
+
+    def node(self, index):
+        """返回索引对应的节点编号，提示行或无效索引返回 -1"""
+        if not index.isValid() or self._messages:
+            return -1
+        return index.internalId()
+
+    # ---- 选中状态 ----
+
+    def set_checked(self, node, checked, cascade=True):
+        """设置节点选中状态，cascade 为 True 时同时设置全部后代节点"""
+        end = self.toc.end[node] if cascade else node + 1
+        self.checked[node:end] = (b'\x01' if checked else b'\x00') * (end - node)
+        self.check_state_changed.emit()
+
+    def toggle(self, node):
+        self.set_checked(node, not self.checked[node])
+
+    def set_all_checked(self, checked, mask=None):
+        """设置全部节点 (或 mask 中的节点) 的选中状态"""
+        if mask is None:
+            self.checked = bytearray((b'\x01' if checked else b'\x00') * len(self.toc))
+        elif checked:
+            self.checked = mask_union(self.checked, mask)
+        else:
+            self.checked = mask_difference(self.checked, mask)
+        self.check_state_changed.emit()
+
+    def checked_ids(self):
+        return self.toc.select_ids(self.checked)
+
+    def checked_count(self):
+        return self.checked.count(1)
+
+    # ---- QAbstractItemModel 接口 ----
+
+    def index(self, row, column, parent=QModelIndex()):
+        if not self.hasIndex(row, column, parent):
+            return QModelIndex()
+        if self._messages:
+            return self.createIndex(row, column, row)
+        parent_node = parent.internalId() if parent.isValid() else -1
+        return self.createIndex(row, column, self.toc.child(parent_node, row))
+
+    def parent(self, index):
+        if not index.isValid() or self._messages:
+            return QModelIndex()
+        parent_node = self.toc.parent[index.internalId()]
+        if parent_node < 0:
+            return QModelIndex()
+        return self.createIndex(self.toc.row[parent_node], 0, parent_node)
+
+    def rowCount(self, parent=QModelIndex()):
+        if self._messages:
+            return 0 if parent.isValid() else len(self._messages)
+        if parent.column() > 0:
+            return 0
+        return self._fetched.get(parent.internalId() if parent.isValid() else -1, 0)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 1
+
+    def hasChildren(self, parent=QModelIndex()):
+        if self._messages:
+            return not parent.isValid()
+        return self.toc.child_count(parent.internalId() if parent.isValid() else -1) > 0
+
+    def canFetchMore(self, parent):
+        if self._messages:
+            return False
+        node = parent.internalId() if parent.isValid() else -1
+        return self._fetched.get(node, 0) < self.toc.child_count(node)
+
+    def fetchMore(self, parent):
+        node = parent.internalId() if parent.isValid() else -1
+        fetched = self._fetched.get(node, 0)
+        count = min(self.toc.child_count(node) - fetched, self.FETCH_BATCH)
+        if count <= 0:
+            return
+        self.beginInsertRows(parent, fetched, fetched + count - 1)
+        self._fetched[node] = fetched + count
+        self.endInsertRows()
+
+    def flags(self, index):
+        if not index.isValid() or self._messages:
+            return Qt.ItemFlag.NoItemFlags
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+
+    def _icon(self, node):
+        item_type = self.toc.types[node]
+        icon = self._icons.get(item_type)
+        if icon is None:
+            icon = get_article_icon(item_type, self.toc.items[node])
+            self._icons[item_type] = icon
+        return icon
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        if self._messages:
+            text, font, icon = self._messages[index.row()]
+            if role == Qt.ItemDataRole.DisplayRole:
+                return text
+            if role == Qt.ItemDataRole.FontRole:
+                return font
+            if role == Qt.ItemDataRole.DecorationRole:
+                return icon
+            return None
+
+        node = index.internalId()
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self.toc.titles[node]
+        if role == Qt.ItemDataRole.DecorationRole:
+            return self._icon(node)
+        if role == Qt.ItemDataRole.FontRole:
+            return self._title_font if self.toc.types[node] == 'TITLE' else None
+        if role == Qt.ItemDataRole.ToolTipRole:
+            tooltip = f"标题: {self.toc.titles[node]}\n类型: {self.toc.types[node]}"
+            updated_at = self.toc.items[node].get('updated_at', '')
+            if updated_at and isinstance(updated_at, str):
+                tooltip += f"\n更新时间: {updated_at.split('T')[0]}"
+            return tooltip
+        if role == self.ID_ROLE:
+            return self.toc.ids[node]
+        if role == self.ARTICLE_ROLE:
+            return self.toc.items[node]
+        if role == self.CHECKED_ROLE:
+            return bool(self.checked[node])
+        return None
+
+
+class ArticleFilterProxyModel(QSortFilterProxyModel):
+    """按可见掩码过滤文章目录的代理模型"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.visible_mask = None
+
+    def set_visible_mask(self, mask):
+        """设置可见掩码，None 表示不过滤"""
+        self.visible_mask = mask
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        if self.visible_mask is None:
+            return True
+        node = self.sourceModel().node(self.sourceModel().index(source_row, 0, source_parent))
+        return node < 0 or bool(self.visible_mask[node])
+
+
+class ArticleTreeView(RowHighlightMixin, QTreeView):
+    """文章目录视图
+
+    基于 ArticleTreeModel 的虚拟化树视图：只为可见行创建索引和绘制，
+    单击行时切换该节点及其全部后代的选中状态 (保存在模型的 bytearray 中)。
+    加载目录时同时构建搜索索引，过滤结果以可见掩码交给代理模型。
+    """
+    EXPAND_ALL_LIMIT = 2000  # 节点数不超过该值时默认全部展开
+
+    itemSelectionChanged = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setHeaderHidden(True)
+        self.setUniformRowHeights(True)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self.setAnimated(True)
+        self.setExpandsOnDoubleClick(False)
+        self.setMouseTracking(True)
+
+        self.search_index = SearchIndex(())
+        self.source_model = ArticleTreeModel(self)
+        self.proxy_model = ArticleFilterProxyModel(self)
+        self.proxy_model.setSourceModel(self.source_model)
+        self.setModel(self.proxy_model)
+
+        self.source_model.check_state_changed.connect(self._on_check_state_changed)
+        self.clicked.connect(self._on_clicked)
+
+    @property
+    def toc(self):
+        return self.source_model.toc
+
+    def _node(self, index):
+        return self.source_model.node(self.proxy_model.mapToSource(index))
+
+    def _is_row_selected(self, index):
+        node = self._node(index)
+        return node >= 0 and bool(self.source_model.checked[node])
+
+    def _on_clicked(self, index):
+        node = self._node(index)
+        if node >= 0:
+            self.source_model.toggle(node)
+
+    def _on_check_state_changed(self):
+        self.viewport().update()
+        self.itemSelectionChanged.emit()
+
+    def _expand_default(self, visible_count):
+        """未过滤时的默认展开：节点较少时全部展开，否则只展开第一层"""
+        if visible_count <= self.EXPAND_ALL_LIMIT:
+            self.source_model.fetch_all()
+            self.expandAll()
+        else:
+            self.expandToDepth(0)
+
+    def _expand_filtered(self, mask):
+        """过滤时展开可见节点的全部父节点，任意深度的匹配都能直接看到"""
+        if mask.count(1) <= self.EXPAND_ALL_LIMIT:
+            self.expandAll()
+            return
+        # 掩码中已包含匹配节点的全部祖先，展开每个可见节点的父节点即可
+        parents = self.toc.parent
+        expand = {parents[node] for node in compress(range(len(mask)), mask)}
+        expand.discard(-1)
+        self.setUpdatesEnabled(False)
+        try:
+            for node in expand:
+                self.setExpanded(self.proxy_model.mapFromSource(self.source_model.index_of(node)), True)
+        finally:
+            self.setUpdatesEnabled(True)
+
+    def clear(self):
+        """清空列表"""
+        self.show_message()
+
+    def show_message(self, *messages):
+        """显示提示行，每条提示为文本或 (文本, 字体, 图标)"""
+        self._hover_index = QModelIndex()
+        self.search_index = SearchIndex(())
+        self.proxy_model.set_visible_mask(None)
+        self.source_model.set_messages(
+            (message, None, None) if isinstance(message, str) else tuple(message)
+            for message in messages
+        )
+
+    def load_articles(self, articles, selected_ids=()):
+        """加载文章列表并恢复选中状态
+
+        Args:
+            articles: 文章列表 (字典或带属性的对象)
+            selected_ids: 需要选中的文章 ID
+
+        Returns:
+            构建好的 TocTree
+        """
+        self._hover_index = QModelIndex()
+        toc = TocTree(articles)
+        self.search_index = SearchIndex(toc.titles, toc.parent)
+        self.proxy_model.set_visible_mask(None)
+        self.source_model.set_toc(toc, selected_ids)
+        self._expand_default(len(toc))
+        return toc
+
+    def set_filter_text(self, text):
+        """按标题 (或拼音、首字母) 过滤，显示匹配的节点及其祖先"""
+        if not len(self.toc):
+            return
+        mask = self.search_index.visible_mask(text)
+        if mask is None:
+            self.proxy_model.set_visible_mask(None)
+            return
+        self.source_model.fetch_all()
+        self.proxy_model.set_visible_mask(mask)
+        self._expand_filtered(mask)
+
+    def checked_ids(self):
+        """当前选中的文章 ID 列表"""
+        return self.source_model.checked_ids()
+
+    def checked_count(self):
+        return self.source_model.checked_count()
+
+    def set_all_checked(self, checked, visible_only=True):
+        """全选或取消全选，visible_only 为 True 时只作用于过滤后可见的节点"""
+        mask = self.proxy_model.visible_mask if visible_only else None
+        self.source_model.set_all_checked(checked, mask)
+
+    def clearSelection(self):
+        self.set_all_checked(False, visible_only=False)
+
+
 class ArticleSelectionDialog(QDialog):
     """文章选择对话框
 
@@ -130,7 +518,10 @@ class ArticleSelectionDialog(QDialog):
     def __init__(self, parent=None, books_info=None, controller=None):
         super().__init__(parent)
         self.books_info = books_info or []
-        self.controller = controller or ArticleController()
+        if controller is None:
+            from gui.controllers.article_controller import ArticleController
+            controller = ArticleController()
+        self.controller = controller
         self.selected_articles = {}
         self.current_namespace = ""
         self.current_book_name = ""
@@ -176,13 +567,13 @@ class ArticleSelectionDialog(QDialog):
         article_search_label = QLabel("搜索文章:")
         self.article_search_input = QLineEdit()
         self.article_search_input.setPlaceholderText("输入关键词过滤文章")
-        self.article_search_input.textChanged.connect(self.filter_articles)
+        self.article_search_input.textChanged.connect(Debouncer(self.filter_articles, parent=self).trigger)
         article_search_layout.addWidget(article_search_label)
         article_search_layout.addWidget(self.article_search_input)
         main_layout.addLayout(article_search_layout)
 
         # 文章列表
-        self.article_list = ArticleTreeWidget()
+        self.article_list = ArticleTreeView()
         self.article_list.itemSelectionChanged.connect(self.update_article_selection)
         main_layout.addWidget(self.article_list)
 
@@ -213,6 +604,11 @@ class ArticleSelectionDialog(QDialog):
         self.status_label.setStyleSheet("color: #0d6efd;")
         layout.addWidget(self.status_label)
 
+        # 全选知识库时的整体加载进度
+        self.load_progress_bar = QProgressBar()
+        self.load_progress_bar.setVisible(False)
+        layout.addWidget(self.load_progress_bar)
+
         # 添加按钮
         button_layout = QHBoxLayout()
         self.total_selected_label = QLabel("总计已选: 0篇文章")
@@ -344,146 +740,23 @@ class ArticleSelectionDialog(QDialog):
             book_name: 知识库名称
         """
         try:
-            self.article_list.clear()
-
             # 检查是否有错误信息
             if isinstance(articles, dict) and "error" in articles:
                 error_msg = articles.get("message", "未知错误")
-                error_item = QTreeWidgetItem(self.article_list, [f"加载失败: {error_msg}"])
-                error_item.setFlags(Qt.ItemFlag.NoItemFlags)
+                self.article_list.show_message(f"加载失败: {error_msg}")
                 return
 
             if not articles:
-                empty_item = QTreeWidgetItem(self.article_list, [f"知识库 {book_name} 没有文章"])
-                empty_item.setFlags(Qt.ItemFlag.NoItemFlags)
+                self.article_list.show_message(f"知识库 {book_name} 没有文章")
                 return
 
-            # 处理层级关系
-            try:
-                # 确保articles是字典列表
-                if not isinstance(articles[0], dict):
-                    articles = [{k: v for k, v in obj.__dict__.items() if not k.startswith('_')} for obj in articles]
-                
-                # 构建UUID到文章的映射
-                uuid_to_article = {}
-                for article in articles:
-                    uuid = article.get('uuid')
-                    if uuid:
-                        uuid_to_article[uuid] = article
-                
-                # 构建层级结构
-                def build_hierarchy(items):
-                    """构建文章的层级结构，父子关系通过 parent_uuid 字段确定"""
-                    for item in items:
-                        item['children'] = []
-                    
-                    for item in items:
-                        parent_uuid = item.get('parent_uuid')
-                        if parent_uuid and parent_uuid in uuid_to_article:
-                            parent = uuid_to_article[parent_uuid]
-                            parent['children'].append(item)
-                    
-                    root_items = [item for item in items if item.get('level') == 0]
-                    root_items.sort(key=lambda x: ((x.get('type', 'DOC') != 'TITLE'), x.get('title', '')))
-                    
-                    def sort_children_recursive(items):
-                        """递归排序子项，确保标题在前，文档在后，并按标题字母顺序排序"""
-                        for item in items:
-                            if item['children']:
-                                item['children'].sort(key=lambda x: ((x.get('type', 'DOC') != 'TITLE'), x.get('title', '')))
-                                sort_children_recursive(item['children'])
-                    
-                    sort_children_recursive(root_items)
-                    return root_items
-                
-                hierarchy = build_hierarchy(articles)
-                
-                # 3. 递归显示层级结构
-                def add_items_recursive(items, parent_item):
-                    """递归添加文章项到树控件中
-                    
-                    Args:
-                        items: 文章项列表
-                        parent_item: 父项
-                    """
-                    for item in items:
-                        title = item.get('title', 'Untitled')
-                        item_type = item.get('type', 'DOC').upper()
-                        
-                        display_title = title
-                        
-                        if parent_item == self.article_list:
-                            tree_item = QTreeWidgetItem(self.article_list, [display_title])
-                        else:
-                            tree_item = QTreeWidgetItem(parent_item, [display_title])
-                        
-                        tree_item.setIcon(0, get_article_icon(item_type, item))
-                        
-                        # 设置样式
-                        if item_type == 'TITLE':
-                            font = tree_item.font(0)
-                            font.setBold(True)
-                            tree_item.setFont(0, font)
-                        
-                        # 存储文章ID和其他必要信息
-                        tree_item.setData(0, Qt.ItemDataRole.UserRole, item.get('id', ''))
-                        tree_item.setData(0, Qt.ItemDataRole.UserRole + 1, item)
-                        
-                        # 检查是否已经选择过该文章
-                        if self.current_namespace in self.selected_articles and \
-                                item.get('id', '') in self.selected_articles[self.current_namespace]:
-                            tree_item.setSelected(True)
-                        
-                        # 递归添加子项
-                        if 'children' in item and item['children']:
-                            add_items_recursive(item['children'], tree_item)
-                
-                add_items_recursive(hierarchy, self.article_list)
-                self.article_list.expandAll() # 默认展开所有层级
-                
-            except Exception as hierarchy_error:
-                # 如果层级处理过程中出错，显示原始列表
-                self.article_list.clear()
-
-                for article in articles:
-                    try:
-                        if isinstance(article, dict):
-                            title = article.get('title', 'Untitled')
-                            item_type = article.get('type', 'DOC').upper()
-                            article_id = article.get('id', '')
-                        else:
-                            title = getattr(article, 'title', 'Untitled')
-                            item_type = getattr(article, 'type', 'DOC').upper()
-                            article_id = getattr(article, 'id', '')
-                        
-                        display_title = title
-                        
-                        tree_item = QTreeWidgetItem(self.article_list, [display_title])
-                        tree_item.setIcon(0, get_article_icon(item_type, article))
-                        
-                        if item_type == 'TITLE':
-                            font = tree_item.font(0)
-                            font.setBold(True)
-                            tree_item.setFont(0, font)
-                        
-                        tree_item.setData(0, Qt.ItemDataRole.UserRole, article_id)
-                        tree_item.setData(0, Qt.ItemDataRole.UserRole + 1, article)
-
-                        if self.current_namespace in self.selected_articles and \
-                                article_id in self.selected_articles[self.current_namespace]:
-                            tree_item.setSelected(True)
-
-                    except:
-                        continue
-
+            self.article_list.load_articles(articles, self.selected_articles.get(self.current_namespace, ()))
             self.status_label.setText(f"知识库 {book_name} 共有 {len(articles)} 篇文章")
             self.update_article_selection()
 
         except Exception as e:
             error_msg = str(e)
-            self.article_list.clear()
-            error_item = QTreeWidgetItem(self.article_list, [f"显示文章列表出错: {error_msg}"])
-            error_item.setFlags(Qt.ItemFlag.NoItemFlags)
+            self.article_list.show_message(f"显示文章列表出错: {error_msg}")
 
     def handle_articles_error(self, error_msg, book_name):
         """处理获取文章列表错误
@@ -492,9 +765,7 @@ class ArticleSelectionDialog(QDialog):
             error_msg: 错误信息
             book_name: 知识库名称
         """
-        self.article_list.clear()
-        error_item = QTreeWidgetItem(self.article_list, [f"加载失败: {error_msg}"])
-        error_item.setFlags(Qt.ItemFlag.NoItemFlags)
+        self.article_list.show_message(f"加载失败: {error_msg}")
         self.status_label.setText(f"获取知识库 {book_name} 文章列表失败")
 
     def filter_articles(self, text):
@@ -503,60 +774,23 @@ class ArticleSelectionDialog(QDialog):
         Args:
             text: 过滤文本
         """
-        filter_text = text.lower()
-        
-        def update_visibility(item):
-            """更新文章可见性"""
-            # 默认自身是否匹配
-            is_match = filter_text in item.text(0).lower()
-            
-            # 检查是否有任何子节点匹配
-            child_match = False
-            for i in range(item.childCount()):
-                if update_visibility(item.child(i)):
-                    child_match = True
-            
-            # 如果自身匹配，或者有子节点匹配，则必须可见
-            should_show = is_match or child_match
-            item.setHidden(not should_show)
-            
-            # 如果因为子节点匹配而显示自身，将其展开方便查看
-            if child_match and not is_match:
-                item.setExpanded(True)
-                
-            return should_show
-
-        for i in range(self.article_list.topLevelItemCount()):
-            update_visibility(self.article_list.topLevelItem(i))
+        self.article_list.set_filter_text(text)
 
     def select_all_articles(self):
         """全选当前显示的所有文章"""
-        iterator = QTreeWidgetItemIterator(self.article_list)
-        while iterator.value():
-            item = iterator.value()
-            if not item.isHidden():
-                item.setSelected(True)
-            iterator += 1
+        self.article_list.set_all_checked(True)
 
     def deselect_all_articles(self):
         """取消选择当前知识库的所有文章"""
-        iterator = QTreeWidgetItemIterator(self.article_list)
-        while iterator.value():
-            item = iterator.value()
-            item.setSelected(False)
-            iterator += 1
+        self.article_list.set_all_checked(False, visible_only=False)
 
     def update_article_selection(self):
         """更新选中的文章"""
-        count = len(self.article_list.selectedItems())
-        self.selected_article_count_label.setText(f"已选: {count}")
+        count = self.article_list.checked_count()
+        self.selected_count_label.setText(f"已选: {count}")
 
         if self.current_namespace:
-            selected_ids = []
-            for item in self.article_list.selectedItems():
-                article_id = item.data(0, Qt.ItemDataRole.UserRole)
-                if article_id:
-                    selected_ids.append(article_id)
+            selected_ids = self.article_list.checked_ids()
             
             if selected_ids:
                 self.selected_articles[self.current_namespace] = selected_ids
@@ -583,7 +817,7 @@ class ArticleSelectionDialog(QDialog):
 
     @asyncSlot()
     async def select_all_books_in_dialog(self):
-        """在对话框中全选所有知识库的文章"""
+        """在对话框中全选所有知识库的文章，各知识库的文章列表并发获取"""
         if not hasattr(self, 'books_info') or not self.books_info:
             self.status_label.setText("没有可用的知识库")
             return
@@ -594,31 +828,50 @@ class ArticleSelectionDialog(QDialog):
         self.select_all_books_btn.setEnabled(False)
         self.ok_button.setEnabled(False)
 
-        count = 0
-        total = len(self.books_info)
-        
+        names = {}
         for item in self.books_info:
             namespace = resolve_book_namespace(item)
-            
             if namespace:
-                self.status_label.setText(f"正在加载({count+1}/{total}): {item.name}")
-                # 强制刷新 UI
-                from PyQt6.QtWidgets import QApplication
-                QApplication.processEvents()
-                
-                docs = await self.controller.get_articles(namespace)
-                if docs:
+                names[namespace] = item.name
+        total = len(names)
+
+        self.load_progress_bar.setMaximum(max(total, 1))
+        self.load_progress_bar.setValue(0)
+        self.load_progress_bar.setVisible(True)
+
+        loaded = 0
+        failed = 0
+        results = self.controller.iter_articles(names)
+        try:
+            async for namespace, docs in results:
+                loaded += 1
+                if isinstance(docs, dict):
+                    failed += 1
+                    if docs.get("error") == "cookies_expired":
+                        self.status_label.setText(docs.get("message", "登录已过期，请重新登录"))
+                        return
+                elif docs:
                     self.selected_articles[namespace] = [
                         doc.get('id') for doc in docs if isinstance(doc, dict) and doc.get('id')
                     ]
-            count += 1
 
-        self.status_label.setText(
-            f"已选择所有知识库的文章，共 {sum(len(articles) for articles in self.selected_articles.values())} 篇")
-        self.update_total_selected()
-        
-        self.select_all_books_btn.setEnabled(True)
-        self.ok_button.setEnabled(True)
+                # 每个知识库完成后立即刷新进度和已选数量
+                self.load_progress_bar.setValue(loaded)
+                self.load_progress_bar.setFormat(f"已加载 {loaded}/{total} 个知识库")
+                self.status_label.setText(f"已加载({loaded}/{total}): {names[namespace]}")
+                self.update_total_selected()
+
+            message = f"已选择所有知识库的文章，共 {sum(len(articles) for articles in self.selected_articles.values())} 篇"
+            if failed:
+                message += f"，{failed} 个知识库加载失败"
+            self.status_label.setText(message)
+        finally:
+            # 提前结束时取消尚未完成的请求
+            await results.aclose()
+            self.update_total_selected()
+            self.load_progress_bar.setVisible(False)
+            self.select_all_books_btn.setEnabled(True)
+            self.ok_button.setEnabled(True)
 
 
 class ArticleManagerMixin:
@@ -635,7 +888,7 @@ class ArticleManagerMixin:
         """打开文章选择界面"""
         from src.libs.tools import get_cache_books_info
         # 创建并显示文章选择对话框
-        books_info = get_cache_books_info()
+        books_info = get_cache_books_info(allow_stale=True)
         if not books_info:
             QMessageBox.warning(self, "无法获取知识库信息", "请重新登录")
             return
@@ -685,15 +938,13 @@ class ArticleManagerMixin:
 
         # 没有选中的知识库，清空文章列表
         if not selected_items:
-            self.article_list.clear()
             self.article_search_input.setEnabled(False)
             self.select_all_articles_btn.setEnabled(False)
             self.deselect_all_articles_btn.setEnabled(False)
             self.selected_article_count_label.setText("已选: 0")
 
             # 添加提示信息
-            hint_item = QTreeWidgetItem(self.article_list, ["请从左侧选择一个知识库以加载文章列表"])
-            hint_item.setFlags(Qt.ItemFlag.NoItemFlags)
+            self.article_list.show_message("请从左侧选择一个知识库以加载文章列表")
             return
 
         # 启用文章相关控件
@@ -708,12 +959,12 @@ class ArticleManagerMixin:
             book_name = name_data if name_data else item.text().strip()
             namespace = item.data(Qt.ItemDataRole.UserRole)
             if not namespace:
-                self.article_list.clear()
-                error_item = QTreeWidgetItem(self.article_list, ["该知识库缺少必要的命名空间信息"])
-                error_item.setFlags(Qt.ItemFlag.NoItemFlags)
+                self.article_list.show_message("该知识库缺少必要的命名空间信息")
                 return
 
             self.load_articles_for_book(namespace, book_name)
+            if hasattr(self, 'prefetch_books_near'):
+                self.prefetch_books_near(namespace)
         else:
             # 选中多个知识库，检查是否为全选
             total_books = self.book_list.count()
@@ -734,10 +985,7 @@ class ArticleManagerMixin:
             namespace: 知识库的命名空间
             book_name: 知识库的名称
         """
-        self.article_list.clear()
-
-        loading_item = QTreeWidgetItem(self.article_list, ["正在加载文章列表..."])
-        loading_item.setFlags(Qt.ItemFlag.NoItemFlags)
+        self.article_list.show_message("正在加载文章列表...")
 
         # 更新状态
         self.current_namespace = namespace
@@ -755,8 +1003,11 @@ class ArticleManagerMixin:
         self.select_all_articles_btn.setEnabled(True)
         self.deselect_all_articles_btn.setEnabled(True)
 
-        # 异步加载文章列表
-        docs = await self.article_controller.get_articles(namespace)
+        # 异步加载文章列表 (优先使用后台预取结果)
+        if hasattr(self, 'toc_prefetcher'):
+            docs = await self.toc_prefetcher.fetch(namespace)
+        else:
+            docs = await self.article_controller.get_articles(namespace)
         self.display_articles(docs, book_name)
 
     def display_articles(self, articles, book_name):
@@ -767,13 +1018,10 @@ class ArticleManagerMixin:
             book_name: 知识库名称
         """
         try:
-            self.article_list.clear()
-
             # 检查是否有错误信息
             if isinstance(articles, dict) and "error" in articles:
                 error_msg = articles.get("message", "未知错误")
-                error_item = QTreeWidgetItem(self.article_list, [f"加载失败: {error_msg}"])
-                error_item.setFlags(Qt.ItemFlag.NoItemFlags)
+                self.article_list.show_message(f"加载失败: {error_msg}")
 
                 # 更新状态
                 self.status_label.setText(f"知识库 {book_name} 文章加载失败")
@@ -787,123 +1035,17 @@ class ArticleManagerMixin:
                 return
 
             if not articles:
-                empty_item = QTreeWidgetItem(self.article_list, [f"知识库 {book_name} 没有文章"])
-                empty_item.setFlags(Qt.ItemFlag.NoItemFlags)
+                self.article_list.show_message(f"知识库 {book_name} 没有文章")
 
                 self.status_label.setText(f"知识库 {book_name} 没有文章")
                 if hasattr(self, 'log_handler'):
                     self.log_handler.emit_log(f"知识库 {book_name} 没有文章")
                 return
 
-            # 处理层级关系
-            try:
-                if not isinstance(articles[0], dict):
-                    articles = [{k: v for k, v in obj.__dict__.items() if not k.startswith('_')} for obj in articles]
-                
-                uuid_to_article = {}
-                for article in articles:
-                    uuid = article.get('uuid')
-                    if uuid:
-                        uuid_to_article[uuid] = article
-                
-                def build_hierarchy(items):
-                    for item in items:
-                        item['children'] = []
-                    
-                    for item in items:
-                        parent_uuid = item.get('parent_uuid')
-                        if parent_uuid and parent_uuid in uuid_to_article:
-                            parent = uuid_to_article[parent_uuid]
-                            parent['children'].append(item)
-                    
-                    root_items = [item for item in items if item.get('level') == 0]
-                    root_items.sort(key=lambda x: ((x.get('type', 'DOC') != 'TITLE'), x.get('title', '')))
-                    
-                    def sort_children_recursive(items):
-                        for item in items:
-                            if item['children']:
-                                item['children'].sort(key=lambda x: ((x.get('type', 'DOC') != 'TITLE'), x.get('title', '')))
-                                sort_children_recursive(item['children'])
-                    
-                    sort_children_recursive(root_items)
-                    return root_items
-                
-                hierarchy = build_hierarchy(articles)
-                
-                def add_items_recursive(items, parent_item):
-                    for item in items:
-                        title = item.get('title', 'Untitled')
-                        item_type = item.get('type', 'DOC').upper()
-                        updated_at = item.get('updated_at', '')
-                        
-                        display_title = title
-                        
-                        if parent_item == self.article_list:
-                            tree_item = QTreeWidgetItem(self.article_list, [display_title])
-                        else:
-                            tree_item = QTreeWidgetItem(parent_item, [display_title])
-                        
-                        tree_item.setIcon(0, get_article_icon(item_type, item))
-                        
-                        font = QFont()
-                        if item_type == 'TITLE':
-                            font.setBold(True)
-                        else:
-                            tree_item.setFont(0, font)
-                        
-                        if updated_at:
-                            try:
-                                updated_date = updated_at.split('T')[0]
-                                tree_item.setToolTip(0, f"标题: {title}\n类型: {item_type}\n更新时间: {updated_date}")
-                            except:
-                                tree_item.setToolTip(0, f"标题: {title}\n类型: {item_type}")
-                        else:
-                            tree_item.setToolTip(0, f"标题: {title}\n类型: {item_type}")
-                        
-                        tree_item.setData(0, Qt.ItemDataRole.UserRole, item.get('id', ''))
-                        tree_item.setData(0, Qt.ItemDataRole.UserRole + 1, item)
-                        
-                        if hasattr(self, '_current_answer') and hasattr(self._current_answer, 'selected_docs') and \
-                                self.current_namespace in self._current_answer.selected_docs and \
-                                item.get('id', '') in self._current_answer.selected_docs[self.current_namespace]:
-                            tree_item.setSelected(True)
-                        
-                        if 'children' in item and item['children']:
-                            add_items_recursive(item['children'], tree_item)
-                
-                add_items_recursive(hierarchy, self.article_list)
-                self.article_list.expandAll()
-                
-            except Exception as hierarchy_error:
-                if hasattr(self, 'log_handler'):
-                    self.log_handler.emit_log(f"处理文章层级时出错: {str(hierarchy_error)}，显示未分级列表")
-                self.article_list.clear()
-
-                for article in articles:
-                    try:
-                        if isinstance(article, dict):
-                            title = article.get('title', 'Untitled')
-                            item_type = article.get('type', 'DOC').upper()
-                        else:
-                            title = getattr(article, 'title', 'Untitled')
-                            item_type = getattr(article, 'type', 'DOC').upper()
-                        
-                        display_title = title
-                        
-                        tree_item = QTreeWidgetItem(self.article_list, [display_title])
-                        tree_item.setIcon(0, get_article_icon(item_type, article))
-                        
-                        if item_type == 'TITLE':
-                            font = tree_item.font(0)
-                            font.setBold(True)
-                            tree_item.setFont(0, font)
-                        
-                        if isinstance(article, dict):
-                            tree_item.setData(0, Qt.ItemDataRole.UserRole, article.get('id', ''))
-                        else:
-                            tree_item.setData(0, Qt.ItemDataRole.UserRole, getattr(article, 'id', ''))
-                    except:
-                        continue
+            selected_ids = ()
+            if hasattr(self, '_current_answer') and hasattr(self._current_answer, 'selected_docs'):
+                selected_ids = self._current_answer.selected_docs.get(self.current_namespace, ())
+            self.article_list.load_articles(articles, selected_ids)
 
             self.status_label.setText(f"知识库 {book_name} 共有 {len(articles)} 篇文章")
             if hasattr(self, 'log_handler'):
@@ -912,9 +1054,7 @@ class ArticleManagerMixin:
 
         except Exception as e:
             error_msg = str(e)
-            self.article_list.clear()
-            error_item = QTreeWidgetItem(self.article_list, [f"显示文章列表出错: {error_msg}"])
-            error_item.setFlags(Qt.ItemFlag.NoItemFlags)
+            self.article_list.show_message(f"显示文章列表出错: {error_msg}")
 
             self.status_label.setText(f"显示文章列表出错")
             if hasattr(self, 'log_handler'):
@@ -927,9 +1067,7 @@ class ArticleManagerMixin:
             error_msg: 错误信息
             book_name: 知识库名称
         """
-        self.article_list.clear()
-        error_item = QTreeWidgetItem(self.article_list, [f"加载失败: {error_msg}"])
-        error_item.setFlags(Qt.ItemFlag.NoItemFlags)
+        self.article_list.show_message(f"加载失败: {error_msg}")
 
         # 记录错误到日志
         if hasattr(self, 'log_handler'):
@@ -948,59 +1086,26 @@ class ArticleManagerMixin:
         Args:
             text: 过滤文本
         """
-        filter_text = text.lower()
-        
-        def update_visibility(item):
-            """更新文章可见性"""
-            is_match = filter_text in item.text(0).lower()
-            
-            child_match = False
-            for i in range(item.childCount()):
-                if update_visibility(item.child(i)):
-                    child_match = True
-            
-            should_show = is_match or child_match
-            item.setHidden(not should_show)
-            
-            if child_match and not is_match:
-                item.setExpanded(True)
-                
-            return should_show
-
-        for i in range(self.article_list.topLevelItemCount()):
-            update_visibility(self.article_list.topLevelItem(i))
+        self.article_list.set_filter_text(text)
 
     def select_all_articles(self):
         """全选当前显示的所有文章"""
-        iterator = QTreeWidgetItemIterator(self.article_list)
-        while iterator.value():
-            item = iterator.value()
-            if not item.isHidden():  # 只选择可见项目
-                item.setSelected(True)
-            iterator += 1
+        self.article_list.set_all_checked(True)  # 只选择可见项目
 
     def deselect_all_articles(self):
         """取消选择当前知识库的所有文章"""
-        iterator = QTreeWidgetItemIterator(self.article_list)
-        while iterator.value():
-            item = iterator.value()
-            item.setSelected(False)
-            iterator += 1
+        self.article_list.set_all_checked(False, visible_only=False)
 
     def update_article_selection(self):
         """更新选中的文章"""
         try:
-            count = len(self.article_list.selectedItems())
+            count = self.article_list.checked_count()
             self.selected_article_count_label.setText(f"已选: {count}")
 
             # 如果有文章被选中，则创建或更新MutualAnswer对象来存储选中的文章
             if hasattr(self, 'current_namespace') and self.current_namespace:
                 # 获取当前选中的所有文章ID
-                selected_ids = []
-                for item in self.article_list.selectedItems():
-                    article_id = item.data(0, Qt.ItemDataRole.UserRole)
-                    if article_id:
-                        selected_ids.append(article_id)
+                selected_ids = self.article_list.checked_ids()
 
                 # 存储选择的文章ID
                 if not hasattr(self, '_current_answer'):
@@ -1041,12 +1146,10 @@ class ArticleManagerMixin:
 
     def display_all_books_selected_message(self):
         """显示全选知识库时的提示信息"""
-        self.article_list.clear()
-
         # 添加提示信息
-        info_item = QTreeWidgetItem(self.article_list, ["当前已全选知识库，将导出所有知识库的全部文章"])
-        info_item.setFlags(Qt.ItemFlag.NoItemFlags)
-        info_item.setFont(0, QFont("Arial", 12, QFont.Weight.Bold))
+        self.article_list.show_message(
+            ("当前已全选知识库，将导出所有知识库的全部文章", QFont("Arial", 12, QFont.Weight.Bold), None)
+        )
 
         # 禁用文章相关控件
         self.article_search_input.setEnabled(False)
@@ -1061,25 +1164,19 @@ class ArticleManagerMixin:
 
     def display_selected_books_only(self, selected_items):
         """显示已选择的知识库名称，不显示具体文章"""
-        self.article_list.clear()
-
         # 添加说明信息
-        info_item = QTreeWidgetItem(self.article_list, ["已选择以下知识库（将导出所选知识库内的全部文章）:"])
-        info_item.setFlags(Qt.ItemFlag.NoItemFlags)
-        info_item.setFont(0, QFont("Arial", 10, QFont.Weight.Bold))
+        messages = [("已选择以下知识库（将导出所选知识库内的全部文章）:", QFont("Arial", 10, QFont.Weight.Bold), None)]
 
         # 显示选中的知识库
         book_icon = QIcon(static_resource_path("src/ui/themes/resources/icons/yuque-book.svg"))
         for item in selected_items:
             name_data = item.data(Qt.ItemDataRole.UserRole + 1)
             book_name = name_data if name_data else item.text().strip()
-            book_item = QTreeWidgetItem(self.article_list, [book_name])
-            book_item.setIcon(0, book_icon)
-            book_item.setFlags(Qt.ItemFlag.NoItemFlags)
+            messages.append((book_name, None, book_icon))
 
         # 添加提示信息
-        tip_item = QTreeWidgetItem(self.article_list, ["提示: 导出时将包含所选知识库的全部文章"])
-        tip_item.setFlags(Qt.ItemFlag.NoItemFlags)
+        messages.append("提示: 导出时将包含所选知识库的全部文章")
+        self.article_list.show_message(*messages)
 
         # 更新状态
         self.status_label.setText(f"已选择 {len(selected_items)} 个知识库")
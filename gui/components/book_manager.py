@@ -4,12 +4,13 @@ URL: https://github.com/Be1k0/YuQue-BdT
 '''
 
 from qasync import asyncSlot
-from PyQt6.QtWidgets import QMessageBox, QListWidgetItem, QTreeWidgetItem
+from PyQt6.QtWidgets import QMessageBox, QListWidgetItem
 from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QIcon
 from src.libs.log import Log
+from src.libs.search_index import SearchIndex
 from src.libs.tools import resolve_book_namespace
-from utils import static_resource_path
+from utils import static_resource_path, apply_visible_mask
 
 class BookManagerMixin:
     """知识库管理器类
@@ -24,14 +25,22 @@ class BookManagerMixin:
             self._book_controller = BookController()
         return self._book_controller
 
+    @property
+    def toc_prefetcher(self):
+        """获取 TocPrefetchController 实例，使用懒加载方式"""
+        if not hasattr(self, '_toc_prefetcher'):
+            from gui.controllers.prefetch_controller import TocPrefetchController
+            self._toc_prefetcher = TocPrefetchController(self.article_controller)
+        return self._toc_prefetcher
+
     @asyncSlot()
     async def load_books(self):
         """加载知识库列表"""
         self.book_list.clear()
         self.progress_label.setText("正在加载知识库列表...")
 
-        # 使用 controller 异步获取数据
-        books_info = await self.book_controller.get_books()
+        # 使用 controller 异步获取数据，命中缓存时先显示缓存列表，后台刷新后原地更新
+        books_info = await self.book_controller.get_books(on_refresh=self.refresh_books_in_place)
 
         if books_info:
             self.display_books(books_info)
@@ -47,6 +56,34 @@ class BookManagerMixin:
         except:
             pass
 
+        owner_books, other_books = self._populate_book_list(books_info)
+
+        # 记录到日志中
+        self.progress_bar.setValue(0)
+
+        # 首次加载完成后显示默认提示
+        self.article_list.show_message("请从左侧选择一个知识库以加载文章列表")
+
+        # 重置文章选择状态
+        self.selected_article_count_label.setText("已选: 0")
+        self.update_selected_count()
+
+        # 重新连接知识库选择变化的信号
+        self.book_list.itemSelectionChanged.connect(self.book_selection_changed)
+
+        # 如果有搜索文本，应用过滤
+        if hasattr(self, 'search_input') and self.search_input.text():
+            self.filter_books(self.search_input.text())
+
+        # 后台预取最近更新的知识库目录
+        self.toc_prefetcher.start(owner_books + other_books)
+
+    def _populate_book_list(self, books_info):
+        """按 个人 -> 团队/协作、名称排序填充知识库列表并重建搜索索引
+
+        Returns:
+            (个人知识库列表, 其他知识库列表)
+        """
         self.book_list.clear()
 
         # 先按所有者类型和名称排序
@@ -88,24 +125,73 @@ class BookManagerMixin:
             self.book_list.addItem(list_item)
             Log.info(f"知识库已加载: {item.name} -> {namespace}")
 
-        # 记录到日志中
-        self.progress_bar.setValue(0)
+        # 构建知识库名称搜索索引
+        self._book_items = [self.book_list.item(i) for i in range(self.book_list.count())]
+        self._book_search_index = SearchIndex([item.name for item in owner_books + other_books])
+        self._book_visible_mask = None
 
-        # 首次加载完成后显示默认提示
-        self.article_list.clear()
-        hint_item = QTreeWidgetItem(self.article_list, ["请从左侧选择一个知识库以加载文章列表"])
-        hint_item.setFlags(Qt.ItemFlag.NoItemFlags)
+        self._book_namespaces = [item.data(Qt.ItemDataRole.UserRole) for item in self._book_items]
+        self._book_signature = self._books_signature(owner_books + other_books)
+        return owner_books, other_books
 
-        # 重置文章选择状态
-        self.selected_article_count_label.setText("已选: 0")
-        self.update_selected_count()
+    @staticmethod
+    def _books_signature(books):
+        """列表展示相关字段的摘要，用于判断刷新后的列表是否有变化"""
+        return [
+            (resolve_book_namespace(book), book.name, book.items_count, getattr(book, 'book_type', ''))
+            for book in books
+        ]
 
-        # 重新连接知识库选择变化的信号
-        self.book_list.itemSelectionChanged.connect(self.book_selection_changed)
+    def refresh_books_in_place(self, books_info):
+        """后台刷新完成后原地更新知识库列表
+
+        内容没有变化时不做任何操作；有变化时重建列表项，保留当前选中的知识库和搜索过滤，
+        不触发文章列表重新加载。
+        """
+        if not books_info or not hasattr(self, '_book_items'):
+            return
+        ordered = sorted(
+            books_info,
+            key=lambda x: (getattr(x, 'book_type', '') != "owner", x.name)
+        )
+        if self._books_signature(ordered) == getattr(self, '_book_signature', None):
+            return
+
+        selected = {item.data(Qt.ItemDataRole.UserRole) for item in self.book_list.selectedItems()}
+        self.book_list.blockSignals(True)
+        try:
+            owner_books, other_books = self._populate_book_list(books_info)
+            for item in self._book_items:
+                if item.data(Qt.ItemDataRole.UserRole) in selected:
+                    item.setSelected(True)
+        finally:
+            self.book_list.blockSignals(False)
 
-        # 如果有搜索文本，应用过滤
         if hasattr(self, 'search_input') and self.search_input.text():
             self.filter_books(self.search_input.text())
+        if len(self.book_list.selectedItems()) != len(selected):
+            # 选中的知识库已不存在
+            self.update_selected_count()
+        Log.info(f"知识库列表已更新，共 {len(self._book_items)} 个知识库")
+        self.toc_prefetcher.start(owner_books + other_books)
+
+    def prefetch_books_near(self, namespace):
+        """优先预取列表中与指定知识库相邻的知识库目录
+        
+        Args:
+            namespace: 当前选中的知识库命名空间
+        """
+        namespaces = getattr(self, '_book_namespaces', [])
+        if namespace not in namespaces:
+            return
+        row = namespaces.index(namespace)
+        span = self.toc_prefetcher.NEIGHBOR_RANGE
+        neighbors = []
+        for offset in range(1, span + 1):
+            for neighbor_row in (row + offset, row - offset):
+                if 0 <= neighbor_row < len(namespaces):
+                    neighbors.append(namespaces[neighbor_row])
+        self.toc_prefetcher.prioritize(neighbors)
 
     def filter_books(self, text):
         """根据输入过滤知识库列表
@@ -113,12 +199,12 @@ class BookManagerMixin:
         Args:
             text: 输入的过滤文本
         """
-        filter_text = text.lower()
-        for i in range(self.book_list.count()):
-            item = self.book_list.item(i)
-            name_data = item.data(Qt.ItemDataRole.UserRole + 1)
-            book_name = name_data.lower() if name_data else item.text().strip().lower()
-            item.setHidden(filter_text not in book_name)
+        index = getattr(self, '_book_search_index', None)
+        if index is None or len(index) != self.book_list.count():
+            return
+        self._book_visible_mask = apply_visible_mask(
+            self._book_items, index.visible_mask(text), self._book_visible_mask
+        )
 
     def select_all_books(self):
         """全选所有知识库"""
@@ -141,10 +227,8 @@ class BookManagerMixin:
             if hasattr(self, 'log_handler'):
                 self.log_handler.emit_log(f"加载文章列表出错: {error_msg}")
 
-            self.article_list.clear()
             self.update_selected_count()
-            error_item = QTreeWidgetItem(self.article_list, [f"加载失败: {error_msg}"])
-            error_item.setFlags(Qt.ItemFlag.NoItemFlags)
+            self.article_list.show_message(f"加载失败: {error_msg}")
 
     def update_selected_count(self):
         """更新已选知识库数量"""
@@ -152,9 +236,7 @@ class BookManagerMixin:
         self.selected_count_label.setText(f"已选: {count}")
 
         if count > 1:
-            self.article_list.clear()
-            hint_item = QTreeWidgetItem(self.article_list, ["已选择多个知识库，将导出所有知识库的全部文章"])
-            hint_item.setFlags(Qt.ItemFlag.NoItemFlags)
+            self.article_list.show_message("已选择多个知识库，将导出所有知识库的全部文章")
             self.selected_article_count_label.setText("已选: 全部")
         elif count == 0:
             self.article_list.clear()
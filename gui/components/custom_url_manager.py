@@ -9,7 +9,9 @@ from PyQt6.QtWidgets import (
     QCheckBox, QGroupBox, QMessageBox, QAbstractItemView, QFileDialog, QTreeWidgetItem, QTreeWidgetItemIterator, QComboBox, QGridLayout
 )
 from PyQt6.QtCore import Qt
+from src.libs.search_index import SearchIndex
 from src.ui.font_utils import stabilize_combo_box_font
+from utils import Debouncer, apply_visible_mask
 
 class CustomUrlManagerMixin:
     """公开知识库导出管理器类
@@ -81,7 +83,7 @@ class CustomUrlManagerMixin:
         search_label = QLabel("搜索文章:")
         self.custom_article_search_input = QLineEdit()
         self.custom_article_search_input.setPlaceholderText("输入关键词过滤文章")
-        self.custom_article_search_input.textChanged.connect(self.filter_custom_articles)
+        self.custom_article_search_input.textChanged.connect(Debouncer(self.filter_custom_articles, parent=self).trigger)
         search_layout.addWidget(search_label)
         search_layout.addWidget(self.custom_article_search_input)
         left_layout.addLayout(search_layout)
@@ -282,13 +284,13 @@ class CustomUrlManagerMixin:
     async def on_parse_started(self):
         """解析开始"""
         self.parse_btn.setEnabled(False)
-        self.custom_article_list.clear()
+        self._clear_custom_article_list()
         QTreeWidgetItem(self.custom_article_list, ["正在解析，请稍候..."])
         self.custom_status_label.setText("正在解析...")
 
     def on_browser_launched(self):
         """浏览器启动"""
-        self.custom_article_list.clear()
+        self._clear_custom_article_list()
         QTreeWidgetItem(self.custom_article_list, ["请在浏览器中输入知识库密码..."])
         QTreeWidgetItem(self.custom_article_list, ["输入正确密码后软件将自动开始解析..."])
         self.custom_status_label.setText("等待输入密码...")
@@ -296,7 +298,7 @@ class CustomUrlManagerMixin:
     def on_parse_finished(self, docs):
         """解析完成,显示文档列表"""
         self.parse_btn.setEnabled(True)
-        self.custom_article_list.clear()
+        self._clear_custom_article_list()
         self.custom_status_label.setText(f"解析完成,共找到 {len(docs)} 篇文档")
         
         if not docs:
@@ -308,7 +310,7 @@ class CustomUrlManagerMixin:
     def on_parse_failed(self, error):
         """解析失败"""
         self.parse_btn.setEnabled(True)
-        self.custom_article_list.clear()
+        self._clear_custom_article_list()
         QTreeWidgetItem(self.custom_article_list, [f"解析失败: {error}"])
         QMessageBox.critical(self, "错误", f"{error}")
         self.custom_status_label.setText("解析失败")
@@ -412,27 +414,34 @@ class CustomUrlManagerMixin:
         msg += "\u00A0" * 25
         QMessageBox.information(self, "导出完成", msg)
 
+    def _clear_custom_article_list(self):
+        """清空文章列表及其搜索索引"""
+        self.custom_article_list.clear()
+        self._custom_items = []
+        self._custom_search_index = None
+        self._custom_visible_mask = None
+
+    def _build_custom_search_index(self, items, titles, parents):
+        """为已显示的文章项构建搜索索引，并应用当前的过滤文本"""
+        self._custom_items = items
+        self._custom_search_index = SearchIndex(titles, parents)
+        self._custom_visible_mask = None
+        text = self.custom_article_search_input.text()
+        if text:
+            self.filter_custom_articles(text)
+
     def filter_custom_articles(self, text):
-        """根据输入过滤文章列表
+        """根据输入过滤文章列表，显示匹配的文章及其上级目录
         
         Args:
             text: 输入的过滤文本
         """
-        filter_text = text.lower()
-        iterator = QTreeWidgetItemIterator(self.custom_article_list)
-        while iterator.value():
-            item = iterator.value()
-
-            # 检查文档项是否匹配
-            doc = item.data(0, Qt.ItemDataRole.UserRole)
-            if doc and isinstance(doc, dict):
-                title = doc.get('title', '').lower()
-                match = filter_text in title
-            else:
-                match = True
-                    
-            item.setHidden(not match)
-            iterator += 1
+        index = getattr(self, '_custom_search_index', None)
+        if index is None:
+            return
+        self._custom_visible_mask = apply_visible_mask(
+            self._custom_items, index.visible_mask(text), self._custom_visible_mask
+        )
             
     def select_all_custom_articles(self):
         """全选当前显示的公开知识库文章"""
@@ -449,6 +458,8 @@ class CustomUrlManagerMixin:
     
     def _display_docs_with_hierarchy(self, docs):
         """显示文档列表,支持层级结构"""
+        from gui.components.article_manager import get_article_icon
+
         try:
             from PyQt6.QtGui import QFont
             
@@ -482,8 +493,10 @@ class CustomUrlManagerMixin:
             
             sort_children_recursive(root_docs)
             
-            # 递归显示层级结构
-            def add_items_recursive(items, parent_item):
+            # 递归显示层级结构，同时按先序记录文章项供搜索索引使用
+            tree_items, titles, parents = [], [], []
+
+            def add_items_recursive(items, parent_item, parent_index=-1):
                 for item in items:
                     title = item.get('title', '无标题')
                     item_type = item.get('type', 'doc').upper()
@@ -495,7 +508,6 @@ class CustomUrlManagerMixin:
                     else:
                         tree_item = QTreeWidgetItem(parent_item, [display_title])
                     
-                    from gui.components.article_manager import get_article_icon
                     tree_item.setIcon(0, get_article_icon(item_type, item))
                     
                     # 设置样式
@@ -507,27 +519,35 @@ class CustomUrlManagerMixin:
                     # 存储完整的文档数据
                     tree_item.setData(0, Qt.ItemDataRole.UserRole, item)
                     tree_item.setData(0, Qt.ItemDataRole.UserRole + 1, item)
+
+                    tree_items.append(tree_item)
+                    titles.append(title)
+                    parents.append(parent_index)
                     
                     # 递归添加子项
                     if item.get('children'):
-                        add_items_recursive(item['children'], tree_item)
+                        add_items_recursive(item['children'], tree_item, len(tree_items) - 1)
             
             # 添加层级结构到列表
             add_items_recursive(root_docs, self.custom_article_list)
             self.custom_article_list.expandAll()
+            self._build_custom_search_index(tree_items, titles, parents)
             
         except Exception as e:
             # 如果层级处理失败,使用简单显示
             self.log_handler.emit_log(f"层级显示失败,使用简单模式: {str(e)}")
+            self._clear_custom_article_list()
+            tree_items = []
             for doc in docs:
                 title = doc.get('title', '无标题')
                 item_type = doc.get('type', 'doc').upper()
                 display_title = title
                 
                 tree_item = QTreeWidgetItem(self.custom_article_list, [display_title])
-                from gui.components.article_manager import get_article_icon
                 tree_item.setIcon(0, get_article_icon(item_type, doc))
                 tree_item.setData(0, Qt.ItemDataRole.UserRole, doc)
+                tree_items.append(tree_item)
+            self._build_custom_search_index(tree_items, [doc.get('title', '无标题') for doc in docs], None)
     
     def select_custom_output_dir(self):
         """选择公开知识库导出导出的输出目录"""
@@ -7,7 +7,11 @@ import os
 from PyQt6.QtWidgets import QMessageBox, QFileDialog, QTabWidget
 from PyQt6.QtCore import Qt
 from src.libs.constants import GLOBAL_CONFIG, MutualAnswer
+from src.libs.export_job import answer_files, answer_markdown_meta
 from src.libs.log import Log
+from src.libs.metrics import Metrics
+from src.libs.tracing import Tracer
+from utils import ProgressPublisher
 from qasync import asyncSlot
 
 class ExportManagerMixin:
@@ -23,6 +27,14 @@ class ExportManagerMixin:
             self._export_controller = ExportController()
         return self._export_controller
 
+    @property
+    def export_progress_publisher(self):
+        """获取导出进度发布器，按固定帧率把进度快照推送到界面"""
+        if not hasattr(self, '_export_progress_publisher'):
+            self._export_progress_publisher = ProgressPublisher(self.export_controller.progress, parent=self)
+            self._export_progress_publisher.snapshot_ready.connect(self._on_progress_snapshot)
+        return self._export_progress_publisher
+
     def select_output_dir(self):
         """选择输出目录"""
         dir_path = QFileDialog.getExistingDirectory(
@@ -36,7 +48,11 @@ class ExportManagerMixin:
 
     @asyncSlot()
     async def start_export(self):
-        """开始导出知识库"""
+        """开始导出知识库，导出进行中再次点击则取消导出"""
+        if getattr(self, '_export_running', False):
+            self.cancel_export()
+            return
+
         selected_items = self.book_list.selectedItems()
         if not selected_items:
             QMessageBox.warning(self, "错误", "请先选择要导出的知识库")
@@ -117,16 +133,19 @@ class ExportManagerMixin:
                     self.log_handler.emit_log("调试模式已启用")
                 except:
                     pass
+                # 调试模式下同时记录请求耗时追踪，任务结束后写入 debug_logs
+                Tracer.enable()
+            elif not os.environ.get(Tracer.TRACE_ENV):
+                Tracer.disable()
+
+            Metrics.reset("export")
 
             # 连接信号
             try:
-                self.export_controller.export_progress.disconnect()
-                self.export_controller.image_download_progress.disconnect()
+                self.export_controller.image_download_finished.disconnect()
             except:
                 pass
             
-            self.export_controller.export_progress.connect(self._on_export_progress)
-            self.export_controller.image_download_progress.connect(self._on_image_download_progress)
             self.export_controller.image_download_finished.connect(self._on_image_download_finished)
 
             # 重置进度条
@@ -142,13 +161,23 @@ class ExportManagerMixin:
                 and self.download_images_checkbox.isChecked()
             )
 
+            # 创建任务句柄，上次导出到同一目录的任务被取消时从导出日志续传
+            self.export_controller.create_job(answer)
+
             # 禁用UI
             self._set_ui_enabled(False)
             
             self.log_handler.emit_log(f"正在导出 {export_info}...")
 
-            # 执行导出
-            await self.export_controller.export_books(answer)
+            # 执行导出，进度由发布器按固定帧率刷新到进度条
+            self.export_progress_publisher.start()
+            try:
+                completed = await self.export_controller.export_books(answer)
+            finally:
+                self.export_progress_publisher.stop()
+            if not completed:
+                self._on_export_cancelled()
+                return
             
             # 导出完成后，进度条设为100%
             self.progress_bar.setValue(self.progress_bar.maximum())
@@ -158,9 +187,10 @@ class ExportManagerMixin:
             if self._asset_download_requested:
                 self.progress_bar.setFormat("正在准备处理文档资源...")
                 self.log_handler.emit_log("开始处理 Markdown 文档中的文件链接...")
-                markdown_meta = getattr(answer, 'downloaded_markdown_meta', {})
+                # 导出的文件记录在导出日志中，这里一次性读回
+                markdown_meta = answer_markdown_meta(answer)
                 md_files = list(markdown_meta.keys()) or [
-                    path for path in getattr(answer, 'downloaded_files', []) if str(path).lower().endswith('.md')
+                    path for path in answer_files(answer) if str(path).lower().endswith('.md')
                 ]
                 
                 if md_files:
@@ -168,18 +198,26 @@ class ExportManagerMixin:
                     self.log_handler.emit_log(f"本次共导出 {count} 个 Markdown 文件，开始离线保存文档中的文件...")
                     self.progress_bar.setFormat("正在处理文档资源...")
                     
-                    await self.export_controller.download_images(
-                        md_files=md_files,
-                        download_threads=self.download_threads,
-                        doc_image_prefix=self.doc_image_prefix,
-                        image_rename_mode=self.image_rename_mode,
-                        image_file_prefix=self.image_file_prefix,
-                        yuque_cdn_domain=self.yuque_cdn_domain,
-                        markdown_meta=markdown_meta,
-                    )
+                    self.export_progress_publisher.start()
+                    try:
+                        await self.export_controller.download_images(
+                            md_files=md_files,
+                            download_threads=self.download_threads,
+                            doc_image_prefix=self.doc_image_prefix,
+                            image_rename_mode=self.image_rename_mode,
+                            image_file_prefix=self.image_file_prefix,
+                            yuque_cdn_domain=self.yuque_cdn_domain,
+                            markdown_meta=markdown_meta,
+                        )
+                    finally:
+                        self.export_progress_publisher.stop()
+                    if self.export_controller.job.cancelled:
+                        self._on_export_cancelled()
+                        return
                 else:
                     self.log_handler.emit_log("未找到 Markdown 文件，跳过文档资源处理")
 
+            self.export_controller.finish_job()
             self._on_all_finished(answer)
 
         except Exception as e:
@@ -191,8 +229,10 @@ class ExportManagerMixin:
         Args:
             enabled: 是否启用
         """
-        self.export_button.setEnabled(enabled)
-        self.export_button.setText("开始导出" if enabled else "导出中...")
+        # 导出过程中按钮用于取消导出
+        self._export_running = not enabled
+        self.export_button.setEnabled(True)
+        self.export_button.setText("开始导出" if enabled else "取消导出")
         self.book_list.setEnabled(enabled)
         self.skip_local_checkbox.setEnabled(enabled)
         self.keep_linebreak_checkbox.setEnabled(enabled)
@@ -202,6 +242,19 @@ class ExportManagerMixin:
         self.select_all_articles_btn.setEnabled(enabled)
         self.deselect_all_articles_btn.setEnabled(enabled)
 
+    def cancel_export(self):
+        """取消正在进行的导出"""
+        self.export_button.setEnabled(False)
+        self.export_button.setText("正在取消...")
+        self.export_controller.cancel_export()
+
+    def _on_export_cancelled(self):
+        """导出已取消：恢复界面，已完成的部分记录在导出日志中"""
+        self._set_ui_enabled(True)
+        self.progress_bar.setFormat("导出已取消")
+        self.status_label.setText("导出已取消")
+        self.log_handler.emit_log("导出已取消，再次导出到同一目录时将跳过已完成的文档")
+
     def _on_image_download_finished(self, processed_files, total_images):
         """文档资源处理完成回调
         
@@ -248,31 +301,68 @@ class ExportManagerMixin:
             f"任务完成! 下载: {downloaded}, 跳过: {skipped}, 失败: {failed_count}, "
             f"资源离线化: {getattr(self, '_total_localized_assets', 0)}"
         )
+
+        # 写出本次任务的运行指标汇总
+        job_result = {
+            "downloaded": downloaded,
+            "skipped": skipped,
+            "failed": failed_count,
+            "assets": getattr(self, '_total_localized_assets', 0),
+        }
+        metrics = Metrics.build_summary(job_result)
+        metrics_file = Metrics.write_summary(extra=job_result)
+        if metrics_file:
+            self.log_handler.emit_log(f"运行指标已保存: {metrics_file}")
+        markdown_stage = metrics["stages"].get("markdown_fetch", {})
+        msg += f"\n总耗时: {metrics['elapsed_seconds']:.1f} 秒，平均 {metrics['throughput']['docs_per_sec']:.2f} 篇/秒"
+        if markdown_stage.get("count"):
+            msg += f"\nMarkdown 获取耗时 P50/P99: {markdown_stage['p50_ms']:.0f}/{markdown_stage['p99_ms']:.0f} ms"
+        received = metrics["counters"].get("bytes_in", 0)
+        if received:
+            msg += f"\n接收数据量: {received / 1024 / 1024:.2f} MB"
+        if Tracer.enabled() and not os.environ.get(Tracer.TRACE_ENV):
+            trace_file = Tracer.dump()
+            if trace_file:
+                self.log_handler.emit_log(f"请求耗时追踪已保存: {trace_file}")
         msg += "\u00A0" * 25
         QMessageBox.information(self, "导出完成", msg)
 
-    def _on_image_download_progress(self, downloaded, total, current_filename):
-        """文档资源处理进度更新回调
+    @staticmethod
+    def _format_eta(seconds):
+        """格式化预计剩余时间"""
+        if seconds is None:
+            return "--:--"
+        minutes, secs = divmod(int(seconds), 60)
+        hours, minutes = divmod(minutes, 60)
+        return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes:02d}:{secs:02d}"
+
+    def _on_progress_snapshot(self, snapshot):
+        """进度快照回调，按固定帧率更新进度条
         
         Args:
-            downloaded: 已处理的资源数
-            total: 总资源数
-            current_filename: 当前处理的 Markdown 文件名
+            snapshot: 进度快照 (ProgressSnapshot)
         """
-        if total > 0:
-            progress = int((downloaded / total) * 100)
-            self.progress_bar.setValue(downloaded)
-            self.progress_bar.setMaximum(total)
-            article_name = current_filename.replace('.md', '') if current_filename.endswith('.md') else current_filename
-            self.progress_bar.setFormat(f"文章：{article_name} 正在处理文档资源（{downloaded}/{total}）{progress}%")
-
-    def _on_export_progress(self, message):
-        """导出进度回调
-        
-        Args:
-            message: 进度信息
-        """
-        self.progress_bar.setFormat(message)
+        if snapshot.total <= 0:
+            return
+        self.progress_bar.setMaximum(snapshot.total)
+        self.progress_bar.setValue(snapshot.done)
+
+        percent = int(snapshot.done / snapshot.total * 100)
+        current = "、".join(snapshot.current)
+        if snapshot.active > len(snapshot.current):
+            current += f" 等 {snapshot.active} 项"
+        eta = self._format_eta(snapshot.eta_seconds)
+        if snapshot.phase == "assets":
+            article_name = current[:-3] if current.endswith('.md') else current
+            text = f"文章：{article_name} 正在处理文档资源（{snapshot.done}/{snapshot.total}）{percent}%"
+        else:
+            text = f"已处理 {snapshot.done}/{snapshot.total} ({percent}%)"
+            if snapshot.failed:
+                text += f" 失败 {snapshot.failed}"
+            text += f" · {snapshot.rate:.1f} 篇/秒 · 剩余 {eta}"
+            if current:
+                text += f" · 正在处理: {current}"
+        self.progress_bar.setFormat(text)
 
     def on_export_error(self, error_msg):
         """导出出错的回调
@@ -281,6 +371,7 @@ class ExportManagerMixin:
             error_msg: 错误信息
         """
         # 启用UI元素
+        self._export_running = False
         self.export_button.setEnabled(True)
         self.export_button.setText("开始导出")
         self.book_list.setEnabled(True)
@@ -3,24 +3,31 @@ Author: Be1k0
 URL: https://github.com/Be1k0/YuQue-BdT
 '''
 
+import os
 import time
 from PyQt6.QtWidgets import (
-    QWidget, QVBoxLayout, QGroupBox, QTextEdit, 
+    QWidget, QVBoxLayout, QGroupBox, QPlainTextEdit, 
     QHBoxLayout, QPushButton, QFileDialog, QMessageBox
 )
 from PyQt6.QtGui import QFont
+from src.libs.constants import GLOBAL_CONFIG
 from src.libs.log import Log
-from utils import LogSignalHandler
+from utils import LogSignalHandler, BufferedLogSink
 
 class LogManagerMixin:
     """日志管理器类
     
     提供日志管理功能，包括日志记录、日志显示、日志保存等。
+    日志先写入缓冲区，由定时器批量刷新到日志窗口，完整日志保存在磁盘上。
     """
+    LOG_MAX_BLOCKS = 5000  # 日志窗口最多保留的行数
+    LOG_KEEP_FILES = 10  # 磁盘上最多保留的历史日志文件数
+
     def init_log_manager(self):
-        """初始化日志管理组件，设置日志信号处理和日志拦截"""
+        """初始化日志管理组件，设置日志缓冲区、日志信号处理和日志拦截"""
+        self.log_sink = BufferedLogSink(self.log_text_edit, self._create_log_file(), parent=self)
         self.appendLogSignal.connect(self.append_to_log)
-        self.log_handler = LogSignalHandler()
+        self.log_handler = LogSignalHandler(sink=self.log_sink)
         self.log_handler.log_signal.connect(self.update_progress_label)
         self.log_handler.progress_signal.connect(self.update_progress_bar)
         
@@ -37,9 +44,11 @@ class LogManagerMixin:
         group_layout = QVBoxLayout()
         group_layout.setContentsMargins(15, 20, 15, 15)
         
-        self.log_text_edit = QTextEdit()
+        self.log_text_edit = QPlainTextEdit()
         self.log_text_edit.setReadOnly(True)
-        self.log_text_edit.setLineWrapMode(QTextEdit.LineWrapMode.NoWrap)
+        self.log_text_edit.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
+        self.log_text_edit.setMaximumBlockCount(self.LOG_MAX_BLOCKS)
+        self.log_text_edit.setUndoRedoEnabled(False)
         self.log_text_edit.setFont(QFont("Consolas", 9))
         self.log_text_edit.setStyleSheet("background-color: #1e1e1e; color: #f8f9fa;")
         
@@ -82,32 +91,24 @@ class LogManagerMixin:
         
         return log_page
 
-    def append_to_log(self, text):
-        """使用信号槽机制安全地追加文本到日志窗口，根据类型设置不同颜色"""
-        # 根据日志类型设置不同颜色
-        # 根据日志类型设置适合深色背景(#1e1e1e)的不同高亮颜色
-        if "错误" in text:
-            color = '#ff6b6b'  # 亮红色
-        elif "成功" in text or "完成" in text:
-            color = '#51cf66'  # 亮绿色
-        elif "警告" in text:
-            color = '#fcc419'  # 亮黄色
-        elif "调试" in text:
-            color = '#adb5bd'  # 灰色
-        elif "加载" in text or "准备" in text:
-            color = '#339af0'  # 亮蓝色
-        elif "导出" in text:
-            color = '#4dabf7'  # 浅蓝色
-        elif "提示" in text or "信息" in text:
-            color = '#f8f9fa'  # 接近白色
-        else:
-            color = '#f8f9fa'  # 默认白色
-
-        # 使用HTML格式化文本颜色
-        # 强制左对齐
-        formatted_text = f'<div style="color:{color}; text-align: left;">{text}</div>'
-        self.log_text_edit.append(formatted_text)
+    def _create_log_file(self):
+        """创建本次运行的完整日志文件路径，并清理过旧的日志文件"""
+        log_dir = os.path.join(GLOBAL_CONFIG.meta_dir, "logs")
+        try:
+            os.makedirs(log_dir, exist_ok=True)
+            history = sorted(
+                name for name in os.listdir(log_dir)
+                if name.startswith("gui_") and name.endswith(".log")
+            )
+            for name in history[:max(0, len(history) - self.LOG_KEEP_FILES + 1)]:
+                os.remove(os.path.join(log_dir, name))
+        except OSError:
+            pass
+        return os.path.join(log_dir, time.strftime("gui_%Y%m%d_%H%M%S.log", time.localtime()))
 
+    def append_to_log(self, text):
+        """追加文本到日志缓冲区，颜色由缓冲区按日志级别统一设置"""
+        self.log_sink.push(text, timestamp=False)
 
     def update_progress_label(self, message):
         """更新进度标签的文本
@@ -115,9 +116,7 @@ class LogManagerMixin:
         Args:
             message (str): 要显示的文本
         """
-        timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
-        log_text = f"[{timestamp}] {message}"
-        self.appendLogSignal.emit(log_text)
+        self.log_sink.push(message)
 
 
     def update_progress_bar(self, current, total):
@@ -189,13 +188,12 @@ class LogManagerMixin:
         Log.warn = staticmethod(patched_warn)
 
     def clear_log(self):
-        """清空日志文本框"""
+        """清空日志文本框，磁盘上的完整日志不受影响"""
+        self.log_sink.flush()
         self.log_text_edit.clear()
 
     def save_log(self):
-        """保存日志到文件"""
-        import os
-        
+        """保存完整日志到文件"""
         file_path, _ = QFileDialog.getSaveFileName(
             self, "保存日志文件",
             os.path.join(os.path.expanduser("~"), "yuque_export_log.txt"),
@@ -205,7 +203,7 @@ class LogManagerMixin:
         if file_path:
             try:
                 with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(self.log_text_edit.toPlainText())
+                    f.write(self.log_sink.read_full_log())
                 QMessageBox.information(self, "保存成功", f"日志已保存到: {file_path}")
             except Exception as e:
                 QMessageBox.critical(self, "保存失败", f"保存日志出错: {str(e)}")
\ No newline at end of file
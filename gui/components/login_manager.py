@@ -57,6 +57,7 @@ class LoginManagerMixin:
             self._login_controller = LoginController()
             self._login_controller.login_failed.connect(self.on_any_login_error)
             self._login_controller.login_expired.connect(self.on_login_expired)
+            self._login_controller.user_info_updated.connect(lambda _: self.update_user_info_display())
             
         return self._login_controller
 
@@ -368,6 +369,19 @@ class LoginManagerMixin:
 
         if reply == QMessageBox.StandardButton.Yes:
             try:
+                # 停止后台目录预取
+                if hasattr(self, '_toc_prefetcher'):
+                    self._toc_prefetcher.cancel()
+                if hasattr(self, '_book_controller'):
+                    self._book_controller.cancel_refresh()
+                if hasattr(self, '_article_controller'):
+                    self._article_controller.cancel_refresh()
+                if hasattr(self, '_login_controller'):
+                    self._login_controller.revalidator.cancel()
+                # 丢弃内存中的资源元数据缓存，避免之后写回 .meta 被其他账号复用
+                from src.libs.markdown_asset_localizer import AssetMetaCache
+                AssetMetaCache.reset()
+
                 # 删除.meta文件夹下的所有文件
                 meta_dir = resource_path('.meta')
                 if os.path.exists(meta_dir):
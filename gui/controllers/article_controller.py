@@ -3,9 +3,11 @@ Author: Be1k0
 URL: https://github.com/Be1k0/YuQue-BdT
 '''
 
-from typing import List, Dict, Any
+import asyncio
+from typing import Any, AsyncIterator, Dict, Iterable, List, Tuple
 from gui.controllers.base_controller import BaseController
 from src.core.yuque import YuqueClient
+from src.libs.revalidate import CacheRevalidator
 from src.libs.exceptions import CookiesExpiredError, NetworkError
 
 class ArticleController(BaseController):
@@ -14,32 +16,91 @@ class ArticleController(BaseController):
     负责处理文章列表的获取和缓存等相关任务。
     """
     
+    FETCH_CONCURRENCY = 6  # 批量获取文章列表时的最大并发知识库数
+
     def __init__(self, client: YuqueClient = None):
         super().__init__()
         self.client = client or YuqueClient()
+        self.revalidator = CacheRevalidator()
+
+    async def iter_articles(self, namespaces: Iterable[str], concurrency: int = None) -> AsyncIterator[Tuple[str, Any]]:
+        """并发获取多个知识库的文章列表，按完成顺序逐个产出结果
+        
+        每个知识库仍通过 get_articles 获取，命中文档缓存时不发请求；
+        调用方提前结束迭代时，尚未完成的请求会被取消。
+        
+        Args:
+            namespaces: 知识库命名空间列表
+            concurrency: 最大并发数，默认 FETCH_CONCURRENCY
+            
+        Yields:
+            (namespace, 文章列表或错误信息字典)
+        """
+        semaphore = asyncio.Semaphore(concurrency or self.FETCH_CONCURRENCY)
+
+        async def fetch(namespace):
+            async with semaphore:
+                return namespace, await self.get_articles(namespace)
+
+        tasks = [asyncio.ensure_future(fetch(namespace)) for namespace in namespaces]
+        try:
+            for future in asyncio.as_completed(tasks):
+                yield await future
+        finally:
+            for task in tasks:
+                task.cancel()
         
     async def get_articles(self, namespace: str) -> List[Dict[str, Any]]:
         """获取指定知识库的文章列表
         
+        缓存最新时直接返回；缓存陈旧时先返回旧列表并在后台刷新；没有可用缓存时从远程获取。
+        同一知识库的并发请求 (前台点击、批量加载、后台预取) 共用同一次远程获取。
+        
         Args:
             namespace: 知识库命名空间
             
         Returns:
             List[Dict[str, Any]]: 文章列表，如果获取失败返回空列表或包含错误信息的字典
         """
-        import asyncio
-        from src.libs.tools import get_docs_cache, save_docs_cache
+        from src.libs.tools import get_docs_cache_entry
         
         if not namespace:
             self.log_error("尝试获取文章列表时 namespace 为空")
             return []
             
         # 尝试从缓存获取
-        cached_docs = get_docs_cache(namespace)
-        if cached_docs:
-            self.log_info(f"从缓存加载知识库 {namespace} 的文章列表")
-            return cached_docs
+        entry = get_docs_cache_entry(namespace)
+        if entry is not None and entry.value:
+            if entry.is_fresh:
+                self.log_info(f"从缓存加载知识库 {namespace} 的文章列表")
+            else:
+                self.log_info(f"从缓存加载知识库 {namespace} 的文章列表，后台刷新中")
+        else:
+            entry = None
+        return await self.revalidator.get(namespace, entry, lambda: self.fetch_articles(namespace))
+
+    async def refresh_articles(self, namespace: str) -> List[Dict[str, Any]]:
+        """从远程重新获取文章列表 (与进行中的同一知识库请求合并)
+        
+        调用方被取消时不会中断共用的请求。
+        """
+        return await asyncio.shield(self.revalidator.refresh(namespace, lambda: self.fetch_articles(namespace)))
+
+    def cancel_refresh(self) -> None:
+        """取消正在进行的文章列表获取"""
+        self.revalidator.cancel()
+
+    async def fetch_articles(self, namespace: str) -> List[Dict[str, Any]]:
+        """从远程获取文章列表并写入缓存，失败时重试
+        
+        Args:
+            namespace: 知识库命名空间
             
+        Returns:
+            List[Dict[str, Any]]: 文章列表，如果获取失败返回空列表或包含错误信息的字典
+        """
+        from src.libs.tools import save_docs_cache
+        
         self.log_info(f"正在获取知识库文章: {namespace}")
         
         # 如果没有缓存则从API获取
@@ -4,11 +4,12 @@ URL: https://github.com/Be1k0/YuQue-BdT
 '''
 
 
-from typing import List, Optional
+from typing import Callable, List, Optional
 from gui.controllers.base_controller import BaseController
 from src.core.yuque import YuqueClient
 from src.libs.constants import BookItem
-from src.libs.tools import get_cache_books_info
+from src.libs.revalidate import CacheRevalidator
+from src.libs.tools import get_books_cache_entry
 from src.libs.exceptions import CookiesExpiredError, NetworkError
 
 class BookController(BaseController):
@@ -17,23 +18,42 @@ class BookController(BaseController):
     负责处理知识库列表的获取和缓存等相关任务。
     """
     
+    BOOKS_CACHE_KEY = "books"
+
     def __init__(self, client: YuqueClient = None):
         super().__init__()
         self.client = client or YuqueClient()
+        self.revalidator = CacheRevalidator()
         
-    async def get_books(self) -> Optional[List[BookItem]]:
+    async def get_books(self, on_refresh: Callable[[List[BookItem]], None] = None) -> Optional[List[BookItem]]:
         """获取知识库列表
         
+        缓存最新时直接返回；缓存陈旧时先返回旧列表并在后台刷新，刷新成功后以新列表调用 on_refresh；
+        没有可用缓存时从远程获取，并发调用共用同一请求。
+        
+        Args:
+            on_refresh: 后台刷新完成后的回调
+        
         Returns:
             Optional[List[BookItem]]: 知识库列表，如果获取失败返回 None 或空列表
         """
-        # 尝试从缓存获取
-        books_info = get_cache_books_info()
-        if books_info:
-            self.log_info("从缓存加载知识库列表成功")
-            return books_info
+        entry = get_books_cache_entry()
+        if entry is not None and entry.value:
+            self.log_info("从缓存加载知识库列表成功" if entry.is_fresh else "从缓存加载知识库列表，后台刷新中")
+        else:
+            entry = None
+        return await self.revalidator.get(self.BOOKS_CACHE_KEY, entry, self.fetch_books, on_refresh)
+
+    def cancel_refresh(self) -> None:
+        """取消正在进行的后台刷新"""
+        self.revalidator.cancel()
+
+    async def fetch_books(self) -> List[BookItem]:
+        """从远程获取知识库列表并写入缓存
         
-        # 缓存不存在或已过期，从远程获取
+        Returns:
+            List[BookItem]: 知识库列表，获取失败时返回空列表
+        """
         try:
             self.log_info(f"开始远程获取知识库列表: {self.client.config.yuque_book_stacks}")
             
@@ -66,4 +86,3 @@ class BookController(BaseController):
         except Exception as e:
             self.log_error("获取知识库列表时发生异常", e)
             return []
-
@@ -10,8 +10,6 @@ from src.core.yuque import YuqueClient
 from src.core.scheduler import Scheduler
 from src.core.parsers import YuqueParser
 from src.libs.request import Request
-from src.libs.file import File
-from src.libs.markdown_asset_localizer import MarkdownAssetLocalizer
 from src.libs.tools import (
     format_filename,
     ensure_dir_exists,
@@ -21,6 +19,8 @@ from src.libs.tools import (
     merge_cookie_strings,
 )
 from src.libs.log import Log
+from src.libs.metrics import Metrics
+from src.libs.tracing import Tracer
 from gui.controllers.base_controller import BaseController
 
 class CustomUrlController(BaseController):
@@ -450,6 +450,7 @@ class CustomUrlController(BaseController):
         self._asset_failed_count = 0
         self._asset_unsupported_count = 0
         self._asset_login_required_count = 0
+        Metrics.reset("custom_url")
 
         self.download_started.emit()
         self.log_info(f"开始下载 {len(docs)} 篇文档到 {output_dir}")
@@ -612,45 +613,41 @@ class CustomUrlController(BaseController):
             # 获取namespace
             namespace = doc.get("namespace", "unknown/unknown")
 
-            try:
-                self.download_progress.emit(f"正在下载 ({i}/{total}): {title}")
+            with Tracer.bind(book=namespace, doc=identifier, title=title):
+                try:
+                    self.download_progress.emit(f"正在下载 ({i}/{total}): {title}")
                 
-                success_flag = False
-                if doc_type_u == 'BOARD':
-                    full_url = url if url.startswith('http') else f"https://www.yuque.com/{namespace}/{identifier}"
-                    success_flag = await client.export_board_png(full_url, file_path)
-                elif doc_type_u in ['DOC', 'DOCUMENT'] and ext == '.docx':
-                    doc_id = str(doc.get('id', ''))
-                    success_flag = await client.export_word(doc_id, file_path) if doc_id else False
-                elif doc_type_u in ['SHEET', 'TABLE'] and ext == '.xlsx':
-                    doc_id = str(doc.get('id', ''))
-                    success_flag = await client.export_excel(doc_id, file_path, is_table=(doc_type_u == 'TABLE')) if doc_id else False
-                else:
-                    content = await client.export_markdown(namespace, identifier, line_break=linebreak)
-                    if content is not None:
-                        if not content:
-                            content = "\n"
-                        File().write(file_path, content)
-                        success_flag = True
-
-                if success_flag:
-                    self.log_success(f"已保存: {title}")
-                    self._downloaded_count += 1  # 更新成功计数
+                    success_flag = False
+                    if doc_type_u == 'BOARD':
+                        full_url = url if url.startswith('http') else f"https://www.yuque.com/{namespace}/{identifier}"
+                        success_flag = await client.export_board_png(full_url, file_path)
+                    elif doc_type_u in ['DOC', 'DOCUMENT'] and ext == '.docx':
+                        doc_id = str(doc.get('id', ''))
+                        success_flag = await client.export_word(doc_id, file_path) if doc_id else False
+                    elif doc_type_u in ['SHEET', 'TABLE'] and ext == '.xlsx':
+                        doc_id = str(doc.get('id', ''))
+                        success_flag = await client.export_excel(doc_id, file_path, is_table=(doc_type_u == 'TABLE')) if doc_id else False
+                    else:
+                        success_flag = await client.export_markdown_to_file(namespace, identifier, file_path, line_break=linebreak)
+
+                    if success_flag:
+                        self.log_success(f"已保存: {title}")
+                        self._downloaded_count += 1  # 更新成功计数
                     
-                    if download_images and ext == '.md':
-                        self.download_progress.emit(f"正在处理文档资源 ({i}/{total}): {title}")
-                        await self._localize_markdown_assets(file_path, doc, asset_cookie_string, login_ready)
+                        if download_images and ext == '.md':
+                            self.download_progress.emit(f"正在处理文档资源 ({i}/{total}): {title}")
+                            await self._localize_markdown_assets(file_path, doc, asset_cookie_string, login_ready, client.session)
                      
-                    self.download_progress.emit(f"完成 ({i}/{total}): {title}")
-                else:
-                    self.log_error(f"导出失败: {title}")
-                    self.download_progress.emit(f"失败 ({i}/{total}): {title}")
-                    self._failed_count += 1  # 更新失败计数
+                        self.download_progress.emit(f"完成 ({i}/{total}): {title}")
+                    else:
+                        self.log_error(f"导出失败: {title}")
+                        self.download_progress.emit(f"失败 ({i}/{total}): {title}")
+                        self._failed_count += 1  # 更新失败计数
                     
-            except Exception as e:
-                self.log_error(f"处理文档失败: {title}", e)
-                self.download_progress.emit(f"错误 ({i}/{total}): {title}")
-                self._failed_count += 1  # 更新失败计数
+                except Exception as e:
+                    self.log_error(f"处理文档失败: {title}", e)
+                    self.download_progress.emit(f"错误 ({i}/{total}): {title}")
+                    self._failed_count += 1  # 更新失败计数
             
             self.download_progress_update.emit(i, total)
         
@@ -749,45 +746,44 @@ class CustomUrlController(BaseController):
             # 获取namespace
             namespace = doc.get("namespace", "unknown/unknown")
 
-            try:
-                self.download_progress.emit(f"正在下载 ({i}/{total}): {title}")
+            with Tracer.bind(book=namespace, doc=identifier, title=title):
+                try:
+                    self.download_progress.emit(f"正在下载 ({i}/{total}): {title}")
                 
-                success_flag = False
-                if doc_type_u == 'BOARD':
-                    full_url = url if url.startswith('http') else f"https://www.yuque.com/{namespace}/{identifier}"
-                    success_flag = await client.export_board_png(full_url, file_path, cookies_str)
-                elif doc_type_u in ['DOC', 'DOCUMENT'] and ext == '.docx':
-                    doc_id = str(doc.get('id', ''))
-                    success_flag = await client.export_word(doc_id, file_path, cookies_str) if doc_id else False
-                elif doc_type_u in ['SHEET', 'TABLE'] and ext == '.xlsx':
-                    doc_id = str(doc.get('id', ''))
-                    success_flag = await client.export_excel(doc_id, file_path, cookies_str, is_table=(doc_type_u == 'TABLE')) if doc_id else False
-                else:
-                    content = await client.export_markdown_with_cookies(namespace, identifier, cookies_str, line_break=linebreak)
-                    if content is not None:
-                        if not content:
-                            content = "\n"
-                        File().write(file_path, content)
-                        success_flag = True
-
-                if success_flag:
-                    self.log_success(f"已保存: {title}")
-                    self._downloaded_count += 1  # 更新成功计数
+                    success_flag = False
+                    if doc_type_u == 'BOARD':
+                        full_url = url if url.startswith('http') else f"https://www.yuque.com/{namespace}/{identifier}"
+                        success_flag = await client.export_board_png(full_url, file_path, cookies_str)
+                    elif doc_type_u in ['DOC', 'DOCUMENT'] and ext == '.docx':
+                        doc_id = str(doc.get('id', ''))
+                        success_flag = await client.export_word(doc_id, file_path, cookies_str) if doc_id else False
+                    elif doc_type_u in ['SHEET', 'TABLE'] and ext == '.xlsx':
+                        doc_id = str(doc.get('id', ''))
+                        success_flag = await client.export_excel(doc_id, file_path, cookies_str, is_table=(doc_type_u == 'TABLE')) if doc_id else False
+                    else:
+                        success_flag = await client.export_markdown_to_file(
+                            namespace, identifier, file_path, line_break=linebreak,
+                            cookie_provider=client.static_cookie_provider(cookies_str),
+                        )
+
+                    if success_flag:
+                        self.log_success(f"已保存: {title}")
+                        self._downloaded_count += 1  # 更新成功计数
                     
-                    if download_images and ext == '.md':
-                        self.download_progress.emit(f"正在处理文档资源 ({i}/{total}): {title}")
-                        await self._localize_markdown_assets(file_path, doc, asset_cookie_string, login_ready)
+                        if download_images and ext == '.md':
+                            self.download_progress.emit(f"正在处理文档资源 ({i}/{total}): {title}")
+                            await self._localize_markdown_assets(file_path, doc, asset_cookie_string, login_ready, client.session)
                      
-                    self.download_progress.emit(f"完成 ({i}/{total}): {title}")
-                else:
-                    self.log_error(f"导出失败: {title}")
-                    self.download_progress.emit(f"失败 ({i}/{total}): {title}")
-                    self._failed_count += 1  # 更新失败计数
+                        self.download_progress.emit(f"完成 ({i}/{total}): {title}")
+                    else:
+                        self.log_error(f"导出失败: {title}")
+                        self.download_progress.emit(f"失败 ({i}/{total}): {title}")
+                        self._failed_count += 1  # 更新失败计数
                     
-            except Exception as e:
-                self.log_error(f"处理文档失败: {title}", e)
-                self.download_progress.emit(f"错误 ({i}/{total}): {title}")
-                self._failed_count += 1  # 更新失败计数
+                except Exception as e:
+                    self.log_error(f"处理文档失败: {title}", e)
+                    self.download_progress.emit(f"错误 ({i}/{total}): {title}")
+                    self._failed_count += 1  # 更新失败计数
             
             self.download_progress_update.emit(i, total)
         
@@ -798,7 +794,9 @@ class CustomUrlController(BaseController):
         # 发送统计信息
         self._emit_download_stats()
     
-    async def _localize_markdown_assets(self, file_path: str, doc: dict, asset_cookie_string: str, login_ready: bool):
+    async def _localize_markdown_assets(self, file_path: str, doc: dict, asset_cookie_string: str, login_ready: bool, session=None):
+        from src.libs.markdown_asset_localizer import AssetMetaCache, MarkdownAssetLocalizer
+
         localizer = MarkdownAssetLocalizer(
             cookie_string=asset_cookie_string,
             max_workers=10,
@@ -806,20 +804,22 @@ class CustomUrlController(BaseController):
             image_rename_mode='asc',
             image_file_prefix='image-',
             yuque_cdn_domain='cdn.nlark.com',
+            session=session,
         )
-        stats = await asyncio.to_thread(
-            localizer.process_single_file,
-            md_file_path=file_path,
-            current_doc_meta={
-                "doc_id": doc.get("id", ""),
-                "doc_url": doc.get("url", "") or doc.get("slug", ""),
-                "slug": doc.get("slug", ""),
-                "book_id": doc.get("book_id", ""),
-                "namespace": doc.get("namespace", ""),
-                "title": doc.get("title", ""),
-            },
-            has_login_cookie=login_ready,
-        )
+        async with localizer:
+            stats = await localizer.process_single_file(
+                md_file_path=file_path,
+                current_doc_meta={
+                    "doc_id": doc.get("id", ""),
+                    "doc_url": doc.get("url", "") or doc.get("slug", ""),
+                    "slug": doc.get("slug", ""),
+                    "book_id": doc.get("book_id", ""),
+                    "namespace": doc.get("namespace", ""),
+                    "title": doc.get("title", ""),
+                },
+                has_login_cookie=login_ready,
+            )
+        AssetMetaCache.shared().flush()
         self._localized_asset_count += stats.localized_count
         self._asset_failed_count += stats.failed_count
         self._asset_unsupported_count += stats.unsupported_count
@@ -833,6 +833,16 @@ class CustomUrlController(BaseController):
             f"\n资源暂不支持: {self._asset_unsupported_count}\n资源失败: {self._asset_failed_count}"
         )
         self.log_info(stats_msg.replace('\n', ', '))
+
+        # 写出本次任务的运行指标汇总
+        metrics_file = Metrics.write_summary(extra={
+            "downloaded": self._downloaded_count,
+            "skipped": self._skipped_count,
+            "failed": self._failed_count,
+            "assets": self._localized_asset_count,
+        })
+        if metrics_file:
+            self.log_info(f"运行指标已保存: {metrics_file}")
         self.download_finished.emit()
 
     def _build_doc_path(self, uuid: str, level_map: dict) -> list:
@@ -5,13 +5,14 @@ URL: https://github.com/Be1k0/YuQue-BdT
 
 import asyncio
 import os
-import functools
 from typing import Dict, List, Optional
 from PyQt6.QtCore import pyqtSignal
 from gui.controllers.base_controller import BaseController
 from src.core.scheduler import Scheduler
-from src.libs.constants import MutualAnswer
-from src.libs.markdown_asset_localizer import MarkdownAssetLocalizer
+from src.core.yuque import default_client
+from src.libs.constants import GLOBAL_CONFIG, MutualAnswer
+from src.libs.export_job import ExportJob, ExportJournal, gather_workers
+from src.libs.progress import ProgressAggregator
 from src.libs.tools import get_local_cookies, has_login_cookie
 
 class ExportController(BaseController):
@@ -21,9 +22,7 @@ class ExportController(BaseController):
     继承自 BaseController ，支持信号机制。
     """
     
-    # 信号定义
-    export_progress = pyqtSignal(str)    # 导出进度
-    image_download_progress = pyqtSignal(int, int, str)  # 资源处理进度
+    # 信号定义 (导出和资源处理进度写入 self.progress，由界面按固定帧率读取)
     image_download_finished = pyqtSignal(int, int)   # 资源处理完成
     image_download_error = pyqtSignal(str)   # 资源处理错误
     
@@ -31,19 +30,59 @@ class ExportController(BaseController):
         super().__init__()
         self.client = client 
         self.last_asset_summary: Dict[str, int] = {}
-        
-    async def export_books(self, answer: MutualAnswer):
+        self.progress = ProgressAggregator()
+        self.job: Optional[ExportJob] = None
+
+    def create_job(self, answer: MutualAnswer) -> ExportJob:
+        """为本次导出创建任务句柄，导出日志写入输出目录
+
+        Args:
+            answer: 导出配置对象
+        """
+        journal = ExportJournal(GLOBAL_CONFIG.target_output_dir, ExportJournal.options_of(answer))
+        self.job = ExportJob(journal)
+        answer.job = self.job
+        return self.job
+
+    def cancel_export(self) -> None:
+        """取消正在进行的导出任务"""
+        if self.job is not None:
+            self.job.cancel()
+
+    def finish_job(self) -> None:
+        """任务全部完成，标记导出日志，下次导出不再续传"""
+        if self.job is not None and not self.job.cancelled and self.job.journal is not None:
+            self.job.journal.finish()
+
+    async def _run(self, coro):
+        """在当前任务句柄下运行，没有任务句柄时直接执行"""
+        if self.job is None:
+            return await coro
+        return await self.job.run(coro)
+
+    async def export_books(self, answer: MutualAnswer) -> bool:
         """执行导出任务
         
         Args:
             answer: 导出配置对象
+
+        Returns:
+            任务被取消时返回 False
         """
-        # 设置进度回调
-        answer.progress_callback = self.export_progress.emit
+        # 进度写入聚合器，不再逐条发射信号
+        self.progress.start("export")
+        answer.progress = self.progress
         
         # 创建调度器并开始任务
         scheduler = Scheduler(self.client)
-        await scheduler.start_download_task(answer)
+        try:
+            await self._run(scheduler.start_download_task(answer))
+        except asyncio.CancelledError:
+            if self.job is None or not self.job.cancelled:
+                raise
+            self.log_warn("导出已取消，已导出的文档已记录，再次导出到同一目录时将继续")
+            return False
+        return True
         
     async def download_images(
         self,
@@ -57,9 +96,12 @@ class ExportController(BaseController):
     ):
         """处理 Markdown 文档中的资源链接
         
+        在当前事件循环中执行，复用客户端的连接池；多个文件同时处理，
+        全部文件共用一个并发上限 (download_threads) 下载资源。
+        
         Args:
             md_files: Markdown文件列表
-            download_threads: 线程数
+            download_threads: 并发下载数
             doc_image_prefix: 兼容旧参数，当前未使用
             image_rename_mode: 图片重命名模式
             image_file_prefix: 图片文件前缀
@@ -67,19 +109,21 @@ class ExportController(BaseController):
             markdown_meta: Markdown 文件对应的文档元数据
         """
         try:
-            loop = asyncio.get_event_loop()
+            from src.libs.markdown_asset_localizer import (
+                AssetMetaCache, MarkdownAssetLocalizer, prefetch_asset_metadata
+            )
+
+            journal = self.job.journal if self.job is not None else None
+            if journal is not None:
+                # 上次被取消的任务中已处理过资源的文件不再重复处理
+                md_files = [md_file for md_file in md_files if md_file not in journal.localized]
+
             cookie_string = get_local_cookies()
             login_ready = has_login_cookie(cookie_string)
-            total_assets = 0
-            processed_files = 0
-            current_filename = ""
-            total_direct = 0
-            total_card = 0
-            total_failed = 0
-            total_unsupported = 0
-            total_login_required = 0
-
-            self.last_asset_summary = {
+            concurrency = max(1, int(download_threads))
+            session = await (self.client or default_client)._get_session()
+            semaphore = asyncio.Semaphore(concurrency)
+            totals = {
                 "localized": 0,
                 "direct": 0,
                 "card": 0,
@@ -87,52 +131,87 @@ class ExportController(BaseController):
                 "unsupported": 0,
                 "login_required": 0,
             }
-            
-            for md_file in md_files:
-                current_filename = os.path.basename(md_file)
+            processed_files = 0
+            self.progress.start("assets")
+            self.last_asset_summary = dict(totals)
+
+            # 先批量获取全部文件引用的卡片信息和媒体下载地址
+            self.progress.set_message("正在预取卡片信息...")
+            await self._run(prefetch_asset_metadata(
+                md_files,
+                markdown_meta=markdown_meta,
+                cookie_string=cookie_string,
+                has_login_cookie=login_ready,
+                session=session,
+                concurrency=concurrency,
+            ))
+            self.progress.set_message("")
+
+            async def localize(md_file):
+                nonlocal processed_files
+                label = os.path.basename(md_file)
+                counted = {"processed": 0, "total": 0}
 
                 def on_localizer_progress(processed, total):
-                    self.image_download_progress.emit(processed, total, current_filename)
+                    if total > counted["total"]:
+                        self.progress.add_total(total - counted["total"])
+                        counted["total"] = total
+                    done = self.progress.done + processed - counted["processed"]
+                    counted["processed"] = processed
+                    self.progress.update(done, self.progress.total, label)
 
                 localizer = MarkdownAssetLocalizer(
                     cookie_string=cookie_string,
-                    max_workers=download_threads,
+                    max_workers=concurrency,
                     progress_callback=on_localizer_progress,
                     image_rename_mode=image_rename_mode,
                     image_file_prefix=image_file_prefix,
                     yuque_cdn_domain=yuque_cdn_domain,
+                    session=session,
+                    semaphore=semaphore,
                 )
-
-                func = functools.partial(
-                    localizer.process_single_file,
+                stats = await localizer.process_single_file(
                     md_file_path=md_file,
                     current_doc_meta=(markdown_meta or {}).get(md_file),
                     has_login_cookie=login_ready,
                 )
-                stats = await loop.run_in_executor(None, func)
-                total_assets += stats.localized_count
                 processed_files += 1
-                total_direct += stats.direct_count
-                total_card += stats.card_count
-                total_failed += stats.failed_count
-                total_unsupported += stats.unsupported_count
-                total_login_required += stats.login_required_count
-
-            self.last_asset_summary = {
-                "localized": total_assets,
-                "direct": total_direct,
-                "card": total_card,
-                "failed": total_failed,
-                "unsupported": total_unsupported,
-                "login_required": total_login_required,
-            }
+                if journal is not None:
+                    journal.record_localized(md_file, stats.output_md_path)
+                totals["localized"] += stats.localized_count
+                totals["direct"] += stats.direct_count
+                totals["card"] += stats.card_count
+                totals["failed"] += stats.failed_count
+                totals["unsupported"] += stats.unsupported_count
+                totals["login_required"] += stats.login_required_count
+
+            pending = iter(md_files)
+
+            async def worker():
+                for md_file in pending:
+                    await localize(md_file)
+
+            async def localize_all():
+                await gather_workers(worker() for _ in range(min(concurrency, len(md_files))))
+
+            try:
+                await self._run(localize_all())
+            finally:
+                AssetMetaCache.shared().flush()
+
+            total_assets = totals["localized"]
+            self.last_asset_summary = totals
             self.log_info(
-                f"文档资源处理完成: 文件 {processed_files} 个, 直接资源 {total_direct}, "
-                f"卡片媒体 {total_card}, 需登录 {total_login_required}, "
-                f"暂不支持 {total_unsupported}, 失败 {total_failed}"
+                f"文档资源处理完成: 文件 {processed_files} 个, 直接资源 {totals['direct']}, "
+                f"卡片媒体 {totals['card']}, 需登录 {totals['login_required']}, "
+                f"暂不支持 {totals['unsupported']}, 失败 {totals['failed']}"
             )
             self.image_download_finished.emit(processed_files, total_assets)
             
+        except asyncio.CancelledError:
+            if self.job is None or not self.job.cancelled:
+                raise
+            self.log_warn(f"文档资源处理已取消，已处理 {processed_files} 个文件")
         except Exception as e:
             self.log_error(f"文档资源处理过程出错: {e}")
             self.image_download_error.emit(str(e))
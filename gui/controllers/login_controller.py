@@ -5,9 +5,9 @@ URL: https://github.com/Be1k0/YuQue-BdT
 
 from PyQt6.QtCore import pyqtSignal
 from src.core.yuque import YuqueClient
-from src.core.web_login import SystemBrowserLoginBridge
 from src.libs.log import Log
 from src.libs.exceptions import CookiesExpiredError
+from src.libs.revalidate import CacheRevalidator
 from gui.controllers.base_controller import BaseController
 
 class LoginController(BaseController):
@@ -28,6 +28,7 @@ class LoginController(BaseController):
         super().__init__()
         self.client = client or YuqueClient()
         self.last_web_login_error = ""
+        self.revalidator = CacheRevalidator()
         
     async def login(self, username: str, password: str) -> bool:
         """执行登录操作
@@ -82,13 +83,50 @@ class LoginController(BaseController):
             self.login_failed.emit(f"登录异常: {str(e)}")
             return False
 
+    @staticmethod
+    def _user_data(user_info) -> dict:
+        """提取界面展示需要的用户字段 (兼容 dict 和 object)"""
+        if isinstance(user_info, dict):
+            return {
+                "name": user_info.get("name"),
+                "login": user_info.get("login"),
+                "avatar": user_info.get("avatar", "")
+            }
+        return {
+            "name": user_info.name,
+            "login": user_info.login,
+            "avatar": getattr(user_info, "avatar", "")
+        }
+
+    async def _revalidate_user_info(self) -> None:
+        """后台向服务端验证登录状态并刷新用户信息，登录已失效时发出 login_expired"""
+        from src.libs.tools import get_cache_user_info
+        try:
+            if await self.client.get_user_info():
+                user_info = get_cache_user_info()
+                if user_info:
+                    self.user_info_updated.emit(self._user_data(user_info))
+            else:
+                Log.info("服务端未返回用户信息，登录可能已失效")
+                self.login_expired.emit("您的登录已失效，请重新登录")
+        except CookiesExpiredError:
+            Log.info("Cookies 已过期")
+            self.login_expired.emit("您的登录已过期，请重新登录")
+        except Exception as e:
+            err_msg = str(e)
+            if "HTTP 401" in err_msg or "HTTP 403" in err_msg or "登录已过期" in err_msg:
+                Log.info("服务端返回登录无效或已过期")
+                self.login_expired.emit("您的登录已失效，请重新登录")
+            else:
+                Log.warn(f"后台刷新用户信息失败: {e}")
+
     async def check_login_status(self) -> bool:
         """检查登录状态
         
         Returns:
             bool: 登录状态是否有效
         """
-        from src.libs.tools import get_local_cookies, get_cache_user_info
+        from src.libs.tools import get_local_cookies, get_cache_user_info, get_user_info_cache_entry
         
         cookies = get_local_cookies()
         if not cookies:
@@ -100,26 +138,20 @@ class LoginController(BaseController):
                 self.login_expired.emit("您的登录凭证已过期，请重新登录")
             return False
             
+        # 用户信息缓存可用时先用于显示界面，同时总是在后台向服务端验证 Cookie (服务端会话可能已被注销)
+        entry = get_user_info_cache_entry()
+        if entry is not None:
+            self.login_success.emit(self._user_data(entry.value))
+            self.revalidator.refresh("user_info", self._revalidate_user_info)
+            return True
+
         # 验证 cookies 是否有效
         try:
             is_valid = await self.client.get_user_info()
             if is_valid:
                 user_info = get_cache_user_info()
                 if user_info:
-                    if isinstance(user_info, dict):
-                        user_data = {
-                            "name": user_info.get("name"),
-                            "login": user_info.get("login"),
-                            "avatar": user_info.get("avatar", "")
-                        }
-                    else:
-                        user_data = {
-                            "name": user_info.name,
-                            "login": user_info.login,
-                            "avatar": getattr(user_info, "avatar", "")
-                        }
-                    
-                    self.login_success.emit(user_data)
+                    self.login_success.emit(self._user_data(user_info))
                     return True
         except CookiesExpiredError:
             Log.info("Cookies 已过期")
@@ -165,6 +197,7 @@ class LoginController(BaseController):
         
         self.last_web_login_error = ""
         try:
+            from src.core.web_login import SystemBrowserLoginBridge
             bridge = SystemBrowserLoginBridge()
             self.log_info("正在打开系统浏览器，请在浏览器中完成登录...")
             result = await bridge.login()
@@ -0,0 +1,130 @@
+'''
+Author: Be1k0
+URL: https://github.com/Be1k0/YuQue-BdT
+'''
+
+import asyncio
+import heapq
+import itertools
+from typing import Any, Dict, Iterable, List
+from gui.controllers.base_controller import BaseController
+from src.libs.tools import get_docs_cache_entry, resolve_book_namespace
+
+
+class TocPrefetchController(BaseController):
+    """知识库目录后台预取控制器
+
+    知识库列表加载完成后，在后台以低优先级预先获取各知识库的文章列表并写入文档缓存，
+    用户点击知识库时即可直接命中缓存。
+    - 优先级：最近更新 (content_updated_at) 的知识库在前，当前选中知识库附近的条目会被提到最前
+    - 并发上限为 CONCURRENCY，最多预取 MAX_BOOKS 个知识库
+    - 有前台请求进行时不再启动新的预取；前台请求的知识库正在预取时直接复用该请求
+    - 重新加载知识库列表或注销时取消全部预取
+    """
+
+    CONCURRENCY = 2  # 后台预取并发数
+    MAX_BOOKS = 30  # 按更新时间最多预取的知识库数量
+    NEIGHBOR_RANGE = 2  # 选中知识库前后各预取的条目数
+
+    def __init__(self, article_controller):
+        super().__init__()
+        self.article_controller = article_controller
+        self._queue: List[Any] = []
+        self._seq = itertools.count()
+        self._done = set()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._workers: List[asyncio.Task] = []
+        self._foreground = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def _push(self, priority: int, namespace: str) -> None:
+        if namespace and namespace not in self._done and namespace not in self._inflight:
+            heapq.heappush(self._queue, (priority, next(self._seq), namespace))
+
+    def _ensure_workers(self) -> None:
+        self._workers = [worker for worker in self._workers if not worker.done()]
+        while self._queue and len(self._workers) < self.CONCURRENCY:
+            self._workers.append(asyncio.ensure_future(self._worker()))
+
+    def start(self, books: Iterable[Any]) -> None:
+        """按更新时间排序并开始预取
+
+        Args:
+            books: 知识库列表 (BookItem)
+        """
+        self.cancel()
+        ordered = sorted(books, key=lambda book: getattr(book, 'content_updated_at', '') or '', reverse=True)
+        for rank, book in enumerate(ordered[:self.MAX_BOOKS]):
+            self._push(rank, resolve_book_namespace(book))
+        self._ensure_workers()
+
+    def prioritize(self, namespaces: Iterable[str]) -> None:
+        """将指定知识库提到预取队列最前 (按传入顺序)"""
+        for offset, namespace in enumerate(namespaces):
+            self._push(-1000 + offset, namespace)
+        self._ensure_workers()
+
+    def cancel(self) -> None:
+        """取消全部预取任务并清空队列"""
+        for task in self._workers + list(self._inflight.values()):
+            task.cancel()
+        self._workers = []
+        self._inflight = {}
+        self._queue = []
+        self._done = set()
+
+    async def _worker(self) -> None:
+        while self._queue:
+            # 有前台请求时等待其完成，避免与用户点击争抢连接
+            await self._idle.wait()
+            if not self._queue:
+                break
+            _, _, namespace = heapq.heappop(self._queue)
+            if namespace in self._done or namespace in self._inflight:
+                continue
+            self._done.add(namespace)
+            entry = get_docs_cache_entry(namespace)
+            if entry is not None and entry.is_fresh:
+                continue
+
+            # 没有缓存或缓存已陈旧时重新获取，与前台对同一知识库的请求合并
+            task = asyncio.ensure_future(self.article_controller.refresh_articles(namespace))
+            self._inflight[namespace] = task
+            try:
+                await task
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.log_warn(f"预取知识库 {namespace} 文章列表失败: {e}")
+            finally:
+                if self._inflight.get(namespace) is task:
+                    del self._inflight[namespace]
+
+    async def fetch(self, namespace: str):
+        """前台获取文章列表
+
+        正在预取同一知识库时等待该预取结果，否则直接请求；执行期间暂停启动新的预取。
+
+        Args:
+            namespace: 知识库命名空间
+
+        Returns:
+            与 ArticleController.get_articles 相同
+        """
+        self._foreground += 1
+        self._idle.clear()
+        try:
+            task = self._inflight.get(namespace)
+            if task is not None:
+                try:
+                    return await asyncio.shield(task)
+                except asyncio.CancelledError:
+                    # 预取被取消时改为直接请求，外部取消则继续向上传递
+                    if not task.cancelled():
+                        raise
+            return await self.article_controller.get_articles(namespace)
+        finally:
+            self._foreground -= 1
+            if not self._foreground:
+                self._idle.set()
@@ -13,10 +13,10 @@ from PyQt6.QtGui import QIcon
 from PyQt6.QtCore import Qt, pyqtSignal, QTimer
 from src.libs.constants import GLOBAL_CONFIG
 from src.ui.font_utils import stabilize_combo_box_font
-from utils import static_resource_path, StdoutRedirector, QPasswordLineEdit
+from utils import static_resource_path, StdoutRedirector, QPasswordLineEdit, Debouncer
 from .components.login_manager import LoginManagerMixin
 from .components.book_manager import BookManagerMixin
-from .components.article_manager import ArticleManagerMixin, ArticleTreeWidget
+from .components.article_manager import ArticleManagerMixin, ArticleTreeView
 from .components.export_manager import ExportManagerMixin
 from .components.log_manager import LogManagerMixin
 from .components.settings_manager import SettingsManagerMixin
@@ -87,7 +87,7 @@ class YuqueGUI(QMainWindow, LoginManagerMixin, BookManagerMixin, ArticleManagerM
         self.init_log_manager()
 
         # 设置日志重定向
-        self.redirector = StdoutRedirector(self.log_text_edit, disable_terminal_output=True)
+        self.redirector = StdoutRedirector(self.log_sink, disable_terminal_output=True)
         sys.stdout = self.redirector
         sys.stderr = self.redirector
 
@@ -101,6 +101,8 @@ class YuqueGUI(QMainWindow, LoginManagerMixin, BookManagerMixin, ArticleManagerM
             self.redirector.flush()
             sys.stdout = self.redirector.old_stdout
             sys.stderr = self.redirector.old_stderr
+        if hasattr(self, 'log_sink'):
+            self.log_sink.close()
         super().closeEvent(event)
     
     def on_tab_changed(self, index):
@@ -285,7 +287,7 @@ class YuqueGUI(QMainWindow, LoginManagerMixin, BookManagerMixin, ArticleManagerM
         search_label.setMinimumWidth(50)
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText("输入关键词过滤知识库")
-        self.search_input.textChanged.connect(self.filter_books)
+        self.search_input.textChanged.connect(Debouncer(self.filter_books, parent=self).trigger)
         search_layout.addWidget(search_label)
         search_layout.addWidget(self.search_input)
         left_layout.addLayout(search_layout)
@@ -345,13 +347,13 @@ class YuqueGUI(QMainWindow, LoginManagerMixin, BookManagerMixin, ArticleManagerM
         article_search_label.setMinimumWidth(70)
         self.article_search_input = QLineEdit()
         self.article_search_input.setPlaceholderText("输入关键词过滤文章")
-        self.article_search_input.textChanged.connect(self.filter_articles)
+        self.article_search_input.textChanged.connect(Debouncer(self.filter_articles, parent=self).trigger)
         article_search_layout.addWidget(article_search_label)
         article_search_layout.addWidget(self.article_search_input)
         center_layout.addLayout(article_search_layout)
 
         # 文章列表
-        self.article_list = ArticleTreeWidget()
+        self.article_list = ArticleTreeView()
         self.article_list.itemSelectionChanged.connect(self.update_article_selection)
         center_layout.addWidget(self.article_list)
 
@@ -8,13 +8,16 @@ __version__ = "v2.3.0"
 import sys
 import os
 import ctypes
+from src.libs.startup_profiler import StartupProfiler
 from PyQt6.QtWidgets import QApplication, QMessageBox
 from PyQt6.QtGui import QIcon
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QTimer
 from src.libs.log import Log
 from src.ui.font_utils import get_stable_ui_font
 from gui.main_window import YuqueGUI
 
+StartupProfiler.mark("imports_done")
+
 def excepthook(exc_type, exc_value, exc_traceback):
     """全局异常处理程序，用于记录未处理的异常"""
     import traceback
@@ -103,6 +106,7 @@ def main():
         # 创建应用程序实例
         app = QApplication(sys.argv)
         app.setFont(get_stable_ui_font())
+        StartupProfiler.mark("qapplication_ready")
         
         icon_path = os.path.join(os.path.dirname(os.path.abspath(__file__ if not "__compiled__" in globals() else sys.argv[0])), "favicon.ico")
         if os.path.exists(icon_path):
@@ -113,8 +117,19 @@ def main():
         asyncio.set_event_loop(loop)
 
         window = YuqueGUI()
+        StartupProfiler.mark("window_constructed")
         window.show()
 
+        if StartupProfiler.enabled():
+            def on_first_window():
+                # 窗口显示后的首轮事件循环，视为首个窗口可见
+                StartupProfiler.mark("first_window_shown")
+                StartupProfiler.dump()
+                if StartupProfiler.should_exit():
+                    loop.stop()
+
+            QTimer.singleShot(0, on_first_window)
+
         with loop:
             loop.run_forever()
 
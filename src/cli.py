@@ -0,0 +1,302 @@
+'''
+Author: Be1k0
+URL: https://github.com/Be1k0/YuQue-BdT
+'''
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from .libs.constants import GLOBAL_CONFIG, MutualAnswer, ShardTask
+from .libs.exceptions import CookiesExpiredError
+from .libs.log import Log
+from .libs.metrics import Metrics
+from .libs.tracing import Tracer
+from .libs.tools import (
+    get_cache_books_info, get_local_cookies,
+    resolve_book_namespace, set_cookie_override
+)
+
+# 退出码
+EXIT_OK = 0  # 全部成功
+EXIT_PARTIAL = 1  # 存在下载失败的文档
+EXIT_USAGE = 2  # 参数或知识库选择错误
+EXIT_AUTH = 3  # 未登录或 Cookie 已过期
+EXIT_ERROR = 4  # 其他未处理异常
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """构建命令行参数解析器"""
+    parser = argparse.ArgumentParser(
+        prog="python -m src.cli",
+        description="语雀知识库无界面批量导出",
+    )
+    parser.add_argument("books", nargs="*", help="要导出的知识库命名空间，例如 user/book")
+    parser.add_argument("--books-file", help="从文件读取知识库命名空间，每行一个")
+    parser.add_argument("--all", action="store_true", help="导出账号下的全部知识库")
+    parser.add_argument("-o", "--output", default=GLOBAL_CONFIG.target_output_dir, help="输出目录")
+    parser.add_argument("--skip", action="store_true", help="跳过本地已存在的文档")
+    parser.add_argument("--no-line-break", action="store_true", help="不保留 Markdown 中的 <br> 换行标识")
+    parser.add_argument("--doc-format", default="md", choices=["md", "word", "pdf"], help="文档导出格式")
+    parser.add_argument("--sheet-format", default="xlsx", choices=["xlsx", "md"], help="表格导出格式")
+    parser.add_argument("--table-format", default="xlsx", choices=["xlsx", "md"], help="数据表导出格式")
+    parser.add_argument("--shortest-first", action="store_true", help="同类文档中字数少的优先导出")
+    parser.add_argument("--download-assets", action="store_true", help="导出后将 Markdown 中的资源下载到本地")
+    parser.add_argument("--asset-threads", type=int, default=10, help="资源下载的并发请求数 (每个 Markdown 文件中同时下载的资源数，也用于卡片信息预取)")
+    parser.add_argument("--workers", type=int, default=1, help="并行导出的进程数，大于1时启用多进程分片")
+    parser.add_argument("--shard-by", default="book", choices=["book", "doc"], help="分片方式：按知识库或按文档哈希")
+    parser.add_argument("--cookies", default=os.environ.get("YUQUE_COOKIES", ""), help="语雀 Cookie 字符串，默认读取环境变量 YUQUE_COOKIES")
+    parser.add_argument("--refresh-books", action="store_true", help="忽略本地缓存，重新获取知识库列表")
+    parser.add_argument("--summary", help="将 JSON 汇总额外写入指定文件")
+    parser.add_argument("--debug", action="store_true", help="开启调试日志")
+    parser.add_argument("--metrics", help="任务指标汇总文件路径，默认写入 .meta/metrics 目录")
+    parser.add_argument("--metrics-port", type=int, help="运行期间在该端口提供 Prometheus 文本格式的 /metrics 接口")
+    parser.add_argument("--trace", help="记录每个请求的分阶段耗时并写入指定文件，.json 后缀为 Chrome trace 格式，其余为 JSON Lines")
+    return parser
+
+
+def _read_books(args: argparse.Namespace) -> List[str]:
+    """合并命令行与文件中指定的知识库命名空间"""
+    books = [b.strip().strip('/') for b in args.books if b.strip()]
+    if args.books_file:
+        with open(args.books_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    books.append(line.strip('/'))
+    # 保持顺序去重
+    return list(dict.fromkeys(books))
+
+
+async def _load_books(client: Any, refresh: bool) -> List[Any]:
+    """获取知识库列表，缓存过期或要求刷新时重新请求"""
+    books = None if refresh else get_cache_books_info()
+    if not books:
+        await client.get_user_bookstacks()
+        books = get_cache_books_info(allow_stale=True)
+    return books or []
+
+
+def _build_answer(args: argparse.Namespace, toc_range: List[str]) -> MutualAnswer:
+    """根据命令行参数构建导出选项"""
+    return MutualAnswer(
+        toc_range=toc_range,
+        skip=args.skip,
+        line_break=not args.no_line_break,
+        doc_format=args.doc_format,
+        sheet_format=args.sheet_format.upper(),
+        table_format=args.table_format.upper(),
+        shortest_first=args.shortest_first,
+        progress_callback=lambda message: Log.info(message),
+    )
+
+
+async def _run_single(args: argparse.Namespace, client: Any, toc_range: List[str], summary: Dict[str, Any]) -> None:
+    """在当前进程中执行导出"""
+    from .core.scheduler import Scheduler
+    from .core.sharding import localize_answer_assets
+    from .libs.export_job import ExportJob, ExportJournal, answer_files
+
+    GLOBAL_CONFIG.target_output_dir = args.output
+    answer = _build_answer(args, toc_range)
+    # 导出的文件记录在输出目录的导出日志中，中断 (Ctrl+C) 后再次运行会跳过已导出的文档
+    job = ExportJob(ExportJournal(args.output, ExportJournal.options_of(answer)))
+    answer.job = job
+    await job.run(Scheduler(client).start_download_task(answer))
+
+    if args.download_assets:
+        summary["assets"] = await job.run(localize_answer_assets(answer, args.asset_threads))
+    job.journal.finish()
+
+    summary["downloaded"] = answer.downloaded_count.get()
+    summary["skipped"] = answer.skipped_count.get()
+    summary["failed"] = answer.failed_count.get()
+    summary["files"] = answer_files(answer)
+
+
+def _shard_trace_path(path: str, index: int) -> str:
+    """分片进程各自写出追踪文件，例如 trace.json -> trace.shard0.json"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.shard{index}{ext}"
+
+
+async def _run_sharded(args: argparse.Namespace, client: Any, toc_range: List[str], book_weights: Dict[str, int], summary: Dict[str, Any]) -> None:
+    """将导出任务分片到多个进程执行并合并结果"""
+    from .core.sharding import plan_book_shards, run_sharded_export
+    from .libs.export_job import ExportJournal
+
+    book_docs: Dict[str, List[Dict[str, Any]]] = {}
+    if args.shard_by == "doc":
+        shard_ranges = [list(toc_range) for _ in range(args.workers)]
+        # 每个知识库会分到所有进程，目录只在主进程获取一次后传给各分片
+        docs_lists = await asyncio.gather(*(client.get_book_docs(ns) for ns in toc_range))
+        book_docs = {ns: docs for ns, docs in zip(toc_range, docs_lists) if docs}
+    else:
+        shard_ranges = plan_book_shards(toc_range, args.workers, book_weights)
+
+    tasks = [
+        ShardTask(
+            index=index,
+            count=len(shard_ranges),
+            toc_range=shard_range,
+            output_dir=args.output,
+            shard_docs=args.shard_by == "doc",
+            skip=args.skip,
+            line_break=not args.no_line_break,
+            doc_format=args.doc_format,
+            sheet_format=args.sheet_format.upper(),
+            table_format=args.table_format.upper(),
+            shortest_first=args.shortest_first,
+            download_assets=args.download_assets,
+            asset_threads=args.asset_threads,
+            debug=args.debug,
+            trace_path=_shard_trace_path(args.trace, index) if args.trace else "",
+            cookies=args.cookies,
+            book_docs=book_docs,
+        )
+        for index, shard_range in enumerate(shard_ranges)
+    ]
+    if not tasks:
+        return
+    Log.info(f"启用多进程分片导出: {len(tasks)} 个进程，按{'文档' if args.shard_by == 'doc' else '知识库'}划分")
+
+    merged = await asyncio.to_thread(run_sharded_export, tasks, lambda message: Log.info(message))
+    if not merged["errors"]:
+        # 全部分片完成后合并分片日志，下次导出不再续传；有分片失败时保留分片日志以便续传
+        ExportJournal.merge(
+            args.output,
+            ExportJournal.options_of(_build_answer(args, toc_range)),
+            [ExportJournal.shard_name(task.index) for task in tasks],
+        )
+
+    summary["downloaded"] = merged["downloaded"]
+    summary["skipped"] = merged["skipped"]
+    summary["failed"] = merged["failed"]
+    summary["files"] = merged["files"]
+    summary["shards"] = merged["shards"]
+    if args.download_assets:
+        summary["assets"] = merged["assets"]
+    if merged["traces"]:
+        summary["traces"] = merged["traces"]
+    if merged["errors"]:
+        summary["errors"] = merged["errors"]
+        summary["exit_code"] = EXIT_AUTH if merged["auth_error"] else EXIT_ERROR
+
+
+async def run_export(args: argparse.Namespace) -> Dict[str, Any]:
+    """执行导出任务并返回汇总信息"""
+    from .core.yuque import YuqueClient
+
+    started = time.time()
+    summary: Dict[str, Any] = {
+        "exit_code": EXIT_OK,
+        "output_dir": os.path.abspath(args.output),
+        "books": [],
+        "downloaded": 0,
+        "skipped": 0,
+        "failed": 0,
+        "files": [],
+    }
+
+    if args.cookies:
+        # 只在本进程内使用，不覆盖图形界面保存的登录信息，多个任务可以使用不同账号并行运行
+        set_cookie_override(args.cookies)
+    if not get_local_cookies():
+        summary["exit_code"] = EXIT_AUTH
+        summary["error"] = "未找到有效的登录 Cookie，请先在图形界面登录或通过 --cookies 提供"
+        return summary
+
+    requested = _read_books(args)
+    if not requested and not args.all:
+        summary["exit_code"] = EXIT_USAGE
+        summary["error"] = "未指定要导出的知识库"
+        return summary
+
+    async with YuqueClient() as client:
+        books = await _load_books(client, args.refresh_books)
+        available = [resolve_book_namespace(b) for b in books]
+
+        if args.all:
+            toc_range = [ns for ns in available if ns]
+        else:
+            missing = [ns for ns in requested if ns not in available]
+            if missing:
+                summary["exit_code"] = EXIT_USAGE
+                summary["error"] = f"未找到知识库: {', '.join(missing)}"
+                return summary
+            toc_range = requested
+
+        if args.workers > 1:
+            book_weights = {resolve_book_namespace(b): int(getattr(b, "items_count", 0) or 0) for b in books}
+            await _run_sharded(args, client, toc_range, book_weights, summary)
+        else:
+            await _run_single(args, client, toc_range, summary)
+
+    summary["books"] = toc_range
+    if summary["failed"] and summary["exit_code"] == EXIT_OK:
+        summary["exit_code"] = EXIT_PARTIAL
+    summary["elapsed_seconds"] = round(time.time() - started, 3)
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """命令行入口，日志输出到 stderr，JSON 汇总输出到 stdout"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    # 知识库列表文件在参数处理阶段读取，无法读取时按参数错误退出 (EXIT_USAGE)
+    try:
+        args.books = _read_books(args)
+    except (OSError, UnicodeDecodeError) as e:
+        parser.error(f"无法读取知识库列表文件 {args.books_file}: {e}")
+    args.books_file = None
+    Log.set_debug_mode(args.debug)
+
+    if args.trace and args.workers <= 1:
+        Tracer.enable()
+
+    Metrics.reset("cli")
+    metrics_server = None
+    if args.metrics_port:
+        try:
+            metrics_server = Metrics.serve_prometheus(args.metrics_port)
+        except OSError as e:
+            Log.warn(f"指标接口启动失败: {e}")
+
+    stdout = sys.stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            summary = asyncio.run(run_export(args))
+        except CookiesExpiredError:
+            summary = {"exit_code": EXIT_AUTH, "error": "Cookie 已过期，请重新登录"}
+        except KeyboardInterrupt:
+            summary = {"exit_code": EXIT_ERROR, "error": "任务已中断"}
+        except Exception as e:
+            summary = {"exit_code": EXIT_ERROR, "error": str(e)}
+
+    if args.trace and Tracer.enabled():
+        summary["trace"] = Tracer.dump(args.trace)
+
+    summary["metrics"] = Metrics.write_summary(args.metrics, extra={
+        "downloaded": summary.get("downloaded", 0),
+        "skipped": summary.get("skipped", 0),
+        "failed": summary.get("failed", 0),
+        "assets": summary.get("assets", {}).get("localized", 0),
+    })
+    if metrics_server:
+        metrics_server.shutdown()
+
+    summary_text = json.dumps(summary, ensure_ascii=False, indent=2)
+    stdout.write(summary_text + "\n")
+    if args.summary:
+        with open(args.summary, 'w', encoding='utf-8') as f:
+            f.write(summary_text)
+    return summary["exit_code"]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,24 +3,86 @@ Author: Be1k0
 URL: https://github.com/Be1k0/YuQue-BdT
 '''
 
-import asyncio
+import heapq
+import itertools
 import os
-from typing import Dict, Any
+import zlib
+from typing import Dict, Any, Callable, Iterable, List, Optional, Tuple
 from .yuque import default_client, YuqueClient
 from ..libs.constants import GLOBAL_CONFIG, MutualAnswer, ThreadSafeCounter
-from ..libs.file import File
 from ..libs.log import Log
+from ..libs.tracing import Tracer
+from ..libs.metrics import Metrics
+from ..libs.export_job import gather_workers
 from ..libs.tools import (
     get_cache_books_info, format_filename, ensure_dir_exists, resolve_book_namespace
 )
 from ..libs.error_handler import ErrorHandler
 
+class DocQueue:
+    """按导出方式分道的文档优先队列
+
+    文档分为三条通道：markdown (直接获取 Markdown，通常很快)、binary (Word/PDF/Excel，需要排队轮询导出结果)、
+    board (Playwright 截图)。空闲的工作协程从 “已占用并发 / 通道权重” 最小的通道取下一篇文档，
+    各通道都有文档时并发按 LANE_WEIGHTS 分配，耗时长的导出不会占满全部并发；只剩一条通道有文档时可以使用全部并发。
+    通道内按优先级出队：启用 shortest_first 时字数少的在前 (没有字数的排在最后)，其余保持目录顺序。
+
+    传入 source 时文档从迭代器中按需读取，队列中最多保留 window 篇待处理文档，
+    每次出队前再补足，优先级只在这个窗口内生效；classify 返回文档的 (通道, 优先级)。
+    """
+
+    LANE_WEIGHTS = {"markdown": 6, "binary": 3, "board": 1}
+
+    def __init__(self, source: Iterable[Dict[str, Any]] = (),
+                 classify: Optional[Callable[[Dict[str, Any]], Tuple[str, float]]] = None, window: int = 0):
+        self._heaps: Dict[str, List[Tuple]] = {lane: [] for lane in self.LANE_WEIGHTS}
+        self._running: Dict[str, int] = {lane: 0 for lane in self.LANE_WEIGHTS}
+        self._order = itertools.count()
+        self._source = iter(source)
+        self._classify = classify or (lambda doc: ("markdown", 0))
+        self._window = window
+        self._size = 0
+
+    def _refill(self) -> None:
+        while self._size < self._window:
+            doc = next(self._source, None)
+            if doc is None:
+                return
+            lane, cost = self._classify(doc)
+            self.push(lane, doc, cost)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def push(self, lane: str, doc: Dict[str, Any], cost: float = 0) -> None:
+        heapq.heappush(self._heaps[lane], (cost, next(self._order), doc))
+        self._size += 1
+
+    def pop(self) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """取出下一篇文档并占用所在通道的一个并发，队列为空时返回 None"""
+        self._refill()
+        lanes = [lane for lane, heap in self._heaps.items() if heap]
+        if not lanes:
+            return None
+        lane = min(lanes, key=lambda name: (self._running[name] / self.LANE_WEIGHTS[name], self._heaps[name][0][:2]))
+        _, _, doc = heapq.heappop(self._heaps[lane])
+        self._size -= 1
+        self._running[lane] += 1
+        return lane, doc
+
+    def done(self, lane: str) -> None:
+        """释放通道的并发占用"""
+        self._running[lane] -= 1
+
+
 class Scheduler:
     """下载调度器类
     
     提供下载任务调度功能，管理下载流程和并发控制
     """
     
+    QUEUE_WINDOW_FACTOR = 50  # 每个并发在优先队列中预读的文档数
+
     def __init__(self, client: YuqueClient = None):
         self.client = client or default_client
         self.concurrency = 10
@@ -32,7 +94,7 @@ class Scheduler:
             answer: 包含下载选项和回调的 MutualAnswer 对象
         """
         try:
-            books_info = get_cache_books_info()
+            books_info = get_cache_books_info(allow_stale=True)
             if not books_info:
                 Log.error("无法获取知识库信息")
                 return
@@ -48,14 +110,24 @@ class Scheduler:
                 Log.error("未找到选中的知识库")
                 return
 
+            # 用户选择了具体文档的知识库先导出
+            if answer.selected_docs:
+                selected_books.sort(key=lambda book: resolve_book_namespace(book) not in answer.selected_docs)
+
             Log.info(f"开始下载 {len(selected_books)} 个知识库")
 
             # 确保输出目录存在
             output_dir = GLOBAL_CONFIG.target_output_dir
             ensure_dir_exists(output_dir)
 
+            journal = answer.job.journal if answer.job is not None else None
+            if journal is not None and journal.resumed:
+                Log.info(f"检测到未完成的导出任务，已导出的 {len(journal.docs)} 篇文档将直接跳过")
+
             # 下载每个知识库 (知识库之间串行，文档并行)
             for book in selected_books:
+                if answer.job is not None:
+                    answer.job.raise_if_cancelled()
                 await self._download_book(book, output_dir, answer)
 
             Log.success("所有知识库下载完成！")
@@ -96,52 +168,105 @@ class Scheduler:
         except (TypeError, ValueError):
             book_id = 0
 
-        # 获取知识库的文档列表
-        docs = await self.client.get_book_docs(namespace)
+        # 获取知识库的文档列表 (多进程按文档分片时由主进程获取后传入)
+        docs = answer.book_docs.get(namespace)
+        if docs is None:
+            with Tracer.span("toc_fetch", book=namespace), Metrics.timer("toc_fetch"):
+                docs = await self.client.get_book_docs(namespace)
         if not docs:
             Log.warn(f"知识库 {book.name} 没有文档")
             return
 
         Log.info(f"知识库 {book.name} 共有 {len(docs)} 个文档")
 
-        # 构建层级映射表
+        # 构建层级映射表，只保留作为父节点出现的条目 (拼接输出路径只需要这些)
+        parent_uuids = {doc.get('parent_uuid') for doc in docs if doc.get('parent_uuid')}
         level_map = {}
         for doc in docs:
             uuid = doc.get('uuid', '')
-            if uuid:
+            if uuid and uuid in parent_uuids:
                 level_map[uuid] = {
                     'title': doc.get('title', ''),
-                    'level': doc.get('level', 0),
                     'type': doc.get('type', 'DOC'),
                     'parent_uuid': doc.get('parent_uuid', '')
                 }
+        del parent_uuids
 
-        # 筛选文档
-        filtered_docs = docs
+        # 筛选文档：只计数，不复制文档列表，工作协程按需从生成器中读取
+        selected_ids = None
         if answer.selected_docs and namespace in answer.selected_docs:
-            selected_ids = answer.selected_docs[namespace]
-            filtered_docs = [doc for doc in docs if doc.get('id', '') in selected_ids]
-            Log.info(f"下载范围: 知识库 {book.name} 选择了 {len(filtered_docs)} 篇特定文档")
+            selected_ids = set(answer.selected_docs[namespace])
+
+        def wanted(doc: Dict[str, Any]) -> bool:
+            if selected_ids is not None and doc.get('id', '') not in selected_ids:
+                return False
+            # 分片导出时只处理属于当前分片的文档
+            if answer.shard_count > 1 and self._doc_shard(doc, answer.shard_count) != answer.shard_index:
+                return False
+            return True
+
+        total = sum(1 for doc in docs if wanted(doc))
+        if selected_ids is not None:
+            Log.info(f"下载范围: 知识库 {book.name} 选择了 {total} 篇特定文档")
         else:
             Log.info(f"下载范围: 知识库 {book.name} 的所有文档")
-
-        # 并发下载
-        semaphore = asyncio.Semaphore(self.concurrency)
+        if answer.shard_count > 1:
+            Log.info(f"分片 {answer.shard_index + 1}/{answer.shard_count}: 知识库 {book.name} 分配到 {total} 篇文档")
+
+        if answer.progress is not None:
+            answer.progress.add_total(total)
+
+        def classify(doc: Dict[str, Any]) -> Tuple[str, float]:
+            cost = 0
+            if answer.shortest_first:
+                word_count = doc.get('word_count')
+                cost = word_count if isinstance(word_count, (int, float)) else float('inf')
+            return self._doc_lane(doc, answer), cost
+
+        # 按导出方式分道排队，固定数量的工作协程按优先级从有限的窗口中取文档
+        queue = DocQueue(
+            (doc for doc in docs if wanted(doc)), classify,
+            window=self.concurrency * self.QUEUE_WINDOW_FACTOR,
+        )
         book_completed_count = ThreadSafeCounter()
-        
-        async def semaphore_download(idx, doc):
-            async with semaphore:
-                await self._process_doc_download(
-                    idx, len(filtered_docs), doc, namespace, book_dir, answer, level_map, book_completed_count, book_id
-                )
-
-        tasks = [semaphore_download(i, doc) for i, doc in enumerate(filtered_docs, 1)]
-        
-        # 使用 gather 并发执行
-        await asyncio.gather(*tasks)
+        started = itertools.count(1)
+
+        async def worker():
+            while True:
+                item = queue.pop()
+                if item is None:
+                    return
+                lane, doc = item
+                try:
+                    with Tracer.bind(doc=doc.get('url') or doc.get('slug', ''), doc_id=doc.get('id', ''), title=doc.get('title', '')):
+                        with Tracer.span("doc", doc_type=doc.get('type', ''), queue=lane), Metrics.track("docs"):
+                            await self._process_doc_download(
+                                next(started), total, doc, namespace, book_dir, answer, level_map, book_completed_count, book_id
+                            )
+                finally:
+                    queue.done(lane)
+
+        # 各工作协程继承当前知识库的追踪上下文
+        with Tracer.bind(book=namespace):
+            await gather_workers(worker() for _ in range(min(self.concurrency, total)))
 
         Log.success(f"知识库 {book.name} 下载完成")
 
+    @staticmethod
+    def _doc_lane(doc: Dict[str, Any], answer: MutualAnswer) -> str:
+        """文档所属的调度通道 (见 DocQueue)"""
+        doc_type = str(doc.get('type', '') or '').upper()
+        if doc_type == 'BOARD':
+            return "board"
+        doc_format = str(getattr(answer, 'doc_format', 'md')).lower()
+        if doc_type in ['DOC', 'DOCUMENT'] and doc_format in ('word', 'pdf'):
+            return "binary"
+        if doc_type in ['SHEET', 'TABLE']:
+            fmt = getattr(answer, 'sheet_format' if doc_type == 'SHEET' else 'table_format', 'XLSX (Excel)')
+            if 'XLSX' in str(fmt).upper():
+                return "binary"
+        return "markdown"
+
     @ErrorHandler.async_error_handler("处理文档下载", reraise=False)
     async def _process_doc_download(self, index, total, doc, namespace, book_dir, answer, level_map, book_completed_count, book_id):
         """处理单个文档下载逻辑
@@ -164,8 +289,7 @@ class Scheduler:
             Log.info(f"跳过无标识符条目: {doc_title}")
             answer.skipped_count.increment()
             current_completed = book_completed_count.increment()
-            if answer.progress_callback:
-                answer.progress_callback(f"跳过无标识符 ({current_completed}/{total}): {doc_title}")
+            self._report_progress(answer, f"跳过无标识符 ({current_completed}/{total}): {doc_title}", status="skipped")
             return
 
         doc_type = doc.get('type', '')
@@ -173,8 +297,7 @@ class Scheduler:
         if doc_type and doc_type.upper() not in valid_types:
             Log.info(f"跳过非文档条目: {doc_title}")
             current_completed = book_completed_count.increment()
-            if answer.progress_callback:
-                answer.progress_callback(f"跳过非文档 ({current_completed}/{total}): {doc_title}")
+            self._report_progress(answer, f"跳过非文档 ({current_completed}/{total}): {doc_title}", status="skipped")
             answer.skipped_count.increment()
             return
 
@@ -209,8 +332,7 @@ class Scheduler:
                 answer.skipped_count.increment()
                 current_completed = book_completed_count.increment()
                 Log.info(f"跳过已存在: {filename}")
-                if answer.progress_callback:
-                    answer.progress_callback(f"跳过 ({current_completed}/{total}): {doc_title}")
+                self._report_progress(answer, f"跳过 ({current_completed}/{total}): {doc_title}", status="skipped")
                 return
             
             folder_name = os.path.splitext(filename)[0]
@@ -219,16 +341,32 @@ class Scheduler:
                 answer.skipped_count.increment()
                 current_completed = book_completed_count.increment()
                 Log.info(f"跳过已存在(子目录): {folder_name}/{filename}")
-                if answer.progress_callback:
-                    answer.progress_callback(f"跳过 ({current_completed}/{total}): {doc_title}")
+                self._report_progress(answer, f"跳过 ({current_completed}/{total}): {doc_title}", status="skipped")
                 return
 
-        if answer.progress_callback:
-            answer.progress_callback(f"正在准备: {doc_title}")
+        # 上次被取消的任务中已导出的文档直接沿用
+        journal = answer.job.journal if answer.job is not None else None
+        if journal is not None and journal.completed_doc(namespace, doc) is not None:
+            answer.skipped_count.increment()
+            current_completed = book_completed_count.increment()
+            Log.info(f"跳过已导出 (续传): {filename}")
+            self._report_progress(answer, f"跳过 ({current_completed}/{total}): {doc_title}", status="skipped")
+            return
+
+        if answer.job is not None:
+            answer.job.raise_if_cancelled()
+
+        progress_key = doc.get('id') or file_path
+        self._report_progress(answer, f"正在准备: {doc_title}", key=progress_key, label=doc_title)
 
         Log.info(f"开始文档 ({index}/{total}): {doc_title}")
 
-        success = await self._download_doc(namespace, doc, book_dir, answer, level_map, book_id)
+        try:
+            success = await self._download_doc(namespace, doc, book_dir, answer, level_map, book_id)
+        except Exception:
+            if answer.progress is not None:
+                answer.progress.finish(progress_key, "failed")
+            raise
         
         if success:
             answer.downloaded_count.increment()
@@ -238,12 +376,36 @@ class Scheduler:
             status_text = "失败"
             
         current_completed = book_completed_count.increment()
-        if answer.progress_callback:
-            answer.progress_callback(f"{status_text} ({current_completed}/{total}): {doc_title}")
+        self._report_progress(
+            answer, f"{status_text} ({current_completed}/{total}): {doc_title}",
+            key=progress_key, status="done" if success else "failed"
+        )
             
         Log.info(f"文档处理进度 ({current_completed}/{total}): {doc_title}")
         
 
+    @staticmethod
+    def _report_progress(answer: MutualAnswer, message: str, key: Any = None, label: str = "", status: str = "") -> None:
+        """上报文档进度
+
+        设置了进度聚合器时只更新聚合器中的计数，由界面按固定帧率读取；
+        进度回调 (命令行、分片导出) 仍逐条接收进度文本。
+
+        Args:
+            answer: 包含下载选项和回调的 MutualAnswer 对象
+            message: 进度文本
+            key: 文档标识，用于跟踪正在处理的文档
+            label: 开始处理时显示的文档标题
+            status: 为空表示开始处理，否则为 done / failed / skipped
+        """
+        if answer.progress is not None:
+            if status:
+                answer.progress.finish(key, status)
+            else:
+                answer.progress.begin(key, label)
+        if answer.progress_callback:
+            answer.progress_callback(message)
+
     @ErrorHandler.async_error_handler("下载文档IO", reraise=True)
     async def _download_doc(self, namespace: str, doc: Dict[str, Any], book_dir: str, answer: MutualAnswer, level_map: Dict[str, Dict], book_id: int) -> bool:
         """下载单个文档的具体实现
@@ -298,7 +460,7 @@ class Scheduler:
             Log.info(f"正在导出 Board: {full_url}")
             success = await self.client.export_board_png(full_url, file_path)
             if success:
-                answer.downloaded_files.append(file_path)
+                self._record_download(answer, namespace, doc, file_path)
                 Log.success(f"保存成功: {os.path.relpath(file_path, book_dir)}")
             return success
 
@@ -311,7 +473,7 @@ class Scheduler:
             is_table = (doc_type == 'TABLE')
             success = await self.client.export_excel(doc_id, file_path, is_table=is_table)
             if success:
-                answer.downloaded_files.append(file_path)
+                self._record_download(answer, namespace, doc, file_path)
                 Log.success(f"保存成功: {os.path.relpath(file_path, book_dir)}")
             return success
 
@@ -323,7 +485,7 @@ class Scheduler:
             Log.info(f"正在导出 Word (id: {doc_id}): {doc_title}")
             success = await self.client.export_word(doc_id, file_path)
             if success:
-                answer.downloaded_files.append(file_path)
+                self._record_download(answer, namespace, doc, file_path)
                 Log.success(f"保存成功: {os.path.relpath(file_path, book_dir)}")
             return success
 
@@ -335,40 +497,61 @@ class Scheduler:
             Log.info(f"正在导出 PDF (id: {doc_id}): {doc_title}")
             success = await self.client.export_pdf(doc_id, file_path)
             if success:
-                answer.downloaded_files.append(file_path)
+                self._record_download(answer, namespace, doc, file_path)
                 Log.success(f"保存成功: {os.path.relpath(file_path, book_dir)}")
             return success
 
-        # 下载文档 Markdown
-        markdown_content = await self.client.export_markdown(namespace, doc_url, answer.line_break)
-        if markdown_content is None:
+        # 下载文档 Markdown，响应体直接流式写入文件，不保留换行时在写入过程中过滤 <br>
+        success = await self.client.export_markdown_to_file(
+            namespace, doc_url, file_path,
+            line_break=answer.line_break,
+            strip_line_break=not answer.line_break,
+        )
+        if not success:
             Log.warn(f"无法获取内容: {doc_title}")
             return False
 
-        if not markdown_content:
-            markdown_content = "\n"
-
-        if not answer.line_break:
-            markdown_content = markdown_content.replace('</br>', '').replace('<br>', '').replace('<br/>', '')
-
-        f = File()
-        f.write(file_path, markdown_content)
-
         # 记录已下载或更新的文件，给后续文档资源离线化定界使用
-        answer.downloaded_files.append(file_path)
-        answer.downloaded_markdown_meta[file_path] = {
+        self._record_download(answer, namespace, doc, file_path, {
             "doc_id": doc.get("id", ""),
             "doc_url": doc.get("url", "") or doc.get("slug", ""),
             "slug": doc.get("slug", ""),
             "book_id": doc.get("book_id", "") or book_id,
             "namespace": namespace,
             "title": doc_title,
-        }
+        })
 
         rel_path = os.path.relpath(file_path, book_dir)
         Log.success(f"保存成功: {rel_path}")
         return True
 
+    @staticmethod
+    def _record_download(answer: MutualAnswer, namespace: str, doc: Dict[str, Any], file_path: str,
+                         markdown_meta: Optional[Dict[str, Any]] = None) -> None:
+        """记录导出成功的文件
+
+        有导出日志时只写入日志 (之后通过 answer_files/answer_markdown_meta 读回)，
+        否则记录在 answer.downloaded_files/downloaded_markdown_meta 中。
+        """
+        journal = answer.job.journal if answer.job is not None else None
+        if journal is not None:
+            journal.record_doc(namespace, doc, file_path, markdown_meta)
+            return
+        answer.downloaded_files.append(file_path)
+        if markdown_meta is not None:
+            answer.downloaded_markdown_meta[file_path] = markdown_meta
+
+    @staticmethod
+    def _doc_shard(doc: Dict[str, Any], shard_count: int) -> int:
+        """计算文档所属分片，使用稳定哈希保证各进程划分一致
+
+        Args:
+            doc: 文档对象
+            shard_count: 分片总数
+        """
+        key = str(doc.get('id') or doc.get('uuid') or doc.get('slug') or doc.get('url') or '')
+        return zlib.crc32(key.encode('utf-8')) % shard_count
+
     def _build_doc_path(self, uuid: str, level_map: Dict[str, Dict]) -> list:
         """构建文档路径
         
@@ -379,6 +562,9 @@ class Scheduler:
         if uuid not in level_map:
             return []
         doc_info = level_map[uuid]
+        # 同一目录下的文档共用父路径，计算一次后缓存在映射表中
+        if 'path' in doc_info:
+            return list(doc_info['path'])
         doc_type = doc_info.get('type', 'DOC')
         if doc_type.upper() not in ['TITLE', 'DOC']:
             return []
@@ -386,6 +572,7 @@ class Scheduler:
         title = format_filename(doc_info['title'])
         parent_uuid = level_map.get(uuid, {}).get('parent_uuid', '')
         parent_path = self._build_doc_path(parent_uuid, level_map)
+        doc_info['path'] = tuple(parent_path + [title])
         return parent_path + [title]
 
     @staticmethod
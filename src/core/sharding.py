@@ -0,0 +1,279 @@
+'''
+Author: Be1k0
+URL: https://github.com/Be1k0/YuQue-BdT
+'''
+
+import asyncio
+import multiprocessing
+import queue
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional
+
+import aiohttp
+
+from ..libs.constants import GLOBAL_CONFIG, MutualAnswer, ShardTask
+from ..libs.exceptions import CookiesExpiredError
+from ..libs.export_job import ExportJob, ExportJournal, answer_files, answer_markdown_meta
+from ..libs.log import Log
+from ..libs.tools import get_local_cookies, has_login_cookie, set_cookie_override
+from ..libs.tracing import Tracer
+from ..libs.metrics import Metrics
+
+
+async def localize_answer_assets(answer: MutualAnswer, threads: int) -> Dict[str, int]:
+    """对一次导出任务中写入的 Markdown 文件执行资源离线化
+
+    Args:
+        answer: 已完成导出的 MutualAnswer 对象
+        threads: 资源下载的并发请求数
+    """
+    from ..libs.markdown_asset_localizer import (
+        AssetMetaCache, MarkdownAssetLocalizer, prefetch_asset_metadata
+    )
+
+    cookie_string = get_local_cookies()
+    login_ready = has_login_cookie(cookie_string)
+    summary = {"localized": 0, "direct": 0, "card": 0, "failed": 0, "unsupported": 0, "login_required": 0}
+
+    journal = answer.job.journal if answer.job is not None else None
+    markdown_meta = answer_markdown_meta(answer)
+    md_files = [
+        p for p in answer_files(answer)
+        if p.endswith('.md') and (journal is None or p not in journal.localized)
+    ]
+    async with aiohttp.ClientSession(trace_configs=Tracer.trace_configs() + Metrics.trace_configs()) as session:
+        await prefetch_asset_metadata(
+            md_files,
+            markdown_meta=markdown_meta,
+            cookie_string=cookie_string,
+            has_login_cookie=login_ready,
+            session=session,
+            concurrency=threads,
+        )
+        for md_file in md_files:
+            localizer = MarkdownAssetLocalizer(
+                cookie_string=cookie_string,
+                max_workers=threads,
+                progress_callback=None,
+                image_rename_mode='asc',
+                image_file_prefix='image-',
+                yuque_cdn_domain='cdn.nlark.com',
+                session=session,
+            )
+            stats = await localizer.process_single_file(
+                md_file_path=md_file,
+                current_doc_meta=markdown_meta.get(md_file),
+                has_login_cookie=login_ready,
+            )
+            if journal is not None:
+                journal.record_localized(md_file, stats.output_md_path)
+            summary["localized"] += stats.localized_count
+            summary["direct"] += stats.direct_count
+            summary["card"] += stats.card_count
+            summary["failed"] += stats.failed_count
+            summary["unsupported"] += stats.unsupported_count
+            summary["login_required"] += stats.login_required_count
+    AssetMetaCache.shared().flush()
+    return summary
+
+
+def plan_book_shards(toc_range: List[str], workers: int, book_weights: Dict[str, int]) -> List[List[str]]:
+    """按知识库划分分片，文档数多的知识库优先分配给当前负载最小的分片
+
+    Args:
+        toc_range: 需要导出的知识库命名空间列表
+        workers: 分片数量上限
+        book_weights: 知识库命名空间到文档数量的映射
+    """
+    workers = max(1, min(workers, len(toc_range)))
+    shards: List[List[str]] = [[] for _ in range(workers)]
+    loads = [0] * workers
+
+    for namespace in sorted(toc_range, key=lambda ns: book_weights.get(ns, 0), reverse=True):
+        target = loads.index(min(loads))
+        shards[target].append(namespace)
+        loads[target] += max(1, book_weights.get(namespace, 0))
+
+    return [shard for shard in shards if shard]
+
+
+def shard_journal_options(task: ShardTask, answer: MutualAnswer) -> Dict[str, Any]:
+    """分片日志的导出选项：在导出选项之外记录分片划分，划分变化后不能沿用旧的分片日志"""
+    return {
+        **ExportJournal.options_of(answer),
+        "shard": [task.index, task.count, "doc" if task.shard_docs else "book"],
+        "toc_range": list(task.toc_range),
+    }
+
+
+async def _export_shard(task: ShardTask, progress: Callable[[str], None]) -> Dict[str, Any]:
+    """在子进程的独立事件循环与连接池中执行一个分片"""
+    from .scheduler import Scheduler
+    from .yuque import YuqueClient
+
+    GLOBAL_CONFIG.target_output_dir = task.output_dir
+    Metrics.reset(f"shard-{task.index}")
+    answer = MutualAnswer(
+        toc_range=task.toc_range,
+        skip=task.skip,
+        line_break=task.line_break,
+        doc_format=task.doc_format,
+        sheet_format=task.sheet_format,
+        table_format=task.table_format,
+        shortest_first=task.shortest_first,
+        progress_callback=progress,
+        shard_index=task.index if task.shard_docs else 0,
+        shard_count=task.count if task.shard_docs else 1,
+        book_docs=task.book_docs,
+    )
+    # 每个分片写入自己的导出日志，中断后以相同参数再次运行时各分片分别续传；
+    # 分片划分不同时 (选项不一致) 该分片重新开始记录
+    journal = ExportJournal(task.output_dir, shard_journal_options(task, answer), ExportJournal.shard_name(task.index))
+    job = ExportJob(journal)
+    answer.job = job
+
+    async with YuqueClient() as client:
+        await job.run(Scheduler(client).start_download_task(answer))
+
+    assets = await job.run(localize_answer_assets(answer, task.asset_threads)) if task.download_assets else {}
+    return {
+        "index": task.index,
+        "books": task.toc_range,
+        "downloaded": answer.downloaded_count.get(),
+        "skipped": answer.skipped_count.get(),
+        "failed": answer.failed_count.get(),
+        "files": answer_files(answer),
+        "markdown_meta": answer_markdown_meta(answer),
+        "assets": assets,
+        "metrics": Metrics.snapshot(),
+    }
+
+
+def run_shard(task: ShardTask, progress_queue: Any = None) -> Dict[str, Any]:
+    """子进程入口，执行单个分片并返回可序列化的结果
+
+    Args:
+        task: 分片任务
+        progress_queue: 跨进程进度队列，元素为 (分片序号, 进度文本)
+    """
+    # 子进程日志统一输出到 stderr，避免混入命令行的 JSON 汇总
+    sys.stdout = sys.stderr
+    Log.set_debug_mode(task.debug)
+    if task.cookies:
+        set_cookie_override(task.cookies)
+
+    def progress(message: str) -> None:
+        if progress_queue is None:
+            return
+        try:
+            progress_queue.put_nowait((task.index, message))
+        except Exception:
+            pass
+
+    if task.trace_path:
+        Tracer.enable()
+
+    try:
+        result = asyncio.run(_export_shard(task, progress))
+    except Exception as e:
+        result = {
+            "index": task.index,
+            "books": task.toc_range,
+            "downloaded": 0,
+            "skipped": 0,
+            "failed": 0,
+            "files": [],
+            "markdown_meta": {},
+            "assets": {},
+            "error": str(e) or type(e).__name__,
+            "auth_error": isinstance(e, CookiesExpiredError),
+        }
+
+    if task.trace_path:
+        result["trace"] = Tracer.dump(task.trace_path)
+    return result
+
+
+def run_sharded_export(tasks: List[ShardTask], progress_callback: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """使用进程池并行执行多个分片，并合并进度、计数与下载清单
+
+    Args:
+        tasks: 分片任务列表
+        progress_callback: 可选的进度回调，接收带分片前缀的进度文本
+    """
+    # 使用 spawn 启动子进程，确保每个分片拥有全新的事件循环与连接池
+    ctx = multiprocessing.get_context("spawn")
+    manager = ctx.Manager()
+    progress_queue = manager.Queue()
+    stop_event = threading.Event()
+
+    def drain_progress() -> None:
+        while True:
+            try:
+                index, message = progress_queue.get(timeout=0.2)
+            except queue.Empty:
+                if stop_event.is_set():
+                    break
+                continue
+            except (EOFError, OSError):
+                break
+            if progress_callback:
+                progress_callback(f"[分片 {index + 1}/{len(tasks)}] {message}")
+
+    drain_thread = threading.Thread(target=drain_progress, daemon=True)
+    drain_thread.start()
+
+    results: List[Dict[str, Any]] = []
+    try:
+        with ProcessPoolExecutor(max_workers=len(tasks), mp_context=ctx) as pool:
+            futures = [pool.submit(run_shard, task, progress_queue) for task in tasks]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                if result.get("error"):
+                    Log.error(f"分片 {result['index'] + 1} 执行失败: {result['error']}")
+                else:
+                    Log.success(f"分片 {result['index'] + 1} 完成: 成功 {result['downloaded']}, 跳过 {result['skipped']}, 失败 {result['failed']}")
+    finally:
+        stop_event.set()
+        drain_thread.join()
+        manager.shutdown()
+
+    results.sort(key=lambda r: r["index"])
+    merged: Dict[str, Any] = {
+        "downloaded": 0,
+        "skipped": 0,
+        "failed": 0,
+        "files": [],
+        "markdown_meta": {},
+        "assets": {},
+        "errors": [],
+        "auth_error": False,
+        "shards": [],
+        "traces": [],
+    }
+    for result in results:
+        merged["downloaded"] += result["downloaded"]
+        merged["skipped"] += result["skipped"]
+        merged["failed"] += result["failed"]
+        merged["files"].extend(result["files"])
+        merged["markdown_meta"].update(result["markdown_meta"])
+        for key, value in result["assets"].items():
+            merged["assets"][key] = merged["assets"].get(key, 0) + value
+        if result.get("error"):
+            merged["errors"].append({"shard": result["index"], "error": result["error"]})
+        merged["auth_error"] = merged["auth_error"] or bool(result.get("auth_error"))
+        if result.get("trace"):
+            merged["traces"].append(result["trace"])
+        if result.get("metrics"):
+            Metrics.merge(result["metrics"])
+        merged["shards"].append({
+            "index": result["index"],
+            "books": result["books"],
+            "downloaded": result["downloaded"],
+            "skipped": result["skipped"],
+            "failed": result["failed"],
+        })
+    return merged
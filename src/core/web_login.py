@@ -16,19 +16,24 @@ import sys
 import tempfile
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 from urllib.parse import parse_qs, urlparse
 
 from ..libs.constants import GLOBAL_CONFIG
 from ..libs.log import Log
 
-try:
+if TYPE_CHECKING:
     from playwright.async_api import Browser, BrowserContext, Page, Request as PlaywrightRequest
     from playwright.async_api import Response as PlaywrightResponse
-    from playwright.async_api import async_playwright
-except ImportError:
-    Browser = BrowserContext = Page = PlaywrightRequest = PlaywrightResponse = None
-    async_playwright = None
+
+
+def _load_async_playwright():
+    """首次使用时再导入 Playwright，避免拖慢程序启动"""
+    try:
+        from playwright.async_api import async_playwright
+    except ImportError:
+        return None
+    return async_playwright
 
 try:
     import psutil
@@ -71,6 +76,7 @@ class SystemBrowserLoginBridge:
 
     async def login(self) -> WebLoginResult:
         """执行网页登录并提取 Cookie"""
+        async_playwright = _load_async_playwright()
         if async_playwright is None:
             raise ImportError("未安装playwright库，请先运行: pip install playwright")
 
@@ -3,17 +3,26 @@ Author: Be1k0
 URL: https://github.com/Be1k0/YuQue-BdT
 '''
 
+import asyncio
 import aiohttp
 import json
-from typing import Dict, Any, List, Optional
+import os
+from typing import Dict, Any, List, Optional, Tuple, Callable
 from urllib.parse import urljoin, urlparse
 from ..libs.constants import GLOBAL_CONFIG
 from ..libs.encrypt import encrypt_password
+from ..libs.export_job import ExportJob
 from ..libs.log import Log
 from ..libs.request import Request
+from ..libs.tracing import Tracer
+from ..libs.metrics import Metrics
 from ..libs.tools import (
     is_personal, save_user_info, save_books_info,
-    get_cache_books_info, resolve_book_namespace
+    get_cache_books_info, resolve_book_namespace,
+    get_markdown_endpoints, save_markdown_endpoints, get_local_cookies
+)
+from ..libs.markdown_stream import (
+    LineBreakTagFilter, MarkdownFileSink, MarkdownStringSink
 )
 from .parsers import YuqueParser
 from ..libs.exceptions import (
@@ -38,10 +47,12 @@ class YuqueClient:
         self.config = config or GLOBAL_CONFIG
         self.session: Optional[aiohttp.ClientSession] = None
         self._cookies: Optional[str] = None
+        # 各知识库上次成功的Markdown导出接口类型，首次使用时从本地缓存加载
+        self._markdown_endpoints: Optional[Dict[str, str]] = None
 
     async def __aenter__(self):
         """异步上下文管理器入口，创建 aiohttp ClientSession"""
-        self.session = aiohttp.ClientSession()
+        self.session = aiohttp.ClientSession(trace_configs=Tracer.trace_configs() + Metrics.trace_configs())
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
@@ -52,7 +63,7 @@ class YuqueClient:
     async def _get_session(self) -> aiohttp.ClientSession:
         """获取 aiohttp ClientSession"""
         if self.session is None or self.session.closed:
-            self.session = aiohttp.ClientSession()
+            self.session = aiohttp.ClientSession(trace_configs=Tracer.trace_configs() + Metrics.trace_configs())
         return self.session
 
     def _debug_log_request(self, url: str, method: str, headers: Dict[str, Any], data: Any = None) -> None:
@@ -61,7 +72,7 @@ class YuqueClient:
 
     def _debug_log_response(self, status_code: int, headers: Dict[str, Any], body: Any) -> None:
         if _has_debug_logger and Log.is_debug_mode():
-            DebugLogger.log_response(status_code, headers, self._shrink_debug_body(body))
+            DebugLogger.log_response(status_code, headers, lambda: self._shrink_debug_body(body))
 
     def _debug_log_data(self, label: str, data: Any) -> None:
         if _has_debug_logger and Log.is_debug_mode():
@@ -155,46 +166,66 @@ class YuqueClient:
             Log.error(f"获取用户信息失败: {str(e)}")
             raise NetworkError(f"获取用户信息失败: {str(e)}")
 
+    async def _fetch_book_listing(self, url: str) -> Any:
+        """请求单个知识库列表接口，返回其中的 data 字段"""
+        resp = await Request.get(url, session=self.session)
+        return resp.get("data")
+
     async def get_user_bookstacks(self) -> Optional[Dict[str, Any]]:
-        """获取个人知识库/团队知识库列表数据"""
+        """获取个人知识库/团队知识库列表数据
+
+        个人知识库、团队空间知识库和协作知识库接口并发请求，结果按知识库 ID 合并去重，
+        耗时取决于最慢的接口而不是各接口之和。同一知识库出现在多个接口时，
+        按 个人 > 团队 > 协作 的顺序保留第一次出现的条目。
+        """
         try:
             personal = is_personal()
             Log.info("开始获取知识库")
 
-            target_api = self.config.yuque_book_stacks if personal else self.config.yuque_space_books_info
-            
-            resp = await Request.get(target_api, session=self.session)
-
-            if resp.get("data"):
-                data_wrap = resp["data"]
+            primary_api = self.config.yuque_book_stacks if personal else self.config.yuque_space_books_info
+            listings = [(primary_api, "知识库")]
+            if personal:
+                listings.append((self.config.yuque_space_books_info, "团队空间知识库"))
+            listings.append((self.config.yuque_collab_books_info, "协作知识库"))
+
+            results = await asyncio.gather(
+                *(self._fetch_book_listing(url) for url, _ in listings),
+                return_exceptions=True
+            )
+
+            for result in results:
+                if isinstance(result, CookiesExpiredError):
+                    raise result
+
+            primary = results[0]
+            if isinstance(primary, Exception):
+                raise primary
+            if not primary:
+                Log.error("获取知识库数据失败")
+                return None
 
-                if personal:
-                    filtered_books_data = await self._gen_books_data_for_cache(data_wrap)
+            grouped_books = []
+            for (url, label), data_wrap in zip(listings, results):
+                if isinstance(data_wrap, Exception):
+                    Log.warn(f"获取{label}失败: {str(data_wrap)}")
+                    continue
+                if not data_wrap:
+                    continue
+                if url == self.config.yuque_collab_books_info:
+                    grouped_books.append([self._format_book_item(book, "collab") for book in data_wrap])
+                elif url == self.config.yuque_book_stacks:
+                    grouped_books.append(await self._gen_books_data_for_cache(data_wrap))
                 else:
-                    temp_books_data = [{"books": data_wrap}]
-                    filtered_books_data = await self._gen_books_data_for_cache(temp_books_data)
-
-                merged_books_data = []
-
-                # 获取协作知识库
-                try:
-                    collab_books = await self.get_collab_books()
-                    if collab_books:
-                        merged_books_data.extend(collab_books)
-                except Exception as e:
-                    Log.warn(f"获取协作知识库失败: {str(e)}")
+                    grouped_books.append(await self._gen_books_data_for_cache([{"books": data_wrap}]))
 
-                merged_books_data.extend(filtered_books_data)
+            merged_books_data = self._merge_books(grouped_books)
 
-                if save_books_info(merged_books_data):
-                    Log.success("知识库信息保存成功")
-                    return {"books_info": merged_books_data}
-                else:
-                    Log.error("知识库缓存写入失败")
-                    return {"books_info": merged_books_data, "cache_saved": False}
+            if save_books_info(merged_books_data):
+                Log.success("知识库信息保存成功")
+                return {"books_info": merged_books_data}
             else:
-                Log.error("获取知识库数据失败")
-                return None
+                Log.error("知识库缓存写入失败")
+                return {"books_info": merged_books_data, "cache_saved": False}
 
         except CookiesExpiredError:
             raise
@@ -202,6 +233,19 @@ class YuqueClient:
             Log.error(f"获取知识库失败: {str(e)}")
             raise NetworkError(f"获取知识库失败: {str(e)}")
 
+    @staticmethod
+    def _merge_books(grouped_books: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """按知识库 ID (缺失时按命名空间) 合并多个接口的结果，保留第一次出现的条目"""
+        merged = {}
+        for books in grouped_books:
+            for book in books:
+                key = book.get("id") or book.get("namespace")
+                if key and key not in merged:
+                    merged[key] = book
+                elif not key:
+                    merged[id(book)] = book
+        return list(merged.values())
+
     async def _gen_books_data_for_cache(self, data_wrap: Any) -> List[Dict[str, Any]]:
         """处理知识库数据，生成缓存数据
         
@@ -303,7 +347,7 @@ class YuqueClient:
                 # 请求获取额外 type信息
                 book_id = None
                 try:
-                    books_info = get_cache_books_info()
+                    books_info = get_cache_books_info(allow_stale=True)
                     if books_info:
                         for b in books_info:
                             b_namespace = resolve_book_namespace(b)
@@ -314,31 +358,35 @@ class YuqueClient:
                     if book_id:
                         docs_resp = await Request.get(f"{self.config.yuque_article_info}{book_id}", session=self.session)
                         if docs_resp and "data" in docs_resp and isinstance(docs_resp["data"], list):
-                            type_map = {}
+                            info_map = {}
                             for d in docs_resp["data"]:
-                                t = d.get("type")
-                                if t:
-                                    if d.get("slug"):
-                                        type_map[str(d["slug"])] = t
-                                    if d.get("id"):
-                                        type_map[str(d["id"])] = t
+                                if d.get("slug"):
+                                    info_map[str(d["slug"])] = d
+                                if d.get("id"):
+                                    info_map[str(d["id"])] = d
                             
                             for doc in doc_list:
-                                t = None
+                                info = None
                                 doc_id = doc.get("id")
                                 doc_url = doc.get("url")
                                 doc_slug = doc.get("slug")
                                 
                                 if doc_id: 
-                                    t = t or type_map.get(str(doc_id))
+                                    info = info or info_map.get(str(doc_id))
                                 if doc_url: 
-                                    t = t or type_map.get(str(doc_url).strip('/'))
+                                    info = info or info_map.get(str(doc_url).strip('/'))
                                 if doc_slug: 
-                                    t = t or type_map.get(str(doc_slug))
+                                    info = info or info_map.get(str(doc_slug))
                                     
-                                if t:
+                                if info:
                                     # 将从接口获取到的实际类型覆盖原有的 type
-                                    doc["type"] = t
+                                    if info.get("type"):
+                                        doc["type"] = info["type"]
+                                    # 字数用于调度时估算导出耗时，更新时间用于判断文档是否有变化
+                                    if info.get("word_count") is not None:
+                                        doc["word_count"] = info["word_count"]
+                                    if info.get("content_updated_at"):
+                                        doc["content_updated_at"] = info["content_updated_at"]
 
                 except Exception as e:
                     Log.warn(f"获取知识库文档真实类型失败: {str(e)}")
@@ -356,60 +404,180 @@ class YuqueClient:
             Log.error(f"获取知识库文档列表失败: {str(e)}")
             raise NetworkError(f"获取文档列表失败: {str(e)}")
 
-    async def export_markdown(self, namespace: str, doc_identifier: str, line_break: bool = True) -> Optional[str]:
-        """导出 Markdown
-        
+    def _get_markdown_endpoints(self) -> Dict[str, str]:
+        """获取各知识库已记录的Markdown导出接口类型"""
+        if self._markdown_endpoints is None:
+            self._markdown_endpoints = get_markdown_endpoints()
+        return self._markdown_endpoints
+
+    def _remember_markdown_endpoint(self, namespace: str, variant: str) -> None:
+        """记录知识库可用的Markdown导出接口类型，仅在发生变化时写入缓存
+
+        Args:
+            namespace: 知识库命名空间
+            variant: 接口类型 (markdown / alt / api)
+        """
+        endpoints = self._get_markdown_endpoints()
+        if endpoints.get(namespace) == variant:
+            return
+
+        endpoints[namespace] = variant
+        if not save_markdown_endpoints(dict(endpoints)):
+            Log.debug("Markdown导出接口缓存写入失败")
+
+    def _build_markdown_candidates(self, namespace: str, doc_identifier: str, line_break: bool) -> Optional[List[Tuple[str, str]]]:
+        """生成Markdown导出候选地址，已记录的可用接口排在最前
+
+        Args:
+            namespace: 知识库命名空间
+            doc_identifier: 文档标识符
+            line_break: 是否保留换行
+        """
+        parts = namespace.split('/')
+        if len(parts) != 2:
+            return None
+
+        user_login, repo_slug = parts
+        query = f"attachment=true&latexcode=false&anchor=false&linebreak={str(line_break).lower()}"
+
+        target_doc_url = ""
+        if doc_identifier.startswith('/'):
+            target_doc_url = doc_identifier
+        elif doc_identifier.startswith(user_login + '/' + repo_slug):
+            target_doc_url = '/' + doc_identifier
+        elif '/' in doc_identifier and not doc_identifier.startswith('/'):
+             target_doc_url = f"/{doc_identifier}"
+        else:
+             target_doc_url = f"/{user_login}/{repo_slug}/{doc_identifier}"
+
+        # 主要 URL
+        candidates = [("markdown", f"{target_doc_url}/markdown?{query}")]
+
+        # 替代 URL
+        if not target_doc_url.startswith(f"/{user_login}/{repo_slug}/"):
+            candidates.append(("alt", f"/{user_login}/{repo_slug}/{doc_identifier}/markdown?{query}"))
+
+        # API URL
+        candidates.append(("api", f"/api/docs/{namespace}/{doc_identifier}/markdown"))
+
+        preferred = self._get_markdown_endpoints().get(namespace)
+        if preferred:
+            candidates.sort(key=lambda item: item[0] != preferred)
+        return candidates
+
+    @staticmethod
+    def local_cookie_provider() -> str:
+        """Cookie 来源策略：使用本地登录缓存的 Cookie"""
+        cookies = get_local_cookies()
+        if not cookies:
+            Log.error("cookies已过期，请清除缓存后重新执行程序")
+            raise CookiesExpiredError()
+        return cookies
+
+    @staticmethod
+    def static_cookie_provider(cookies_str: str) -> Callable[[], str]:
+        """Cookie 来源策略：使用调用方提供的固定 Cookie
+
+        Args:
+            cookies_str: Cookie字符串,格式为 "name1=value1; name2=value2"
+        """
+        return lambda: cookies_str
+
+    async def _fetch_markdown(self, namespace: str, doc_identifier: str, line_break: bool,
+                              cookie_provider: Callable[[], str], sink_factory: Callable[[], Any],
+                              strip_line_break: bool = False) -> Any:
+        """Markdown 导出核心：依次尝试候选地址，将响应体流式写入 sink
+
         Args:
             namespace: 知识库命名空间
             doc_identifier: 文档标识符
             line_break: 是否保留换行
+            cookie_provider: Cookie 来源策略，返回请求使用的 Cookie 字符串
+            sink_factory: 每次尝试创建一个写入目标，需提供 write/commit/discard
+            strip_line_break: 是否在写入时过滤 <br> 标签
+
+        Returns:
+            成功时返回 sink.commit() 的结果，否则返回 None
         """
         try:
-            parts = namespace.split('/')
-            if len(parts) != 2:
+            candidates = self._build_markdown_candidates(namespace, doc_identifier, line_break)
+            if not candidates:
                 return None
-            
-            user_login, repo_slug = parts
-            query = f"attachment=true&latexcode=false&anchor=false&linebreak={str(line_break).lower()}"
-            
-            target_doc_url = ""
-            if doc_identifier.startswith('/'):
-                target_doc_url = doc_identifier
-            elif doc_identifier.startswith(user_login + '/' + repo_slug):
-                target_doc_url = '/' + doc_identifier
-            elif '/' in doc_identifier and not doc_identifier.startswith('/'):
-                 target_doc_url = f"/{doc_identifier}"
-            else:
-                 target_doc_url = f"/{user_login}/{repo_slug}/{doc_identifier}"
 
-            markdown_url = f"{target_doc_url}/markdown?{query}"
-            
             try:
-                # 尝试主要 URL
-                resp = await Request.get_text(markdown_url, session=self.session)
-                if resp and len(resp) > 10:
-                    return resp
-                
-                # 尝试替代 URL
-                if not target_doc_url.startswith(f"/{user_login}/{repo_slug}/"):
-                    alt_url = f"/{user_login}/{repo_slug}/{doc_identifier}/markdown?{query}"
-                    alt_resp = await Request.get_text(alt_url, session=self.session)
-                    if alt_resp and len(alt_resp) > 10:
-                        return alt_resp
-
-                # 尝试 API URL
-                api_url = f"/api/docs/{namespace}/{doc_identifier}/markdown"
-                api_resp = await Request.get_text(api_url, session=self.session)
-                if api_resp and len(api_resp) > 10:
-                    return api_resp
-
-            except Exception as e:
+                cookies_str = cookie_provider()
+            except CookiesExpiredError:
                 Log.warn(f"获取Markdown失败")
-            
+                return None
+
+            for variant, url in candidates:
+                sink = sink_factory()
+                line_filter = LineBreakTagFilter() if strip_line_break else None
+                # 仅统计前若干字符用于判断内容是否有效，避免保留整篇文档
+                received = 0
+                try:
+                    with Metrics.timer("markdown_fetch"):
+                        async for text in Request.stream_text(url, cookies_str, session=self.session):
+                            received += len(text)
+                            if line_filter:
+                                text = line_filter.feed(text)
+                            if text:
+                                sink.write(text)
+                        if line_filter:
+                            sink.write(line_filter.flush())
+                except asyncio.CancelledError:
+                    sink.discard()
+                    raise
+                except Exception:
+                    sink.discard()
+                    Metrics.incr("markdown_fallbacks")
+                    continue
+
+                if received > 10:
+                    result = sink.commit()
+                    self._remember_markdown_endpoint(namespace, variant)
+                    return result
+                sink.discard()
+
+            Log.warn(f"获取Markdown失败")
             return None
         except Exception as e:
             Log.error(f"导出Markdown异常: {str(e)}")
             raise NetworkError(f"导出Markdown异常: {str(e)}")
+
+    async def export_markdown_to_file(self, namespace: str, doc_identifier: str, file_path: str,
+                                      line_break: bool = True, strip_line_break: bool = False,
+                                      cookie_provider: Optional[Callable[[], str]] = None) -> bool:
+        """导出 Markdown 并直接流式写入文件
+
+        Args:
+            namespace: 知识库命名空间
+            doc_identifier: 文档标识符
+            file_path: 目标文件路径
+            line_break: 是否保留换行
+            strip_line_break: 是否在写入时过滤 <br> 标签
+            cookie_provider: Cookie 来源策略，默认使用本地登录 Cookie
+        """
+        result = await self._fetch_markdown(
+            namespace, doc_identifier, line_break,
+            cookie_provider or self.local_cookie_provider,
+            lambda: MarkdownFileSink(file_path),
+            strip_line_break=strip_line_break,
+        )
+        return result is not None
+
+    async def export_markdown(self, namespace: str, doc_identifier: str, line_break: bool = True) -> Optional[str]:
+        """导出 Markdown
+        
+        Args:
+            namespace: 知识库命名空间
+            doc_identifier: 文档标识符
+            line_break: 是否保留换行
+        """
+        return await self._fetch_markdown(
+            namespace, doc_identifier, line_break,
+            self.local_cookie_provider, MarkdownStringSink
+        )
     
     async def export_markdown_with_cookies(self, namespace: str, doc_identifier: str, cookies_str: str, line_break: bool = True) -> Optional[str]:
         """使用自定义Cookie导出 Markdown
@@ -420,60 +588,14 @@ class YuqueClient:
             cookies_str: Cookie字符串,格式为 "name1=value1; name2=value2"
             line_break: 是否保留换行
         """
-        try:
-            parts = namespace.split('/')
-            if len(parts) != 2:
-                return None
-            
-            user_login, repo_slug = parts
-            query = f"attachment=true&latexcode=false&anchor=false&linebreak={str(line_break).lower()}"
-            
-            target_doc_url = ""
-            if doc_identifier.startswith('/'):
-                target_doc_url = doc_identifier
-            elif doc_identifier.startswith(user_login + '/' + repo_slug):
-                target_doc_url = '/' + doc_identifier
-            elif '/' in doc_identifier and not doc_identifier.startswith('/'):
-                 target_doc_url = f"/{doc_identifier}"
-            else:
-                 target_doc_url = f"/{user_login}/{repo_slug}/{doc_identifier}"
-
-            markdown_url = f"{target_doc_url}/markdown?{query}"
-            
-            try:
-                # 使用自定义Cookie请求
-                resp = await Request.get_text_with_cookies(markdown_url, cookies_str, session=self.session)
-                if resp and len(resp) > 10:
-                    return resp
-                
-                # 尝试替代 URL
-                if not target_doc_url.startswith(f"/{user_login}/{repo_slug}/"):
-                    alt_url = f"/{user_login}/{repo_slug}/{doc_identifier}/markdown?{query}"
-                    alt_resp = await Request.get_text_with_cookies(alt_url, cookies_str, session=self.session)
-                    if alt_resp and len(alt_resp) > 10:
-                        return alt_resp
-
-                # 尝试 API URL
-                api_url = f"/api/docs/{namespace}/{doc_identifier}/markdown"
-                api_resp = await Request.get_text_with_cookies(api_url, cookies_str, session=self.session)
-                if api_resp and len(api_resp) > 10:
-                    return api_resp
-
-            except Exception as e:
-                Log.warn(f"获取Markdown失败")
-            
-            return None
-        except Exception as e:
-            Log.error(f"导出Markdown异常: {str(e)}")
-            raise NetworkError(f"导出Markdown异常: {str(e)}")
-
-
+        return await self._fetch_markdown(
+            namespace, doc_identifier, line_break,
+            self.static_cookie_provider(cookies_str), MarkdownStringSink
+        )
 
     async def _export_binary_file(self, doc_id: str, file_path: str, export_type: str, cookies_str: str = "") -> bool:
         """导出二进制文件"""
-        import asyncio
-        
-        base_url = "https://www.yuque.com"
+        base_url = self.config.yuque_host
         export_url = f"{base_url}/api/docs/{doc_id}/export"
         
         cookies_dict = {}
@@ -504,7 +626,7 @@ class YuqueClient:
             "Accept": "application/json",
             "Content-Type": "application/json",
             "Origin": base_url,
-            "Referer": "https://www.yuque.com/dashboard",
+            "Referer": f"{base_url}/dashboard",
             "X-CSRF-Token": yuque_ctoken
         }
         
@@ -533,39 +655,46 @@ class YuqueClient:
         session = await self._get_session()
         download_url_path = ""
         oss_direct_url = ""
+        job = ExportJob.current()
         
-        while True:
-            try:
-                req_kwargs = {"json": payload, "headers": yuque_headers}
-                if cookies_dict:
-                     req_kwargs["cookies"] = cookies_dict
-
-                self._debug_log_request(export_url, "POST", yuque_headers, payload)
-                async with session.post(export_url, **req_kwargs) as response:
-                    response_text = await response.text()
-                    self._debug_log_response(response.status, response.headers, response_text)
-                    response.raise_for_status()
-                    res_data = json.loads(response_text) if response_text else {}
-                    state = res_data.get("data", {}).get("state")
+        # 导出任务排队等待耗时
+        with Tracer.span("export_wait", export_type=export_type, doc_id=doc_id) as wait_span, Metrics.timer("export_wait"):
+            while True:
+                if job is not None:
+                    job.raise_if_cancelled()
+                try:
+                    req_kwargs = {"json": payload, "headers": yuque_headers}
+                    if cookies_dict:
+                         req_kwargs["cookies"] = cookies_dict
+
+                    self._debug_log_request(export_url, "POST", yuque_headers, payload)
+                    async with session.post(export_url, **req_kwargs) as response:
+                        response_text = await response.text()
+                        self._debug_log_response(response.status, response.headers, response_text)
+                        response.raise_for_status()
+                        res_data = json.loads(response_text) if response_text else {}
+                        state = res_data.get("data", {}).get("state")
                     
-                    if state == "pending":
-                        await asyncio.sleep(3)
-                    elif state == "success":
-                        download_url_path = res_data.get("data", {}).get("url")
-                        self._debug_log_data(
-                            f"{export_name} 导出任务成功",
-                            {
-                                "doc_id": doc_id,
-                                "download_url": download_url_path,
-                            }
-                        )
-                        break
-                    else:
-                        Log.error(f"{export_name} 导出未知状态: {res_data}")
-                        return False
-            except Exception as e:
-                Log.error(f"{export_name} 导出请求错误: {e}")
-                return False
+                        if state == "pending":
+                            wait_span["polls"] = wait_span.get("polls", 0) + 1
+                            Metrics.incr("export_polls")
+                            await asyncio.sleep(self.config.export_poll_interval_ms / 1000)
+                        elif state == "success":
+                            download_url_path = res_data.get("data", {}).get("url")
+                            self._debug_log_data(
+                                f"{export_name} 导出任务成功",
+                                {
+                                    "doc_id": doc_id,
+                                    "download_url": download_url_path,
+                                }
+                            )
+                            break
+                        else:
+                            Log.error(f"{export_name} 导出未知状态: {res_data}")
+                            return False
+                except Exception as e:
+                    Log.error(f"{export_name} 导出请求错误: {e}")
+                    return False
 
         if download_url_path:
             full_download_url = urljoin(base_url, str(download_url_path))
@@ -634,10 +763,22 @@ class YuqueClient:
                     )
                     dl_response.raise_for_status()
                     
-                    with open(file_path, 'wb') as f:
-                        async for chunk in dl_response.content.iter_chunked(8192):
-                            if chunk:
-                                f.write(chunk)
+                    # 先写入临时文件，完成后再替换，取消或失败时不留下不完整的文件
+                    temp_path = f"{file_path}.part"
+                    try:
+                        with Tracer.span("oss_download", export_type=export_type, doc_id=doc_id) as download_span, Metrics.timer("oss_download"):
+                            with open(temp_path, 'wb') as f:
+                                async for chunk in dl_response.content.iter_chunked(8192):
+                                    if chunk:
+                                        f.write(chunk)
+                                        download_span["bytes_in"] = download_span.get("bytes_in", 0) + len(chunk)
+                                        Metrics.incr("bytes_in", len(chunk))
+                                        Metrics.incr("disk_bytes_written", len(chunk))
+                        os.replace(temp_path, file_path)
+                    except BaseException:
+                        if os.path.exists(temp_path):
+                            os.remove(temp_path)
+                        raise
                 return True
             except Exception as e:
                 Log.error(f"写入 {export_name} 文件错误: {e}")
@@ -658,8 +799,6 @@ class YuqueClient:
 
     async def export_board_png(self, url: str, file_path: str, cookies_str: str = "") -> bool:
         """使用 Playwright 导出 Board 画板为图片"""
-        import asyncio
-        import os
         from playwright.async_api import async_playwright
         
         parsed_cookies = []
@@ -688,6 +827,7 @@ class YuqueClient:
             else:
                 await route.continue_()
 
+        job = ExportJob.current()
         try:
             async with async_playwright() as p:
                 browser_channel = None
@@ -697,19 +837,23 @@ class YuqueClient:
                         await temp_b.close()
                         browser_channel = ch
                         break
-                    except: continue
+                    except Exception: continue
 
+                if job is not None:
+                    job.raise_if_cancelled()
                 browser = await p.chromium.launch(headless=True, channel=browser_channel)
-                context = await browser.new_context(
-                    viewport={'width': 1920, 'height': 1080},
-                    device_scale_factor=1
-                )
-                if parsed_cookies:
-                    await context.add_cookies(parsed_cookies)
-
-                page = await context.new_page()
+                page = None
                 
+                # 取消时 finally 中关闭页面和浏览器
                 try:
+                    context = await browser.new_context(
+                        viewport={'width': 1920, 'height': 1080},
+                        device_scale_factor=1
+                    )
+                    if parsed_cookies:
+                        await context.add_cookies(parsed_cookies)
+
+                    page = await context.new_page()
                     await page.goto(url, wait_until="networkidle", timeout=60000)
                     
                     svg_selector = ".lake-diagram-viewport-container svg"
@@ -762,7 +906,8 @@ class YuqueClient:
                     Log.error(f"截图出错: {e}")
                     return False
                 finally:
-                    await page.close()
+                    if page is not None:
+                        await page.close()
                     await browser.close()
         except Exception as e:
             Log.error(f"Playwright 启动失败: {e}")
@@ -4,6 +4,7 @@ URL: https://github.com/Be1k0/YuQue-BdT
 '''
 
 import threading
+import time
 from dataclasses import dataclass, field
 from typing import List, Optional, Dict, Any, Callable
 from .path_utils import get_resource_path
@@ -66,8 +67,12 @@ class GlobalConfig:
     cookies_file: str = get_resource_path(".meta/cookies.json") # Cookies信息
     user_info_file: str = get_resource_path(".meta/user_info.json") # 登录用户信息
     books_info_file: str = get_resource_path(".meta/books_info.json") # 知识库信息
-    local_expire: int = 86400000  # 1天过期时间
+    markdown_endpoint_file: str = get_resource_path(".meta/markdown_endpoints.json") # 各知识库可用的Markdown导出接口
+    asset_meta_cache_file: str = get_resource_path(".meta/asset_meta_cache.json") # 文档卡片与媒体下载地址缓存
+    local_expire: int = 86400000  # 1天过期时间 (缓存在此之前视为最新，直接使用)
+    local_stale_expire: int = 604800000  # 7天陈旧期限 (过期后到此之前先使用旧缓存，同时后台刷新)
     duration: int = 500  # 下载频率
+    export_poll_interval_ms: int = 3000  # Word/PDF/Excel 导出任务状态轮询间隔
     disable_ssl: bool = False  # 是否禁用 SSL 证书检验
     github_repo_url: str = "https://github.com/Be1k0/YuQue-BdT"  # 项目仓库地址
     github_latest_release_api: str = "https://api.github.com/repos/Be1k0/YuQue-BdT/releases/latest"  # 最新版本接口
@@ -116,6 +121,23 @@ class LocalCacheUserInfo:
     user_info: YuqueLoginUserInfo
 
 
+@dataclass
+class CacheEntry:
+    """本地缓存条目
+
+    fresh_until 之前为最新数据；fresh_until 到 stale_until 之间为陈旧数据，可先使用再后台刷新；
+    超过 stale_until 的缓存不再返回。
+    """
+    value: Any
+    fresh_until: int
+    stale_until: int
+
+    @property
+    def is_fresh(self) -> bool:
+        """是否仍在最新期限内"""
+        return time.time() * 1000 < self.fresh_until
+
+
 @dataclass
 class MutualAnswer:
     """交互信息"""
@@ -128,7 +150,10 @@ class MutualAnswer:
     table_format: str = "xlsx"
 
     selected_docs: Dict[str, List[str]] = field(default_factory=dict)
+    shortest_first: bool = False  # 同类文档中字数少的优先导出
     progress_callback: Optional[Callable] = None
+    progress: Optional[Any] = None  # 进度聚合器 (ProgressAggregator)，设置后界面按固定帧率读取进度
+    job: Optional[Any] = None  # 导出任务句柄 (ExportJob)，用于取消任务和记录导出日志
     
     # 使用线程安全计数器代替普通int,确保并发环境下计数准确
     skipped_count: ThreadSafeCounter = field(default_factory=ThreadSafeCounter)
@@ -139,6 +164,51 @@ class MutualAnswer:
     downloaded_files: List[str] = field(default_factory=list)
     downloaded_markdown_meta: Dict[str, Dict[str, Any]] = field(default_factory=dict)
 
+    # 多进程分片导出时，当前进程负责的分片序号与分片总数 (按文档哈希划分)
+    shard_index: int = 0
+    shard_count: int = 1
+    # 已获取的知识库文档列表 (命名空间 -> 文档列表)，存在时不再请求目录
+    book_docs: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)
+
+
+@dataclass
+class ProgressSnapshot:
+    """合并后的进度快照"""
+    phase: str
+    done: int
+    total: int
+    failed: int = 0
+    skipped: int = 0
+    rate: float = 0.0  # 条/秒
+    eta_seconds: Optional[float] = None
+    elapsed_seconds: float = 0.0
+    current: List[str] = field(default_factory=list)  # 正在处理的条目 (最多 ProgressAggregator.MAX_CURRENT 个)
+    active: int = 0  # 正在处理的条目总数
+    message: str = ""
+    version: int = 0
+
+
+@dataclass
+class ShardTask:
+    """多进程分片导出任务"""
+    index: int
+    count: int
+    toc_range: List[str]
+    output_dir: str
+    shard_docs: bool = False  # 为True时按文档哈希分片，否则按知识库分片
+    skip: bool = False
+    line_break: bool = True
+    doc_format: str = "md"
+    sheet_format: str = "XLSX"
+    table_format: str = "XLSX"
+    shortest_first: bool = False
+    download_assets: bool = False
+    asset_threads: int = 10
+    debug: bool = False
+    trace_path: str = ""  # 请求追踪输出文件，为空时不记录
+    cookies: str = field(default="", repr=False)  # 命令行指定的 Cookie，为空时使用本地缓存的登录信息
+    book_docs: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict, repr=False)  # 主进程已获取的文档列表 (按文档分片时)
+
 
 @dataclass
 class TreeNode:
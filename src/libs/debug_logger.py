@@ -3,22 +3,62 @@ Author: Be1k0
 URL: https://github.com/Be1k0/YuQue-BdT
 '''
 
+import atexit
 import json
 import logging
 import os
+import queue
+import random
+import threading
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
 
+class _DeferredQueueHandler(QueueHandler):
+    """不在调用线程格式化日志的队列处理器
+
+    默认的 QueueHandler.prepare 会在调用线程完成格式化，这里直接把记录放入队列，
+    由后台写入线程统一格式化与落盘，事件循环线程只付出一次入队的开销
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class _LazyMessage:
+    """延迟生成的日志文本，只有真正写入文件时才执行序列化"""
+
+    __slots__ = ("_func", "_args")
+
+    def __init__(self, func, *args):
+        self._func = func
+        self._args = args
+
+    def __str__(self):
+        try:
+            return self._func(*self._args)
+        except Exception as e:
+            return f"<日志序列化失败: {e}>"
+
+
 class DebugLogger:
     """调试日志记录器
     
     该类负责在程序运行过程中记录详细的调试信息，包括系统环境、HTTP请求与响应、以及其他关键事件。
+    日志经队列交给后台线程写入，按大小滚动保留最近的若干文件；响应体按采样率记录且延迟序列化。
     """
 
+    MAX_BYTES = 10 * 1024 * 1024  # 单个日志文件大小上限
+    BACKUP_COUNT = 5  # 保留的历史日志文件数
+    BODY_SAMPLE_RATE = 0.1  # 成功响应记录响应体的比例，失败响应始终记录
+    BODY_MAX_CHARS = 4000  # 单个响应体最多记录的字符数
+
     # 类变量，标记是否已初始化
     _initialized = False
     _logger = None
     _log_file = None
+    _listener = None
+    _random = random.Random()
 
     @classmethod
     def initialize(cls):
@@ -38,9 +78,12 @@ class DebugLogger:
         # 配置日志记录器
         logger = logging.getLogger("yuque_debug")
         logger.setLevel(logging.DEBUG)
+        logger.propagate = False
 
-        # 文件处理器
-        file_handler = logging.FileHandler(cls._log_file, encoding="utf-8")
+        # 文件处理器，按大小滚动
+        file_handler = RotatingFileHandler(
+            cls._log_file, maxBytes=cls.MAX_BYTES, backupCount=cls.BACKUP_COUNT, encoding="utf-8"
+        )
         file_handler.setLevel(logging.DEBUG)
 
         # 格式化器
@@ -50,16 +93,55 @@ class DebugLogger:
         )
         file_handler.setFormatter(formatter)
 
-        # 添加处理器
-        logger.addHandler(file_handler)
+        # 调用方只负责入队，由后台线程格式化并写入文件
+        log_queue = queue.SimpleQueue()
+        logger.addHandler(_DeferredQueueHandler(log_queue))
+        cls._listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+        cls._listener.start()
+        atexit.register(cls.shutdown)
 
         # 保存记录器对象
         cls._logger = logger
         cls._initialized = True
 
-        # 收集完整的系统环境信息
-        sys_info = cls._get_system_info()
-            
+        # 收集完整的系统环境信息，其中 DNS、连通性与 WMI 查询较慢，放到后台线程执行以免阻塞界面启动
+        threading.Thread(target=cls._log_system_info, name="debug-system-info", daemon=True).start()
+
+    @classmethod
+    def shutdown(cls):
+        """停止后台写入线程并落盘剩余日志"""
+        if cls._listener is not None:
+            cls._listener.stop()
+            cls._listener = None
+
+    @classmethod
+    def is_enabled(cls, level: int = logging.DEBUG) -> bool:
+        """当前是否会记录指定级别的日志，调用方可据此跳过参数构造"""
+        return cls._initialized and cls._logger.isEnabledFor(level)
+
+    @classmethod
+    def _log_system_info(cls):
+        """在后台线程中收集并记录系统环境信息"""
+        com_initialized = False
+        try:
+            # WMI 查询需要在当前线程初始化 COM
+            import pythoncom
+            pythoncom.CoInitialize()
+            com_initialized = True
+        except Exception:
+            pass
+
+        try:
+            sys_info = cls._get_system_info()
+        except Exception as e:
+            sys_info = {"error": str(e)}
+        finally:
+            if com_initialized:
+                try:
+                    pythoncom.CoUninitialize()
+                except Exception:
+                    pass
+
         cls.log_data("系统环境信息", sys_info)
 
     @staticmethod
@@ -72,7 +154,6 @@ class DebugLogger:
         import platform
         import socket
         from datetime import datetime
-        import requests
         
         try:
             from main import __version__ as app_version
@@ -331,7 +412,7 @@ class DebugLogger:
             headers: 请求头
             data: 请求体
         """
-        if not cls._initialized:
+        if not cls.is_enabled():
             return
 
         request_info = {
@@ -341,7 +422,7 @@ class DebugLogger:
             "data": data
         }
 
-        cls._logger.debug(f"HTTP请求: {json.dumps(request_info, ensure_ascii=False, indent=2)}")
+        cls._logger.debug(_LazyMessage(cls._format_json, "HTTP请求", request_info))
 
     @classmethod
     def log_response(cls, status_code, headers, body):
@@ -350,19 +431,17 @@ class DebugLogger:
         Args:
             status_code: 响应的状态码
             headers: 响应头
-            body: 响应体
+            body: 响应体，可以传入无参函数，仅在被采样记录时才调用以生成响应体
         """
-        if not cls._initialized:
+        if not cls.is_enabled():
             return
 
-        # 尝试格式化响应体为JSON
-        response_body = body
-        try:
-            if isinstance(body, str):
-                json_body = json.loads(body)
-                response_body = json_body
-        except:
-            pass
+        if cls._should_capture_body(status_code):
+            response_body = body() if callable(body) else body
+            if isinstance(response_body, str) and len(response_body) > cls.BODY_MAX_CHARS:
+                response_body = response_body[:cls.BODY_MAX_CHARS] + "\n...<truncated>..."
+        else:
+            response_body = "<body not sampled>"
 
         response_info = {
             "status_code": status_code,
@@ -370,7 +449,32 @@ class DebugLogger:
             "body": response_body
         }
 
-        cls._logger.debug(f"HTTP响应: {json.dumps(response_info, ensure_ascii=False, indent=2, default=str)}")
+        cls._logger.debug(_LazyMessage(cls._format_response, response_info))
+
+    @classmethod
+    def _should_capture_body(cls, status_code) -> bool:
+        """失败响应始终记录响应体，成功响应按采样率记录"""
+        try:
+            if int(status_code) >= 400:
+                return True
+        except (TypeError, ValueError):
+            return True
+        return cls._random.random() < cls.BODY_SAMPLE_RATE
+
+    @staticmethod
+    def _format_json(label, data) -> str:
+        return f"{label}: {json.dumps(data, ensure_ascii=False, indent=2, default=str)}"
+
+    @classmethod
+    def _format_response(cls, response_info) -> str:
+        # 尝试格式化响应体为JSON
+        body = response_info["body"]
+        if isinstance(body, str):
+            try:
+                response_info = dict(response_info, body=json.loads(body))
+            except ValueError:
+                pass
+        return cls._format_json("HTTP响应", response_info)
 
     @classmethod
     def log_data(cls, label, data):
@@ -380,15 +484,10 @@ class DebugLogger:
             label: 数据标签
             data: 要记录的数据
         """
-        if not cls._initialized:
+        if not cls.is_enabled():
             return
 
-        try:
-            if isinstance(data, (dict, list)):
-                data_str = json.dumps(data, ensure_ascii=False, indent=2, default=str)
-            else:
-                data_str = str(data)
-
-            cls._logger.debug(f"{label}: {data_str}")
-        except Exception as e:
-            cls._logger.error(f"无法记录数据 '{label}': {str(e)}")
+        if isinstance(data, (dict, list)):
+            cls._logger.debug(_LazyMessage(cls._format_json, label, data))
+        else:
+            cls._logger.debug(f"{label}: {data}")
@@ -0,0 +1,323 @@
+'''
+Author: Be1k0
+URL: https://github.com/Be1k0/YuQue-BdT
+'''
+
+import asyncio
+import contextvars
+import json
+import os
+import threading
+import time
+from typing import Any, Awaitable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .log import Log
+
+_current_job: contextvars.ContextVar = contextvars.ContextVar("export_job", default=None)
+
+
+class ExportJournal:
+    """导出任务日志
+
+    以 JSON Lines 追加写入输出目录下的 JOURNAL_NAME：首行记录任务选项，之后每导出一篇文档、
+    每处理完一个 Markdown 文件的资源各追加一条记录，任务全部完成时写入 finished 记录。
+    记录先缓存在内存中，累计 FLUSH_EVERY 条或调用 flush 时写入磁盘。
+    文档的输出文件和 Markdown 元数据只保存在日志中，需要时通过 files/markdown_meta 读回，
+    导出大量文档时内存占用不随文档数增长。
+
+    再次导出到同一目录时，如果上次任务没有完成 (被取消或中断) 且导出选项相同，
+    则沿用上次的日志：已导出的文档和已处理资源的文件直接跳过；否则重新开始记录。
+    多进程分片导出时每个分片写入自己的日志 (shard_name)，全部分片完成后由 merge 合并到主日志。
+    """
+
+    JOURNAL_NAME = ".yuque_export_journal.jsonl"
+    SHARD_JOURNAL_NAME = ".yuque_export_journal.shard{index}.jsonl"
+    FLUSH_EVERY = 20
+    OPTION_FIELDS = ("doc_format", "line_break", "sheet_format", "table_format")  # MutualAnswer 中影响导出结果的字段
+
+    def __init__(self, output_dir: str, options: Dict[str, Any], name: str = JOURNAL_NAME):
+        self.path = os.path.join(output_dir, name)
+        self.options = options
+        self.docs: Dict[str, Tuple[str, str]] = {}  # 上次任务中已导出的文档：文档标识 -> (文件, 版本)
+        self.localized: Dict[str, str] = {}  # 已完成资源处理的 Markdown 文件 -> 处理后的输出文件
+        self._pending: List[str] = []
+        self._lock = threading.Lock()
+        self.resumed = self._load()
+        if not self.resumed:
+            self.docs = {}
+            self.localized = {}
+            self._write_lines([self._dumps({"event": "job", "options": options, "started_at": int(time.time())})], "w")
+
+    @classmethod
+    def options_of(cls, answer: Any) -> Dict[str, Any]:
+        """提取影响导出结果的选项，选项不同的任务不能互相续传"""
+        return {name: getattr(answer, name) for name in cls.OPTION_FIELDS}
+
+    @classmethod
+    def shard_name(cls, index: int) -> str:
+        """分片导出时第 index 个分片的日志文件名"""
+        return cls.SHARD_JOURNAL_NAME.format(index=index)
+
+    @classmethod
+    def merge(cls, output_dir: str, options: Dict[str, Any], names: List[str]) -> "ExportJournal":
+        """将分片日志中的记录合并到主日志并标记任务完成，随后删除分片日志
+
+        Args:
+            output_dir: 输出目录
+            options: 主日志的导出选项
+            names: 分片日志文件名
+        """
+        journal = cls(output_dir, options)
+        paths = [os.path.join(output_dir, name) for name in names]
+        for path in paths:
+            for record in cls._read_records(path):
+                if record.get("event") in ("doc", "localized"):
+                    journal._append(record)
+        journal.finish()
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        return journal
+
+    @staticmethod
+    def _dumps(record: Dict[str, Any]) -> str:
+        return json.dumps(record, ensure_ascii=False)
+
+    @staticmethod
+    def doc_key(namespace: str, doc: Dict[str, Any]) -> str:
+        return f"{namespace}/{doc.get('id') or doc.get('uuid') or doc.get('slug') or doc.get('url') or ''}"
+
+    def _load(self) -> bool:
+        """读取上次未完成的日志，返回是否可以续传"""
+        if not os.path.exists(self.path):
+            return False
+        header = False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # 中断时可能留下不完整的最后一行
+                    event = record.get("event")
+                    if not header:
+                        if event != "job" or record.get("options") != self.options:
+                            return False
+                        header = True
+                    elif event == "doc":
+                        self.docs[record.get("key", "")] = (record.get("file", ""), record.get("version", ""))
+                        self.localized.pop(record.get("file", ""), None)  # 重新导出后需要重新处理资源
+                    elif event == "localized":
+                        file_path = record.get("file", "")
+                        self.localized[file_path] = record.get("output") or file_path
+                    elif event == "finished":
+                        return False
+        except OSError as e:
+            Log.warn(f"读取导出日志失败: {e}")
+            return False
+        return header
+
+    def _write_lines(self, lines: List[str], mode: str = "a") -> None:
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, mode, encoding="utf-8") as f:
+                f.write("".join(line + "\n" for line in lines))
+        except OSError as e:
+            Log.warn(f"写入导出日志失败: {e}")
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            self._pending.append(self._dumps(record))
+            if len(self._pending) < self.FLUSH_EVERY:
+                return
+            lines, self._pending = self._pending, []
+        self._write_lines(lines)
+
+    def flush(self) -> None:
+        """将缓存的记录写入磁盘"""
+        with self._lock:
+            lines, self._pending = self._pending, []
+        if lines:
+            self._write_lines(lines)
+
+    def completed_doc(self, namespace: str, doc: Dict[str, Any]) -> Optional[str]:
+        """返回文档在上次任务中导出的文件；文档已更新或文件已不存在时返回 None
+
+        已完成资源处理的文档可能已被移动到子目录 (见 MarkdownAssetLocalizer)，此时返回移动后的文件。
+        """
+        file_path, recorded_version = self.docs.get(self.doc_key(namespace, doc), ("", ""))
+        if not file_path:
+            return None
+        version = doc.get("content_updated_at") or ""
+        if version and recorded_version and recorded_version != version:
+            return None
+        if os.path.exists(file_path):
+            return file_path
+        output_path = self.localized.get(file_path)
+        if output_path and os.path.exists(output_path):
+            return output_path
+        return None
+
+    def record_doc(self, namespace: str, doc: Dict[str, Any], file_path: str,
+                   markdown_meta: Optional[Dict[str, Any]] = None) -> None:
+        """记录一篇已导出的文档 (只写入日志，不在内存中保留)
+
+        重新导出的文件需要重新处理资源，因此同时清除其资源处理记录。
+        """
+        self.localized.pop(file_path, None)
+        record = {
+            "event": "doc",
+            "key": self.doc_key(namespace, doc),
+            "file": file_path,
+            "version": doc.get("content_updated_at") or "",
+        }
+        if markdown_meta:
+            record["meta"] = markdown_meta
+        self._append(record)
+
+    @staticmethod
+    def _read_records(path: str) -> Iterator[Dict[str, Any]]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+        except OSError as e:
+            Log.warn(f"读取导出日志失败: {e}")
+
+    def _iter_records(self) -> Iterator[Dict[str, Any]]:
+        """逐行读取日志中的全部记录 (包括续传前的记录)"""
+        self.flush()
+        return self._read_records(self.path)
+
+    def files(self) -> List[str]:
+        """本次任务导出的全部文件"""
+        return list(dict.fromkeys(
+            record["file"] for record in self._iter_records()
+            if record.get("event") == "doc" and record.get("file")
+        ))
+
+    def markdown_meta(self) -> Dict[str, Dict[str, Any]]:
+        """本次任务导出的 Markdown 文件及其文档元数据"""
+        return {
+            record["file"]: record["meta"] for record in self._iter_records()
+            if record.get("event") == "doc" and record.get("meta")
+        }
+
+    def record_localized(self, md_file: str, output_path: str = "") -> None:
+        """记录一个已完成资源处理的 Markdown 文件
+
+        Args:
+            md_file: 导出时的 Markdown 文件
+            output_path: 资源处理后的 Markdown 文件 (处理时可能被移动到子目录)
+        """
+        output_path = output_path or md_file
+        self.localized[md_file] = output_path
+        self._append({"event": "localized", "file": md_file, "output": output_path})
+
+    def finish(self) -> None:
+        """标记任务全部完成，之后的导出不再从这里续传"""
+        self._append({"event": "finished", "finished_at": int(time.time())})
+        self.flush()
+
+
+class ExportJob:
+    """导出任务句柄
+
+    - cancel() 设置取消标志并取消正在 run 的主协程；取消沿 await 链传递到调度器的各文档任务、
+      进行中的 HTTP 请求 (aiohttp 随之断开连接)、导出状态轮询和 Playwright 页面 (在 finally 中关闭)
+    - 循环在每轮开始前通过 ExportJob.current() 取得当前任务并调用 raise_if_cancelled
+    - 在线程中运行的代码通过 stop_event 感知取消
+    - 每次 run 结束 (包括被取消) 时把日志中缓存的记录写入磁盘，再次导出时可以续传
+    """
+
+    def __init__(self, journal: Optional[ExportJournal] = None):
+        self.journal = journal
+        self.stop_event = threading.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def current() -> Optional["ExportJob"]:
+        """当前协程所属的导出任务，不在任务中运行时返回 None"""
+        return _current_job.get()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.stop_event.is_set()
+
+    def raise_if_cancelled(self) -> None:
+        if self.cancelled:
+            raise asyncio.CancelledError()
+
+    def cancel(self) -> None:
+        """请求取消任务，可重复调用"""
+        if self.cancelled:
+            return
+        self.stop_event.set()
+        Log.warn("正在取消导出任务...")
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+    async def run(self, coro: Awaitable[Any]) -> Any:
+        """在任务句柄下运行协程
+
+        Raises:
+            asyncio.CancelledError: 任务已被取消
+        """
+        if self.cancelled:
+            if asyncio.iscoroutine(coro):
+                coro.close()
+            elif asyncio.isfuture(coro):
+                # 如 asyncio.gather 返回的已在运行的 future，取消其中的全部任务
+                coro.cancel()
+                coro.add_done_callback(lambda future: future.cancelled() or future.exception())
+            raise asyncio.CancelledError()
+
+        async def main():
+            _current_job.set(self)
+            return await coro
+
+        self._task = asyncio.ensure_future(main())
+        try:
+            return await self._task
+        finally:
+            self._task = None
+            if self.journal is not None:
+                self.journal.flush()
+
+
+def answer_files(answer: Any) -> List[str]:
+    """导出任务中成功导出的文件：有导出日志时从日志读取，否则使用 answer 中的记录"""
+    journal = answer.job.journal if answer.job is not None else None
+    if journal is not None:
+        return journal.files()
+    return list(answer.downloaded_files)
+
+
+def answer_markdown_meta(answer: Any) -> Dict[str, Dict[str, Any]]:
+    """导出任务中的 Markdown 文件及其文档元数据，来源同 answer_files"""
+    journal = answer.job.journal if answer.job is not None else None
+    if journal is not None:
+        return journal.markdown_meta()
+    return dict(answer.downloaded_markdown_meta)
+
+
+async def gather_workers(coros: Iterable[Awaitable[Any]]) -> List[Any]:
+    """并发运行一组工作协程并返回结果
+
+    任意一个协程出错或调用方被取消时，取消其余协程并等待它们结束，不让它们在后台继续运行。
+    协程在调用时的上下文中启动，在 ExportJob.run 中调用时可以通过 ExportJob.current() 取得任务。
+    """
+    tasks = [asyncio.ensure_future(coro) for coro in coros]
+    try:
+        return await asyncio.gather(*tasks)
+    finally:
+        pending = [task for task in tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
@@ -5,6 +5,7 @@ URL: https://github.com/Be1k0/YuQue-BdT
 
 import os
 import shutil
+import threading
 from pathlib import Path
 
 class File:
@@ -67,6 +68,27 @@ class File:
         with open(file_path, 'w', encoding='utf-8') as f:
             f.write(content)
 
+    def write_atomic(self, file_path: str, content: str) -> None:
+        """写入文件内容 (先写临时文件再替换)
+
+        多个进程同时写入同一文件时，读取方只会看到某一次完整的写入，不会读到写了一半的内容。
+
+        Args:
+            file_path: 文件或目录路径
+            content: 要写入的内容
+        """
+        path = Path(file_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        temp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.replace(temp_path, path)
+        except BaseException:
+            temp_path.unlink(missing_ok=True)
+            raise
+
     def append(self, file_path: str, content: str) -> None:
         """追加文件内容
         
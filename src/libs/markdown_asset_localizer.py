@@ -3,21 +3,26 @@ Author: Be1k0
 URL: https://github.com/Be1k0/YuQue-BdT
 '''
 
+import asyncio
 import html
 import json
 import mimetypes
+import os
 import re
+import time
 from dataclasses import dataclass
-from html.parser import HTMLParser
 from pathlib import Path
-from typing import Any, Callable, Dict, Optional, Tuple
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
 from urllib.parse import unquote, urlparse
 
-import requests
+import aiohttp
 
 from .constants import GLOBAL_CONFIG
 from .file import File
 from .log import Log
+from .tracing import Tracer
+from .metrics import Metrics
+from .singleflight import SingleFlight, cookie_identity
 
 BASE_URL = "https://www.yuque.com"
 USER_AGENT = (
@@ -31,6 +36,14 @@ WINDOWS_BAD_CHARS_RE = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
 SUPPORTED_CARD_TYPES = {"video", "audio"}
 IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".webp", ".bmp", ".svg"}
 
+# 跨文件 (跨实例) 合并相同文档的卡片信息请求
+_DOC_CARDS_FLIGHT = SingleFlight("doc_cards")
+
+
+def yuque_base_url() -> str:
+    """语雀站点地址，跟随全局配置以便指向镜像或本地模拟服务"""
+    return (GLOBAL_CONFIG.yuque_host or BASE_URL).rstrip("/")
+
 
 @dataclass
 class DocInfo:
@@ -42,19 +55,27 @@ class DocInfo:
     @property
     def page_url(self) -> str:
         if self.namespace and self.slug:
-            return f"{BASE_URL}/{self.namespace}/{self.slug}"
-        return BASE_URL
+            return f"{yuque_base_url()}/{self.namespace}/{self.slug}"
+        return yuque_base_url()
 
 
 @dataclass
 class CardInfo:
     name: str
     attrs: Dict[str, str]
-    payload: Dict[str, Any]
+    decoded: Optional[Dict[str, Any]] = None  # 已解码的载荷，None 表示尚未解码
+    known_id: str = ""  # 已确定的卡片 ID，无需解码载荷
+
+    @property
+    def payload(self) -> Dict[str, Any]:
+        # 载荷只在第一次访问时解码
+        if self.decoded is None:
+            self.decoded = parse_card_payload(self.attrs.get("value", ""))
+        return self.decoded
 
     @property
     def card_id(self) -> str:
-        return str(self.payload.get("id") or self.attrs.get("id") or "")
+        return self.known_id or str(self.payload.get("id") or self.attrs.get("id") or "")
 
 
 @dataclass
@@ -74,16 +95,6 @@ class LocalizeStats:
         return self.direct_count + self.card_count
 
 
-class CardHTMLParser(HTMLParser):
-    def __init__(self):
-        super().__init__()
-        self.cards: list[dict[str, str]] = []
-
-    def handle_starttag(self, tag, attrs):
-        if tag.lower() == "card":
-            self.cards.append({key: value or "" for key, value in attrs})
-
-
 def load_json(path: Path) -> Dict[str, Any]:
     if not path.exists():
         return {}
@@ -181,20 +192,331 @@ def parse_card_payload(value: str) -> Dict[str, Any]:
     return {}
 
 
-def extract_cards(content: str) -> Dict[str, CardInfo]:
-    parser = CardHTMLParser()
-    parser.feed(content or "")
+CARD_ATTR_RE = re.compile(r"""\s*([^\s=/>"']+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'=<>`]+)))?""")
+CARD_ID_PEEK_RE = re.compile(r'(?:"|%22)id(?:"|%22)(?:\s|%20)*(?::|%3A)(?:\s|%20)*(?:"|%22)([^"%&]+)', re.IGNORECASE)
+
+
+def scan_card_tags(content: str) -> list:
+    """收集文档中所有 <card> 起始标签的属性
 
-    cards: Dict[str, CardInfo] = {}
-    for attrs in parser.cards:
-        payload = parse_card_payload(attrs.get("value", ""))
-        card = CardInfo(name=attrs.get("name", ""), attrs=attrs, payload=payload)
-        if card.card_id:
-            cards[card.card_id] = card
-    return cards
+    用 str.find 在 <card 出现位置之间跳转，只解析这些标签的属性，不对整篇文档做 HTML 解析。
+    属性值的 HTML 实体只在包含 & 时才反转义，结果与 HTMLParser 一致。
+    语雀 Lake 正文中的标签名均为小写，因此只查找小写的 <card。
+    """
+    tags = []
+    if not content:
+        return tags
+    length = len(content)
+    find = content.find
+    pos = find("<card")
+    while pos >= 0:
+        index = pos + 5
+        if index < length and content[index] not in " \t\r\n/>":
+            pos = find("<card", index)  # <cards、<card-xxx 等其他标签
+            continue
+
+        attrs: Dict[str, str] = {}
+        while index < length:
+            match = CARD_ATTR_RE.match(content, index)
+            if not match or match.end() == index:
+                break
+            key, double, single, bare = match.groups()
+            value = double if double is not None else single if single is not None else bare or ""
+            attrs[key.lower()] = html.unescape(value) if "&" in value else value
+            index = match.end()
+        tags.append(attrs)
+        pos = find("<card", index)
+    return tags
+
+
+def peek_card_id(value: str) -> str:
+    """不解码载荷，直接从 value 中找出卡片 ID (可能不准确，仅用于定位)"""
+    match = CARD_ID_PEEK_RE.search(value or "")
+    return unquote(match.group(1)) if match else ""
+
+
+class CardIndex:
+    """文档卡片索引
+
+    按卡片 ID 查找，行为与 {card_id: CardInfo} 字典一致 (同 ID 时后出现的卡片生效)。
+    建立索引时只从 value 中截取 ID 作为定位提示，不解码载荷；
+    查找时只解码命中的那张卡片并核对 ID，核对失败才退回到解码全部卡片。
+    """
+
+    def __init__(self, cards: Iterable[CardInfo] = ()):
+        self.cards = list(cards)
+        self._by_hint: Dict[str, CardInfo] = {}
+        for card in self.cards:
+            hint = card.known_id or card.attrs.get("id") or peek_card_id(card.attrs.get("value", ""))
+            if hint:
+                self._by_hint[hint] = card
+        self._resolved: Optional[Dict[str, CardInfo]] = None
+
+    def __len__(self) -> int:
+        return len(self.cards)
+
+    def get(self, card_id: str, default: Optional[CardInfo] = None) -> Optional[CardInfo]:
+        if self._resolved is not None:
+            return self._resolved.get(card_id, default)
+        card = self._by_hint.get(card_id)
+        if card is not None and card.card_id == card_id:
+            return card
+        return self.resolve_all().get(card_id, default)
+
+    def resolve_all(self) -> Dict[str, CardInfo]:
+        """解码全部卡片，返回 {card_id: CardInfo}"""
+        if self._resolved is None:
+            resolved: Dict[str, CardInfo] = {}
+            for card in self.cards:
+                if card.card_id:
+                    resolved[card.card_id] = card
+            self._resolved = resolved
+        return self._resolved
+
+
+def extract_cards(content: str) -> CardIndex:
+    return CardIndex(
+        CardInfo(name=attrs.get("name", ""), attrs=attrs)
+        for attrs in scan_card_tags(content)
+    )
+
+
+class AssetMetaCache:
+    """文档卡片与媒体下载地址的共享缓存
+
+    进程内所有 MarkdownAssetLocalizer 共用 (AssetMetaCache.shared())，并持久化到 .meta，
+    之后的导出可以直接复用。卡片信息按 local_expire 过期；媒体下载地址一般带签名，
+    按链接中的 Expires 参数 (没有时按 MEDIA_TTL_MS) 过期，并按 Cookie 区分账号。
+    注销时需调用 reset()，避免上一个账号的数据被写回 .meta。
+    """
+
+    MEDIA_TTL_MS = 30 * 60 * 1000
+    MEDIA_EXPIRE_MARGIN_MS = 60 * 1000  # 签名过期前预留的余量
+
+    _shared: Optional["AssetMetaCache"] = None
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._cards: Dict[str, Dict[str, Any]] = {}
+        self._media: Dict[str, Dict[str, Any]] = {}
+        self._dirty = False
+        self._load()
+
+    @classmethod
+    def shared(cls) -> "AssetMetaCache":
+        """进程内共享的缓存实例"""
+        if cls._shared is None:
+            cls._shared = cls(GLOBAL_CONFIG.asset_meta_cache_file)
+        return cls._shared
+
+    @classmethod
+    def reset(cls) -> None:
+        """丢弃进程内共享的缓存实例 (包括尚未写入磁盘的数据)，下次使用时重新从磁盘加载"""
+        cls._shared = None
+
+    @staticmethod
+    def _media_key(media_id: str, cookie_id: str) -> str:
+        return f"{cookie_id}:{media_id}" if cookie_id else str(media_id)
+
+    @staticmethod
+    def _now() -> int:
+        return int(time.time() * 1000)
+
+    def _load(self) -> None:
+        data = load_json(self.path)
+        now = self._now()
+        self._cards = {k: v for k, v in (data.get("cards") or {}).items() if v.get("expire_time", 0) > now}
+        self._media = {k: v for k, v in (data.get("media") or {}).items() if v.get("expire_time", 0) > now}
+
+    def get_cards(self, doc_id: int) -> Optional[CardIndex]:
+        entry = self._cards.get(str(doc_id))
+        if not entry or entry.get("expire_time", 0) <= self._now():
+            return None
+        if not isinstance(entry.get("cards"), list):
+            return None  # 旧格式 (按 ID 保存的已解码载荷)，重新获取
+        cards = []
+        for card in entry.get("cards", []):
+            attrs = dict(card.get("attrs", {}))
+            if "value" in card:
+                attrs["value"] = card["value"]
+            cards.append(CardInfo(
+                name=card.get("name", ""),
+                attrs=attrs,
+                decoded=card.get("payload"),
+                known_id=card.get("id", "") if "value" not in card else "",
+            ))
+        return CardIndex(cards)
+
+    def put_cards(self, doc_id: int, cards: CardIndex) -> None:
+        """保存文档卡片
+
+        已解码的卡片保存载荷；未解码的音视频卡片保留原始 value 以便之后解码；
+        其他类型的卡片只需要名称和 ID (用于提示暂不支持)，不保存可能很大的 value。
+        """
+        entries = []
+        for card in cards.cards:
+            item = {"name": card.name, "attrs": {k: v for k, v in card.attrs.items() if k != "value"}}
+            if card.decoded is not None or card.known_id:
+                item["id"] = card.card_id
+                if card.decoded is not None:
+                    item["payload"] = card.decoded
+            elif card.name in SUPPORTED_CARD_TYPES:
+                item["value"] = card.attrs.get("value", "")
+            else:
+                item["id"] = card.attrs.get("id") or peek_card_id(card.attrs.get("value", ""))
+            entries.append(item)
+        self._cards[str(doc_id)] = {
+            "expire_time": self._now() + GLOBAL_CONFIG.local_expire,
+            "cards": entries,
+        }
+        self._dirty = True
+
+    def get_media_url(self, media_id: str, cookie_id: str = "") -> Optional[str]:
+        """取得媒体下载地址
+
+        Args:
+            media_id: 媒体 ID
+            cookie_id: 请求时所用 Cookie 的摘要 (cookie_identity)，签名地址只对同一账号复用
+        """
+        entry = self._media.get(self._media_key(media_id, cookie_id))
+        if not entry or entry.get("expire_time", 0) <= self._now():
+            return None
+        return entry.get("url")
+
+    def put_media_url(self, media_id: str, url: str, cookie_id: str = "") -> None:
+        now = self._now()
+        expire_time = now + self.MEDIA_TTL_MS
+        query = dict(part.split("=", 1) for part in urlparse(url).query.split("&") if "=" in part)
+        signed_expires = query.get("Expires") or query.get("expires")
+        if signed_expires and signed_expires.isdigit():
+            expire_time = min(expire_time, int(signed_expires) * 1000 - self.MEDIA_EXPIRE_MARGIN_MS)
+        if expire_time <= now:
+            return
+        self._media[self._media_key(media_id, cookie_id)] = {"expire_time": expire_time, "url": url}
+        self._dirty = True
+
+    def flush(self) -> bool:
+        """有变化时写入磁盘 (先写临时文件再替换，多个进程同时写入时不会留下损坏的文件)"""
+        if not self._dirty:
+            return True
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            temp_path.write_text(
+                json.dumps({"cards": self._cards, "media": self._media}, ensure_ascii=False),
+                encoding="utf-8",
+            )
+            os.replace(temp_path, self.path)
+            self._dirty = False
+            return True
+        except Exception as exc:
+            Log.warn(f"写入资源元数据缓存失败: {exc}")
+            return False
+
+
+async def prefetch_asset_metadata(
+    md_files: Iterable[str],
+    markdown_meta: Optional[Dict[str, Dict[str, Any]]] = None,
+    cookie_string: str = "",
+    has_login_cookie: bool = False,
+    session: Optional[aiohttp.ClientSession] = None,
+    concurrency: int = 5,
+) -> Dict[str, int]:
+    """在离线化之前批量预取卡片与媒体下载地址
+
+    扫描全部 Markdown 文件中的卡片链接，按文档并发获取卡片信息，再并发解析被引用的音视频下载地址，
+    结果写入 AssetMetaCache.shared()。之后各文件离线化时直接命中缓存，不再逐个链接串行请求。
+    预取失败的条目在离线化时仍会按原方式请求。
+
+    Returns:
+        {"docs": 获取卡片的文档数, "media": 解析的媒体数, "failed": 失败数}
+    """
+    summary = {"docs": 0, "media": 0, "failed": 0}
+    cache = AssetMetaCache.shared()
+    references: Dict[int, set] = {}
+    doc_infos: Dict[int, DocInfo] = {}
+
+    async with MarkdownAssetLocalizer(cookie_string=cookie_string, max_workers=concurrency, session=session) as localizer:
+        for md_file in md_files:
+            if not str(md_file).lower().endswith(".md"):
+                continue
+            doc_info = localizer._build_doc_info((markdown_meta or {}).get(md_file))
+            if doc_info:
+                doc_infos[doc_info.doc_id] = doc_info
+            try:
+                markdown = Path(md_file).read_text(encoding="utf-8", errors="ignore")
+            except OSError:
+                continue
+            for match in MARKDOWN_LINK_RE.finditer(markdown):
+                url = match.group(3)
+                doc_id = get_card_doc_id(url)
+                if doc_id is not None:
+                    references.setdefault(doc_id, set()).add(extract_card_anchor(url))
+
+        if not references:
+            return summary
+
+        Log.info(f"预取卡片信息: 文档 {len(references)} 个")
+        semaphore = asyncio.Semaphore(localizer.max_workers)
+
+        async def load_doc(doc_id: int) -> None:
+            async with semaphore:
+                try:
+                    doc_info = doc_infos.get(doc_id) or localizer.resolve_doc_info(doc_id)
+                    doc_infos[doc_id] = doc_info
+                    fetched = cache.get_cards(doc_id) is None
+                    await localizer.get_doc_cards(doc_id, doc_info)
+                    summary["docs"] += int(fetched)
+                except Exception as exc:
+                    summary["failed"] += 1
+                    Log.warn(f"预取文档 docs/{doc_id} 卡片信息失败: {exc}")
+
+        await asyncio.gather(*(load_doc(doc_id) for doc_id in references))
+
+        if not has_login_cookie:
+            cache.flush()
+            return summary
+
+        media_cards = []
+        for doc_id, anchors in references.items():
+            cards = localizer.doc_cache.get(doc_id) or {}
+            for anchor in anchors:
+                card = cards.get(anchor)
+                if card and card.name in SUPPORTED_CARD_TYPES and doc_id in doc_infos:
+                    media_id = card.payload.get("videoId") or card.payload.get("audioId")
+                    if media_id and cache.get_media_url(media_id, cookie_identity(localizer.cookie_string)) is None:
+                        media_cards.append((card, doc_infos[doc_id]))
+
+        async def load_media(card: CardInfo, doc_info: DocInfo) -> None:
+            async with semaphore:
+                try:
+                    await localizer.resolve_media_download_url(card, doc_info)
+                    summary["media"] += 1
+                except Exception as exc:
+                    summary["failed"] += 1
+                    Log.warn(f"预取媒体下载地址失败: {card.card_id} -> {exc}")
+
+        if media_cards:
+            Log.info(f"预取媒体下载地址: {len(media_cards)} 个")
+            await asyncio.gather(*(load_media(card, doc_info) for card, doc_info in media_cards))
+
+    cache.flush()
+    return summary
 
 
 class MarkdownAssetLocalizer:
+    """Markdown 文档资源离线化 (asyncio)
+
+    在调用方的事件循环中运行：传入 session 时复用其连接池 (以及挂在其上的追踪/指标)，
+    否则按需创建并在 close 时关闭。单个文件内的链接并发处理，并发数由 max_workers 限制；
+    多个实例可共用同一个 semaphore，从而限制整个任务的并发下载数。
+    输出的 Markdown 与统计结果 (LocalizeStats) 和逐个处理时一致。
+    """
+
+    API_TIMEOUT = 30  # 接口请求超时 (秒)
+    DOWNLOAD_READ_TIMEOUT = 60  # 下载时单次读取超时 (秒)
+    CHUNK_SIZE = 1024 * 256
+
     def __init__(
         self,
         cookie_string: str = "",
@@ -203,6 +525,8 @@ class MarkdownAssetLocalizer:
         image_rename_mode: str = "asc",
         image_file_prefix: str = "image-",
         yuque_cdn_domain: str = "cdn.nlark.com",
+        session: Optional[aiohttp.ClientSession] = None,
+        semaphore: Optional[asyncio.Semaphore] = None,
     ):
         self.cookie_string = cookie_string.strip()
         self.max_workers = max(1, int(max_workers))
@@ -210,11 +534,15 @@ class MarkdownAssetLocalizer:
         self.image_rename_mode = image_rename_mode
         self.image_file_prefix = image_file_prefix or "image-"
         self.yuque_cdn_domain = (yuque_cdn_domain or "cdn.nlark.com").strip().lower()
-        self.session = requests.Session()
-        self.session.headers.update({"User-Agent": USER_AGENT})
-        self.doc_cache: Dict[int, Dict[str, CardInfo]] = {}
+        self.session = session
+        self._owns_session = session is None
+        self.semaphore = semaphore
+        self.doc_cache: Dict[int, CardIndex] = {}
         self.url_to_local_path: Dict[str, Path] = {}
+        self._downloads: Dict[str, asyncio.Task] = {}
         self.reserved_paths: set[Path] = set()
+        self.reserved_stems: set[str] = set()
+        self.planned_names: Dict[str, Any] = {}  # 链接 -> 预留的文件路径 (Path) 或待补扩展名的文件名 (str)
         self.current_doc_info: Optional[DocInfo] = None
         self.output_md_path: Optional[Path] = None
         self.asset_dir: Optional[Path] = None
@@ -222,11 +550,60 @@ class MarkdownAssetLocalizer:
         self.has_login_cookie = False
         self.image_index = 0
 
-    def process_single_file(
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self) -> None:
+        """关闭自行创建的 session，传入的 session 由调用方管理"""
+        if self._owns_session and self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                headers={"User-Agent": USER_AGENT},
+                trace_configs=Tracer.trace_configs() + Metrics.trace_configs(),
+            )
+            self._owns_session = True
+        return self.session
+
+    @staticmethod
+    def _ssl():
+        return False if GLOBAL_CONFIG.disable_ssl else None
+
+    async def process_single_file(
         self,
         md_file_path: str,
         current_doc_meta: Optional[Dict[str, Any]] = None,
         has_login_cookie: bool = False,
+    ) -> LocalizeStats:
+        meta = current_doc_meta or {}
+        with Tracer.bind(
+            book=meta.get("namespace", ""),
+            doc=meta.get("doc_url") or meta.get("slug", ""),
+            title=meta.get("title", ""),
+        ):
+            with Tracer.span("localize", "asset", file=Path(md_file_path).name):
+                try:
+                    return await self._process_single_file(md_file_path, current_doc_meta, has_login_cookie)
+                except asyncio.CancelledError:
+                    self.cancel_downloads()
+                    raise
+
+    def cancel_downloads(self) -> None:
+        """取消进行中的资源下载 (下载任务被多个链接共享，不会随单个链接的取消而结束)"""
+        for task in self._downloads.values():
+            task.cancel()
+
+    async def _process_single_file(
+        self,
+        md_file_path: str,
+        current_doc_meta: Optional[Dict[str, Any]],
+        has_login_cookie: bool,
     ) -> LocalizeStats:
         source_path = Path(md_file_path)
         self.stats = LocalizeStats(
@@ -236,7 +613,10 @@ class MarkdownAssetLocalizer:
         self.has_login_cookie = has_login_cookie
         self.current_doc_info = self._build_doc_info(current_doc_meta)
         self.url_to_local_path = {}
+        self._downloads = {}
         self.reserved_paths = set()
+        self.reserved_stems = set()
+        self.planned_names = {}
         self.image_index = 0
 
         if source_path.suffix.lower() != ".md":
@@ -261,7 +641,7 @@ class MarkdownAssetLocalizer:
             f"输出目录 {self.asset_dir}"
         )
 
-        replaced = MARKDOWN_LINK_RE.sub(self.replace_one_link, markdown)
+        replaced = await self._replace_links(markdown)
         File().write(str(self.output_md_path), replaced)
 
         if self.output_md_path != source_path and source_path.exists():
@@ -429,12 +809,34 @@ class MarkdownAssetLocalizer:
             return f"{user}/{repo}"
         return ""
 
-    def get_doc_cards(self, doc_id: int) -> Dict[str, CardInfo]:
+    async def get_doc_cards(self, doc_id: int, doc_info: Optional[DocInfo] = None) -> CardIndex:
         if doc_id in self.doc_cache:
             return self.doc_cache[doc_id]
 
-        doc_info = self.resolve_doc_info(doc_id)
-        url = f"{BASE_URL}/api/docs/{doc_info.slug}"
+        cache = AssetMetaCache.shared()
+        cards = cache.get_cards(doc_id)
+        if cards is None:
+            # 多个文件并行处理时，同一文档的卡片信息只请求一次 (使用同一 session 的调用方之间)
+            key = ("GET", "doc_cards", doc_id, cookie_identity(self.cookie_string), id(self._get_session()))
+            cards = await _DOC_CARDS_FLIGHT.run(key, lambda: self._fetch_doc_cards(doc_id, doc_info))
+            cache.put_cards(doc_id, cards)
+        self.doc_cache[doc_id] = cards
+        return cards
+
+    async def _get_json(self, url: str, params: Dict[str, str], referer: str) -> Dict[str, Any]:
+        async with self._get_session().get(
+            url,
+            params=params,
+            headers=self.api_headers(referer),
+            timeout=aiohttp.ClientTimeout(total=self.API_TIMEOUT),
+            ssl=self._ssl(),
+        ) as response:
+            response.raise_for_status()
+            return await response.json(content_type=None)
+
+    async def _fetch_doc_cards(self, doc_id: int, doc_info: Optional[DocInfo] = None) -> CardIndex:
+        doc_info = doc_info or self.resolve_doc_info(doc_id)
+        url = f"{yuque_base_url()}/api/docs/{doc_info.slug}"
         params = {
             "merge_dynamic_data": "false",
             "book_id": str(doc_info.book_id),
@@ -442,22 +844,13 @@ class MarkdownAssetLocalizer:
         Log.info(
             f"请求文档卡片信息: {url}?merge_dynamic_data=false&book_id={doc_info.book_id}"
         )
-        response = self.session.get(
-            url,
-            params=params,
-            headers=self.api_headers(doc_info.page_url),
-            timeout=30,
-        )
-        response.raise_for_status()
-
-        data = response.json()
+        data = await self._get_json(url, params, doc_info.page_url)
         content = data.get("data", {}).get("content", "")
         cards = extract_cards(content)
-        self.doc_cache[doc_id] = cards
         Log.info(f"文档 docs/{doc_id} 解析到卡片 {len(cards)} 个")
         return cards
 
-    def download_url(self, url: str, filename_hint: str, referer: str) -> Path:
+    async def download_url(self, url: str, filename_hint: str, referer: str) -> Path:
         url = normalize_url(url)
         if url in self.url_to_local_path:
             return self.url_to_local_path[url]
@@ -465,20 +858,47 @@ class MarkdownAssetLocalizer:
         if not self.asset_dir:
             raise RuntimeError("附件输出目录未初始化")
 
+        # 同一文件中重复出现的链接只下载一次
+        task = self._downloads.get(url)
+        if task is None:
+            task = asyncio.ensure_future(self._download(url, filename_hint, referer))
+            self._downloads[url] = task
+        return await asyncio.shield(task)
+
+    async def _download(self, url: str, filename_hint: str, referer: str) -> Path:
         filename = sanitize_filename(filename_hint or infer_filename_from_url(url), fallback="asset")
-        with self.session.get(
-            url,
-            headers=self.download_headers(url, referer),
-            stream=True,
-            timeout=60,
-        ) as response:
-            response.raise_for_status()
-            filename = ensure_extension(filename, url, response.headers.get("Content-Type", ""))
-            target = self.pick_target_path(filename)
-            with target.open("wb") as file:
-                for chunk in response.iter_content(chunk_size=1024 * 256):
-                    if chunk:
-                        file.write(chunk)
+        _, endpoint = Tracer.endpoint_template(url)
+        with Tracer.span("asset_download", "asset", endpoint=endpoint) as span, Metrics.timer("asset_download"):
+            async with self._get_session().get(
+                url,
+                headers=self.download_headers(url, referer),
+                timeout=aiohttp.ClientTimeout(total=None, sock_read=self.DOWNLOAD_READ_TIMEOUT),
+                ssl=self._ssl(),
+            ) as response:
+                response.raise_for_status()
+                planned = self.planned_names.get(url)
+                if isinstance(planned, Path):
+                    target = planned
+                elif planned:
+                    target = self.asset_dir / ensure_extension(planned, url, response.headers.get("Content-Type", ""))
+                else:
+                    filename = ensure_extension(filename, url, response.headers.get("Content-Type", ""))
+                    target = self.pick_target_path(filename)
+                # 先写入临时文件，下载完整后再替换为目标文件，进程被强制结束时不会留下同名的不完整文件
+                temp_path = target.with_name(f"{target.name}.part")
+                try:
+                    with temp_path.open("wb") as file:
+                        async for chunk in response.content.iter_chunked(self.CHUNK_SIZE):
+                            if chunk:
+                                file.write(chunk)
+                                span["bytes_in"] = span.get("bytes_in", 0) + len(chunk)
+                                Metrics.incr("bytes_in", len(chunk))
+                                Metrics.incr("disk_bytes_written", len(chunk))
+                    os.replace(temp_path, target)
+                except BaseException:
+                    # 下载失败或被取消时删除不完整的文件
+                    temp_path.unlink(missing_ok=True)
+                    raise
 
         self.url_to_local_path[url] = target
         Log.info(f"资源下载完成: {target.name}")
@@ -490,7 +910,7 @@ class MarkdownAssetLocalizer:
 
         candidate = self.asset_dir / sanitize_filename(filename)
         # 用内存占位，避免同一轮处理中出现重名覆盖。
-        if candidate not in self.reserved_paths:
+        if candidate not in self.reserved_paths and candidate.stem not in self.reserved_stems:
             self.reserved_paths.add(candidate)
             return candidate
 
@@ -499,34 +919,60 @@ class MarkdownAssetLocalizer:
         index = 1
         while True:
             next_candidate = self.asset_dir / f"{stem}_{index}{suffix}"
-            if next_candidate not in self.reserved_paths:
+            if next_candidate not in self.reserved_paths and next_candidate.stem not in self.reserved_stems:
                 self.reserved_paths.add(next_candidate)
                 return next_candidate
             index += 1
 
-    def resolve_media_download_url(self, card: CardInfo, doc_info: DocInfo) -> Tuple[str, str]:
+    def reserve_target_name(self, url: str, filename_hint: str) -> None:
+        """按链接出现顺序预留直链资源的文件名，重名时的编号不受下载完成先后影响
+
+        能从文件名或链接确定扩展名时直接预留完整路径；否则只预留文件名 (不与已预留路径的文件名重复)，
+        收到响应后再按 Content-Type 补上扩展名。
+        """
+        url = normalize_url(url)
+        if url in self.planned_names or url in self.url_to_local_path:
+            return
+
+        filename = sanitize_filename(filename_hint or infer_filename_from_url(url), fallback="asset")
+        if Path(filename).suffix or Path(unquote(urlparse(url).path)).suffix:
+            self.planned_names[url] = self.pick_target_path(ensure_extension(filename, url))
+            return
+
+        taken = self.reserved_stems | {path.stem for path in self.reserved_paths}
+        stem = filename
+        index = 1
+        while stem in taken:
+            stem = f"{filename}_{index}"
+            index += 1
+        self.reserved_stems.add(stem)
+        self.planned_names[url] = stem
+
+    async def resolve_media_download_url(self, card: CardInfo, doc_info: DocInfo) -> Tuple[str, str]:
         media_id = card.payload.get("videoId") or card.payload.get("audioId")
         if not media_id:
             raise RuntimeError(f"{card.name} card 中没有 videoId/audioId")
 
-        response = self.session.get(
-            f"{BASE_URL}/api/video",
-            params={"video_id": media_id},
-            headers=self.api_headers(doc_info.page_url),
-            timeout=30,
-        )
-        response.raise_for_status()
-        data = response.json()
-
-        info = data.get("data", {}).get("info", {})
-        download_url = (
-            info.get("origin")
-            or info.get("video")
-            or info.get("url")
-            or info.get("download_url")
-        )
+        cache = AssetMetaCache.shared()
+        cookie_id = cookie_identity(self.cookie_string)
+        download_url = cache.get_media_url(media_id, cookie_id)
         if not download_url:
-            raise RuntimeError(f"api/video 未返回可下载链接: {media_id}")
+            data = await self._get_json(
+                f"{yuque_base_url()}/api/video",
+                {"video_id": str(media_id)},
+                doc_info.page_url,
+            )
+
+            info = data.get("data", {}).get("info", {})
+            download_url = (
+                info.get("origin")
+                or info.get("video")
+                or info.get("url")
+                or info.get("download_url")
+            )
+            if not download_url:
+                raise RuntimeError(f"api/video 未返回可下载链接: {media_id}")
+            cache.put_media_url(media_id, download_url, cookie_id)
 
         filename = (
             card.payload.get("name")
@@ -541,7 +987,40 @@ class MarkdownAssetLocalizer:
             return path.name
         return path.relative_to(self.output_md_path.parent).as_posix()
 
-    def replace_one_link(self, match: re.Match[str]) -> str:
+    async def _replace_links(self, markdown: str) -> str:
+        """并发处理全部候选链接，按原顺序替换
+
+        图片序号 (build_filename_hint) 与直链资源的文件名 (reserve_target_name) 在发起下载前按链接出现顺序分配，
+        与逐个处理时相同。
+        """
+        matches = list(MARKDOWN_LINK_RE.finditer(markdown))
+        hints = [self._plan_link(match) for match in matches]
+        semaphore = self.semaphore or asyncio.Semaphore(self.max_workers)
+
+        async def run(match, hint):
+            if hint is None:
+                return match.group(0)
+            async with semaphore:
+                return await self.replace_one_link(match, hint)
+
+        results = await asyncio.gather(*(run(match, hint) for match, hint in zip(matches, hints)))
+        replacements = iter(results)
+        return MARKDOWN_LINK_RE.sub(lambda _: next(replacements), markdown)
+
+    def _plan_link(self, match: re.Match[str]) -> Optional[str]:
+        """返回链接的文件名提示；不是候选链接时返回 None"""
+        bang, label, url = match.groups()
+        if self.is_direct_asset_url(url):
+            if not self.has_login_cookie and self._is_login_required_direct_asset(url, label, bang):
+                return ""
+            filename_hint = self.build_filename_hint(url, label, bang)
+            self.reserve_target_name(url, filename_hint)
+            return filename_hint
+        if get_card_doc_id(url) is not None:
+            return ""
+        return None
+
+    async def replace_one_link(self, match: re.Match[str], filename_hint: str = "") -> str:
         if not self.stats:
             return match.group(0)
 
@@ -558,9 +1037,9 @@ class MarkdownAssetLocalizer:
                     self.stats.login_required_count += 1
                     return f"{original} <!-- 需要登录后才能离线保存该文件 -->"
 
-                filename_hint = self.build_filename_hint(url, label, bang)
-                referer = self.current_doc_info.page_url if self.current_doc_info else BASE_URL
-                target = self.download_url(url, filename_hint, referer=referer)
+                filename_hint = filename_hint or self.build_filename_hint(url, label, bang)
+                referer = self.current_doc_info.page_url if self.current_doc_info else yuque_base_url()
+                target = await self.download_url(url, filename_hint, referer=referer)
                 local_link = self.to_markdown_path(target)
                 self.stats.direct_count += 1
                 return f"{bang}[{label}]({local_link})"
@@ -571,7 +1050,7 @@ class MarkdownAssetLocalizer:
 
             anchor = extract_card_anchor(url)
             doc_info = self.resolve_doc_info(doc_id)
-            card = self.get_doc_cards(doc_id).get(anchor)
+            card = (await self.get_doc_cards(doc_id)).get(anchor)
             if not card:
                 self.stats.failed_count += 1
                 return f"{original} <!-- 未找到对应语雀卡片: #{anchor} -->"
@@ -584,14 +1063,16 @@ class MarkdownAssetLocalizer:
                 self.stats.login_required_count += 1
                 return f"{original} <!-- 需要登录后才能离线保存该文件: {card.name} #{anchor} -->"
 
-            download_url, filename = self.resolve_media_download_url(card, doc_info)
-            target = self.download_url(download_url, filename, referer=doc_info.page_url)
+            download_url, filename = await self.resolve_media_download_url(card, doc_info)
+            target = await self.download_url(download_url, filename, referer=doc_info.page_url)
             local_link = self.to_markdown_path(target)
             display_name = card.payload.get("name") or card.payload.get("fileName") or target.name
             self.stats.card_count += 1
             if card.name == "video":
                 return render_video_html(local_link, str(display_name), target)
             return f"[{display_name}]({local_link})"
+        except asyncio.CancelledError:
+            raise
         except Exception as exc:
             self.stats.failed_count += 1
             return f"{original} <!-- 下载失败: {exc} -->"
@@ -0,0 +1,123 @@
+'''
+Author: Be1k0
+URL: https://github.com/Be1k0/YuQue-BdT
+'''
+
+import os
+import time
+from typing import List, Optional
+
+from .metrics import Metrics
+
+
+class LineBreakTagFilter:
+    """增量过滤 Markdown 文本中的 <br> 标签
+
+    按块处理流式文本，块尾可能是标签前缀的部分会暂存到下一块再判断，
+    避免整篇文档多次 replace 产生的完整拷贝
+    """
+
+    TAGS = ('</br>', '<br>', '<br/>')
+
+    def __init__(self):
+        self._pending = ""
+
+    def feed(self, text: str) -> str:
+        """处理一个文本块，返回可以安全输出的部分
+
+        Args:
+            text: 新到达的文本块
+        """
+        if not text:
+            return ""
+
+        text = self._pending + text
+        self._pending = ""
+
+        for tag in self.TAGS:
+            if tag in text:
+                text = text.replace(tag, '')
+
+        # 块尾以 '<' 开头且可能构成标签前缀的部分留到下一块处理
+        tail_start = text.rfind('<', max(0, len(text) - 5))
+        if tail_start != -1:
+            tail = text[tail_start:]
+            if any(tag.startswith(tail) for tag in self.TAGS):
+                self._pending = tail
+                return text[:tail_start]
+        return text
+
+    def flush(self) -> str:
+        """输出暂存的剩余文本"""
+        pending, self._pending = self._pending, ""
+        return pending
+
+
+class MarkdownStringSink:
+    """将流式 Markdown 收集为字符串的写入目标"""
+
+    def __init__(self):
+        self._parts: List[str] = []
+
+    def write(self, text: str) -> None:
+        """写入文本块"""
+        self._parts.append(text)
+
+    def commit(self) -> str:
+        """完成写入并返回完整文本"""
+        return "".join(self._parts)
+
+    def discard(self) -> None:
+        """丢弃已写入的内容"""
+        self._parts = []
+
+
+class MarkdownFileSink:
+    """将流式 Markdown 直接写入文件的写入目标
+
+    内容先写入同目录下的临时文件，提交时再原子替换为目标文件，
+    失败时不会留下不完整的文档
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.temp_path = f"{file_path}.part"
+        self._handle = None
+        # 累计磁盘写入耗时，提交时记入 disk_write 指标
+        self._write_seconds = 0.0
+
+    def _ensure_open(self):
+        if self._handle is None:
+            parent_dir = os.path.dirname(self.file_path)
+            if parent_dir:
+                os.makedirs(parent_dir, exist_ok=True)
+            self._handle = open(self.temp_path, 'w', encoding='utf-8', newline='')
+        return self._handle
+
+    def write(self, text: str) -> None:
+        """写入文本块"""
+        started = time.perf_counter()
+        self._ensure_open().write(text)
+        self._write_seconds += time.perf_counter() - started
+
+    def commit(self) -> Optional[str]:
+        """完成写入并将临时文件替换为目标文件，返回目标文件路径"""
+        started = time.perf_counter()
+        handle = self._ensure_open()
+        handle.close()
+        self._handle = None
+        os.replace(self.temp_path, self.file_path)
+        Metrics.observe("disk_write", (self._write_seconds + time.perf_counter() - started) * 1000)
+        Metrics.incr("disk_bytes_written", os.path.getsize(self.file_path))
+        return self.file_path
+
+    def discard(self) -> None:
+        """丢弃已写入的内容并删除临时文件"""
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+        try:
+            if os.path.exists(self.temp_path):
+                os.remove(self.temp_path)
+        except OSError:
+            pass
@@ -0,0 +1,347 @@
+'''
+Author: Be1k0
+URL: https://github.com/Be1k0/YuQue-BdT
+'''
+
+import bisect
+import contextlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional
+
+from .constants import GLOBAL_CONFIG
+
+
+class Histogram:
+    """固定分桶的耗时直方图 (毫秒)"""
+
+    BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = 0.0
+        self.max = 0.0
+
+    def observe(self, value_ms: float) -> None:
+        """记录一次耗时"""
+        self.counts[bisect.bisect_left(self.BUCKETS_MS, value_ms)] += 1
+        self.min = value_ms if self.count == 0 else min(self.min, value_ms)
+        self.max = max(self.max, value_ms)
+        self.count += 1
+        self.sum += value_ms
+
+    def quantile(self, q: float) -> float:
+        """根据分桶线性插值估算分位数"""
+        if self.count == 0:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= target:
+                lower = self.BUCKETS_MS[index - 1] if index > 0 else 0.0
+                upper = self.BUCKETS_MS[index] if index < len(self.BUCKETS_MS) else self.max
+                value = lower + (upper - lower) * (target - seen) / bucket_count
+                return min(max(value, self.min), self.max)
+            seen += bucket_count
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum_ms": round(self.sum, 3),
+            "min_ms": round(self.min, 3),
+            "max_ms": round(self.max, 3),
+            "avg_ms": round(self.sum / self.count, 3) if self.count else 0.0,
+            "p50_ms": round(self.quantile(0.5), 3),
+            "p95_ms": round(self.quantile(0.95), 3),
+            "p99_ms": round(self.quantile(0.99), 3),
+            "buckets": list(self.counts),
+        }
+
+    def merge(self, data: Dict[str, Any]) -> None:
+        """合并另一个直方图的 to_dict() 结果"""
+        if not data.get("count"):
+            return
+        self.counts = [a + b for a, b in zip(self.counts, data["buckets"])]
+        self.min = data["min_ms"] if self.count == 0 else min(self.min, data["min_ms"])
+        self.max = max(self.max, data["max_ms"])
+        self.count += data["count"]
+        self.sum += data["sum_ms"]
+
+
+class Metrics:
+    """导出任务运行指标
+
+    按阶段记录耗时直方图 (目录获取、Markdown 获取、二进制导出等待、OSS 下载、资源下载、磁盘写入)，
+    并统计请求数、状态码、收发字节数、重试次数与并发峰值。每个任务结束时写出 JSON 汇总文件，
+    命令行模式下还可以通过 Prometheus 文本格式对外暴露
+    """
+
+    STAGES = ("toc_fetch", "markdown_fetch", "export_wait", "oss_download", "asset_download", "disk_write")
+
+    _lock = threading.Lock()
+    _job = ""
+    _started_wall = time.time()
+    _started = time.perf_counter()
+    _counters: Dict[str, float] = {}
+    _histograms: Dict[str, Histogram] = {}
+    _concurrency: Dict[str, int] = {}
+    _peak_concurrency: Dict[str, int] = {}
+
+    @classmethod
+    def reset(cls, job: str = "") -> None:
+        """开始一个新任务，清空已有指标
+
+        Args:
+            job: 任务名称，写入汇总文件
+        """
+        with cls._lock:
+            cls._job = job
+            cls._started_wall = time.time()
+            cls._started = time.perf_counter()
+            cls._counters = {}
+            cls._histograms = {stage: Histogram() for stage in cls.STAGES}
+            cls._concurrency = {}
+            cls._peak_concurrency = {}
+
+    @classmethod
+    def incr(cls, name: str, amount: float = 1) -> None:
+        """累加计数器"""
+        with cls._lock:
+            cls._counters[name] = cls._counters.get(name, 0) + amount
+
+    @classmethod
+    def observe(cls, stage: str, value_ms: float) -> None:
+        """记录一次阶段耗时"""
+        with cls._lock:
+            histogram = cls._histograms.get(stage)
+            if histogram is None:
+                histogram = cls._histograms[stage] = Histogram()
+            histogram.observe(value_ms)
+
+    @classmethod
+    @contextlib.contextmanager
+    def timer(cls, stage: str) -> Iterator[None]:
+        """统计一段代码的耗时，抛出异常时额外累加 <stage>_errors"""
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            cls.incr(f"{stage}_errors")
+            raise
+        finally:
+            cls.observe(stage, (time.perf_counter() - started) * 1000)
+
+    @classmethod
+    def enter(cls, name: str) -> None:
+        """并发数加一并更新峰值"""
+        with cls._lock:
+            current = cls._concurrency.get(name, 0) + 1
+            cls._concurrency[name] = current
+            cls._peak_concurrency[name] = max(cls._peak_concurrency.get(name, 0), current)
+
+    @classmethod
+    def leave(cls, name: str) -> None:
+        """并发数减一"""
+        with cls._lock:
+            cls._concurrency[name] = max(0, cls._concurrency.get(name, 0) - 1)
+
+    @classmethod
+    @contextlib.contextmanager
+    def track(cls, name: str) -> Iterator[None]:
+        """统计代码块的同时执行数量"""
+        cls.enter(name)
+        try:
+            yield
+        finally:
+            cls.leave(name)
+
+    # ---------- HTTP ----------
+
+    @classmethod
+    def trace_configs(cls) -> List[Any]:
+        """返回统计请求数、状态码、收发字节数与在途请求数的 aiohttp trace_configs"""
+        import aiohttp
+
+        config = aiohttp.TraceConfig(trace_config_ctx_factory=lambda trace_request_ctx=None: SimpleNamespace(active=False))
+        config.on_request_start.append(cls._on_request_start)
+        config.on_request_chunk_sent.append(cls._on_request_chunk_sent)
+        config.on_request_end.append(cls._on_request_end)
+        config.on_response_chunk_received.append(cls._on_response_chunk_received)
+        config.on_request_exception.append(cls._on_request_exception)
+        return [config]
+
+    @classmethod
+    async def _on_request_start(cls, session, ctx, params) -> None:
+        ctx.active = True
+        cls.incr("http_requests")
+        cls.enter("http_inflight")
+
+    @classmethod
+    async def _on_request_chunk_sent(cls, session, ctx, params) -> None:
+        cls.incr("bytes_out", len(params.chunk or b""))
+
+    @classmethod
+    async def _on_request_end(cls, session, ctx, params) -> None:
+        cls.incr(f"http_status_{params.response.status // 100}xx")
+        if ctx.active:
+            ctx.active = False
+            cls.leave("http_inflight")
+
+    @classmethod
+    async def _on_response_chunk_received(cls, session, ctx, params) -> None:
+        cls.incr("bytes_in", len(params.chunk or b""))
+
+    @classmethod
+    async def _on_request_exception(cls, session, ctx, params) -> None:
+        cls.incr("http_errors")
+        if ctx.active:
+            ctx.active = False
+            cls.leave("http_inflight")
+
+    @classmethod
+    def install_requests_hooks(cls, session: Any) -> None:
+        """为 requests.Session 安装响应钩子，统计请求数与状态码
+
+        流式下载的字节数由调用方在读取响应体时累加 bytes_in
+        """
+        session.hooks.setdefault("response", []).append(cls._requests_response_hook)
+
+    @classmethod
+    def _requests_response_hook(cls, response: Any, *args: Any, **kwargs: Any) -> Any:
+        cls.incr("http_requests")
+        cls.incr(f"http_status_{response.status_code // 100}xx")
+        return response
+
+    # ---------- 汇总 ----------
+
+    @classmethod
+    def snapshot(cls) -> Dict[str, Any]:
+        """返回当前指标的可序列化快照"""
+        with cls._lock:
+            return {
+                "job": cls._job,
+                "started_at": datetime.fromtimestamp(cls._started_wall).isoformat(timespec="seconds"),
+                "elapsed_seconds": round(time.perf_counter() - cls._started, 3),
+                "counters": dict(cls._counters),
+                "peak_concurrency": dict(cls._peak_concurrency),
+                "stages": {name: hist.to_dict() for name, hist in cls._histograms.items()},
+            }
+
+    @classmethod
+    def merge(cls, snapshot: Dict[str, Any]) -> None:
+        """合并子进程的指标快照，并发峰值按各进程峰值相加"""
+        with cls._lock:
+            for name, value in snapshot.get("counters", {}).items():
+                cls._counters[name] = cls._counters.get(name, 0) + value
+            for name, value in snapshot.get("peak_concurrency", {}).items():
+                cls._peak_concurrency[name] = cls._peak_concurrency.get(name, 0) + value
+            for name, data in snapshot.get("stages", {}).items():
+                cls._histograms.setdefault(name, Histogram()).merge(data)
+
+    @classmethod
+    def build_summary(cls, extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """生成任务汇总，extra 中的 downloaded/assets 用于计算吞吐"""
+        summary = cls.snapshot()
+        summary.update(extra or {})
+        elapsed = summary["elapsed_seconds"] or 0.0
+        counters = summary["counters"]
+        summary["throughput"] = {
+            "docs_per_sec": round(summary.get("downloaded", 0) / elapsed, 3) if elapsed else 0.0,
+            "assets_per_sec": round(summary.get("assets", 0) / elapsed, 3) if elapsed else 0.0,
+            "bytes_in_per_sec": round(counters.get("bytes_in", 0) / elapsed, 1) if elapsed else 0.0,
+        }
+        return summary
+
+    @classmethod
+    def write_summary(cls, path: Optional[str] = None, extra: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """写出任务汇总文件并返回路径
+
+        Args:
+            path: 输出路径，为空时写入 .meta/metrics/metrics_<时间>.json
+            extra: 追加到汇总中的任务结果，如 downloaded、skipped、failed、assets
+        """
+        if not path:
+            path = os.path.join(
+                GLOBAL_CONFIG.meta_dir, "metrics",
+                f"metrics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+            )
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(cls.build_summary(extra), f, ensure_ascii=False, indent=2)
+            return path
+        except OSError:
+            return None
+
+    @classmethod
+    def prometheus_text(cls) -> str:
+        """以 Prometheus 文本格式输出当前指标"""
+        snapshot = cls.snapshot()
+        lines: List[str] = []
+        for name, value in sorted(snapshot["counters"].items()):
+            metric = f"yuque_export_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+
+        lines.append("# TYPE yuque_export_peak_concurrency gauge")
+        for name, value in sorted(snapshot["peak_concurrency"].items()):
+            lines.append(f'yuque_export_peak_concurrency{{scope="{name}"}} {value}')
+
+        with cls._lock:
+            current = dict(cls._concurrency)
+        lines.append("# TYPE yuque_export_concurrency gauge")
+        for name, value in sorted(current.items()):
+            lines.append(f'yuque_export_concurrency{{scope="{name}"}} {value}')
+
+        metric = "yuque_export_stage_duration_seconds"
+        lines.append(f"# TYPE {metric} histogram")
+        for stage, data in snapshot["stages"].items():
+            cumulative = 0
+            for upper, count in zip(list(Histogram.BUCKETS_MS) + [None], data["buckets"]):
+                cumulative += count
+                le = "+Inf" if upper is None else f"{upper / 1000:g}"
+                lines.append(f'{metric}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'{metric}_sum{{stage="{stage}"}} {data["sum_ms"] / 1000:.6f}')
+            lines.append(f'{metric}_count{{stage="{stage}"}} {data["count"]}')
+
+        lines.append("# TYPE yuque_export_elapsed_seconds gauge")
+        lines.append(f"yuque_export_elapsed_seconds {snapshot['elapsed_seconds']}")
+        return "\n".join(lines) + "\n"
+
+    @classmethod
+    def serve_prometheus(cls, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """在后台线程中启动 /metrics 接口，返回的服务对象调用 shutdown() 停止
+
+        Args:
+            port: 监听端口
+            host: 监听地址
+        """
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = cls.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        return server
+
+
+Metrics.reset()
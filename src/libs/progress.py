@@ -0,0 +1,121 @@
+'''
+Author: Be1k0
+URL: https://github.com/Be1k0/YuQue-BdT
+'''
+
+import time
+from collections import deque
+from typing import Dict, Hashable, Optional
+
+from .constants import ProgressSnapshot
+
+
+class ProgressAggregator:
+    """导出进度聚合器
+
+    文档/资源处理过程中只更新内存中的计数和当前条目，不做任何界面调用；
+    界面按固定帧率调用 snapshot 读取合并后的进度 (完成数/总数、速率、预计剩余时间、当前条目)，
+    因此无论文档完成得多快，界面刷新开销都保持不变。
+
+    写入方只修改普通属性，不加锁：同一阶段的更新都来自同一线程 (调度器所在的事件循环或资源处理线程)，
+    读取方拿到的值最多落后一帧，下一帧即可修正。
+    """
+
+    RATE_WINDOW = 5.0  # 速率统计窗口 (秒)
+    MAX_CURRENT = 3  # 快照中最多展示的当前条目数
+
+    def __init__(self):
+        self.start()
+
+    def start(self, phase: str = "export", total: int = 0) -> None:
+        """开始新的阶段并清空计数
+
+        Args:
+            phase: 阶段名称，如 export (文档导出)、assets (资源处理)
+            total: 已知的总数，未知时可稍后通过 add_total/update 补充
+        """
+        self.phase = phase
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.skipped = 0
+        self.message = ""
+        self.version = getattr(self, "version", 0) + 1  # 跨阶段单调递增，读取方据此判断是否有变化
+        self._current: Dict[Hashable, str] = {}
+        self._started = time.monotonic()
+        self._samples = deque()
+
+    def add_total(self, count: int) -> None:
+        """增加总数 (例如按知识库逐个获得文档列表时)"""
+        self.total += count
+        self.version += 1
+
+    def begin(self, key: Hashable, label: str) -> None:
+        """标记条目开始处理"""
+        self._current[key] = label
+        self.version += 1
+
+    def finish(self, key: Hashable = None, status: str = "done") -> None:
+        """标记条目处理结束
+
+        Args:
+            key: begin 时使用的标识，未调用 begin 的条目可传 None
+            status: done / failed / skipped
+        """
+        if key is not None:
+            self._current.pop(key, None)
+        self.done += 1
+        if status == "failed":
+            self.failed += 1
+        elif status == "skipped":
+            self.skipped += 1
+        self.version += 1
+
+    def update(self, done: int, total: int, label: Optional[str] = None) -> None:
+        """直接设置完成数与总数，适用于只上报绝对进度的场景 (如资源处理)"""
+        self.done = done
+        self.total = total
+        if label is not None and self._current.get(None) != label:
+            self._current = {None: label}
+        self.version += 1
+
+    def set_message(self, message: str) -> None:
+        """设置阶段说明文本"""
+        self.message = message
+        self.version += 1
+
+    def _rate(self, now: float, done: int) -> float:
+        """基于最近 RATE_WINDOW 秒的采样估算处理速率 (条/秒)"""
+        samples = self._samples
+        samples.append((now, done))
+        while len(samples) > 2 and now - samples[0][0] > self.RATE_WINDOW:
+            samples.popleft()
+        first_time, first_done = samples[0]
+        if now - first_time > 0.2 and done >= first_done:
+            return (done - first_done) / (now - first_time)
+        elapsed = now - self._started
+        return done / elapsed if elapsed > 0 else 0.0
+
+    def snapshot(self) -> ProgressSnapshot:
+        """生成当前进度快照，应由单一读取方 (如界面定时器) 按固定频率调用"""
+        now = time.monotonic()
+        done = self.done
+        total = max(self.total, done)
+        rate = self._rate(now, done)
+        remaining = total - done
+        eta = remaining / rate if rate > 0 and remaining > 0 else None
+        current = [label for label in list(self._current.values())[:self.MAX_CURRENT] if label]
+        return ProgressSnapshot(
+            phase=self.phase,
+            done=done,
+            total=total,
+            failed=self.failed,
+            skipped=self.skipped,
+            rate=round(rate, 2),
+            eta_seconds=round(eta, 1) if eta is not None else None,
+            elapsed_seconds=round(now - self._started, 1),
+            current=current,
+            active=len(self._current),
+            message=self.message,
+            version=self.version,
+        )
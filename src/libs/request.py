@@ -4,9 +4,10 @@ URL: https://github.com/Be1k0/YuQue-BdT
 '''
 
 import asyncio
+import codecs
 import json
 import re
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, AsyncIterator
 from urllib.parse import urljoin
 import contextlib
 from .exceptions import CookiesExpiredError
@@ -14,6 +15,9 @@ import aiohttp
 from .constants import GLOBAL_CONFIG
 from .log import Log
 from .tools import get_local_cookies
+from .tracing import Tracer
+from .metrics import Metrics
+from .singleflight import SingleFlight, cookie_identity
 
 try:
     from .debug_logger import DebugLogger
@@ -51,120 +55,115 @@ class Request:
         if session:
             yield session
         else:
-            async with aiohttp.ClientSession() as new_session:
+            async with aiohttp.ClientSession(trace_configs=Tracer.trace_configs() + Metrics.trace_configs()) as new_session:
                 yield new_session
 
-    @staticmethod
-    async def get(url: str, session: Optional[aiohttp.ClientSession] = None) -> Dict[str, Any]:
-        """发送GET请求并返回JSON
-        
-        Args:
-            url: 请求URL
-            session: 可选的session对象
-        """
-        target_url = urljoin(Request._get_match_host(), url)
+    # 进行中的 GET 请求，键为 (方法, URL, Cookie 摘要, session)
+    _inflight = SingleFlight("request")
 
-        cookies = get_local_cookies()
-        if not cookies:
-            Log.error("cookies已过期，请清除缓存后重新执行程序")
-            raise CookiesExpiredError()
-
-        headers = Request._get_request_headers()
-        headers["cookie"] = cookies
-        headers["x-requested-with"] = "XMLHttpRequest"
-
-        if _has_debug_logger:
+    @staticmethod
+    async def _send_get(url: str, target_url: str, headers: Dict[str, str], session: Optional[aiohttp.ClientSession], errors: str = 'strict') -> str:
+        """发送GET请求并返回响应文本，状态码不是200时抛出异常"""
+        if _has_debug_logger and DebugLogger.is_enabled():
             DebugLogger.log_request(target_url, "GET", headers)
 
         ssl_context = False if GLOBAL_CONFIG.disable_ssl else None
         async with Request._get_session(session) as current_session:
             try:
                 async with current_session.get(target_url, headers=headers, ssl=ssl_context) as response:
-                    response_text = await response.text()
+                    content = await response.text(errors=errors)
 
-                    if _has_debug_logger:
+                    if _has_debug_logger and DebugLogger.is_enabled():
                         DebugLogger.log_response(
                             response.status,
                             response.headers,
-                            response_text
+                            lambda: f"Content length: {len(content)}, Preview: {content[:2000]}{'...' if len(content) > 2000 else ''}"
                         )
 
                     if response.status != 200:
                         Log.error(f"接口请求失败：{url}")
                         Log.error(f"状态码：{response.status}", detailed=True)
-                        clean_text = response_text.replace('\n', '\\n').replace('\r', '')
+                        clean_text = content.replace('\n', '\\n').replace('\r', '')
+                        Log.info(f"请求失败详情: {target_url}")
                         Log.debug(f"响应内容：{clean_text}")
-                        raise Exception(f"HTTP {response.status}: {response_text}")
+                        raise Exception(f"HTTP {response.status}: {content}")
 
-                    return json.loads(response_text)
+                    return content
             except aiohttp.ClientError as e:
                 Log.error(f"请求失败：{str(e)}")
-                if _has_debug_logger:
+                if _has_debug_logger and DebugLogger.is_enabled():
                     DebugLogger.log_error(f"请求失败: {str(e)}")
                 raise
 
     @staticmethod
-    async def get_text(url: str, is_html: bool = False, session: Optional[aiohttp.ClientSession] = None) -> str:
-        """发送GET请求并返回文本
-        
-        Args:
-            url: 请求URL
-            is_html: 是否为HTML请求
-            session: 可选的session对象
+    async def _coalesced_get(url: str, headers: Dict[str, str], session: Optional[aiohttp.ClientSession], errors: str = 'strict') -> str:
+        """合并相同的并发GET请求：URL、请求类型、Cookie和session都相同时共用一次请求的响应文本
+
+        共用的是不可变的文本，各调用方自行解析，互不影响。
+        传入的session不同时不合并，避免共用请求使用已被其他调用方关闭的session。
         """
         target_url = urljoin(Request._get_match_host(), url)
+        key = (
+            "GET",
+            target_url,
+            headers.get("Accept", ""),
+            headers.get("x-requested-with", ""),
+            cookie_identity(headers.get("cookie", "")),
+            id(session) if session is not None else None,
+        )
+        return await Request._inflight.run(
+            key, lambda: Request._send_get(url, target_url, headers, session, errors)
+        )
 
-        cookies = get_local_cookies()
-        if not cookies:
-            Log.error("cookies已过期，请清除缓存后重新执行程序")
-            raise CookiesExpiredError()
-
+    @staticmethod
+    def _text_headers(cookies: str, is_html: bool) -> Dict[str, str]:
+        """文本请求的请求头"""
         headers = Request._get_request_headers()
-        headers["cookie"] = cookies
+        if cookies:
+            headers["cookie"] = cookies
 
         if not is_html:
             headers["x-requested-with"] = "XMLHttpRequest"
         else:
             headers["Accept"] = "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8"
             headers["Accept-Language"] = "zh-CN,zh;q=0.9,en;q=0.8"
-            if "x-requested-with" in headers:
-                del headers["x-requested-with"]
-
-        if _has_debug_logger:
-            DebugLogger.log_request(target_url, "GET", headers)
-
-        ssl_context = False if GLOBAL_CONFIG.disable_ssl else None
-        async with Request._get_session(session) as current_session:
-            try:
-                async with current_session.get(target_url, headers=headers, ssl=ssl_context) as response:
-                    content = await response.text(errors='replace')
+        return headers
 
-                    if _has_debug_logger:
-                        content_summary = content[:2000] + "..." if len(content) > 2000 else content
-                        DebugLogger.log_response(
-                            response.status,
-                            response.headers,
-                            f"Content length: {len(content)}, Preview: {content_summary}"
-                        )
+    @staticmethod
+    async def get(url: str, session: Optional[aiohttp.ClientSession] = None) -> Dict[str, Any]:
+        """发送GET请求并返回JSON
+        
+        Args:
+            url: 请求URL
+            session: 可选的session对象
+        """
+        cookies = get_local_cookies()
+        if not cookies:
+            Log.error("cookies已过期，请清除缓存后重新执行程序")
+            raise CookiesExpiredError()
 
-                    if response.status != 200:
-                        error_text = content
-                        Log.error(f"接口请求失败：{url}")
-                        Log.error(f"状态码：{response.status}", detailed=True)
-                        clean_text = error_text.replace('\n', '\\n').replace('\r', '')
-                        Log.info(f"请求失败详情: {target_url}")
-                        Log.debug(f"响应内容：{clean_text}")
-                        raise Exception(f"HTTP {response.status}: {error_text}")
+        headers = Request._text_headers(cookies, is_html=False)
+        response_text = await Request._coalesced_get(url, headers, session)
+        return json.loads(response_text)
 
-                    if is_html and len(content) < 1000:
-                        Log.warn(f"获取到的HTML内容可能不完整，长度仅为 {len(content)} 字符", detailed=True)
+    @staticmethod
+    async def get_text(url: str, is_html: bool = False, session: Optional[aiohttp.ClientSession] = None) -> str:
+        """发送GET请求并返回文本
+        
+        Args:
+            url: 请求URL
+            is_html: 是否为HTML请求
+            session: 可选的session对象
+        """
+        cookies = get_local_cookies()
+        if not cookies:
+            Log.error("cookies已过期，请清除缓存后重新执行程序")
+            raise CookiesExpiredError()
 
-                    return content
-            except aiohttp.ClientError as e:
-                Log.error(f"请求失败：{str(e)}")
-                if _has_debug_logger:
-                    DebugLogger.log_error(f"请求失败: {str(e)}")
-                raise
+        content = await Request._coalesced_get(url, Request._text_headers(cookies, is_html), session, errors='replace')
+        if is_html and len(content) < 1000:
+            Log.warn(f"获取到的HTML内容可能不完整，长度仅为 {len(content)} 字符", detailed=True)
+        return content
 
     @staticmethod
     async def get_text_with_cookies(url: str, cookies_str: str, is_html: bool = False, session: Optional[aiohttp.ClientSession] = None) -> str:
@@ -176,53 +175,63 @@ class Request:
             is_html: 是否为HTML请求
             session: 可选的session对象
         """
+        content = await Request._coalesced_get(url, Request._text_headers(cookies_str, is_html), session, errors='replace')
+        if is_html and len(content) < 1000:
+            Log.warn(f"获取到的HTML内容可能不完整,长度仅为 {len(content)} 字符", detailed=True)
+        return content
+
+    @staticmethod
+    async def stream_text(url: str, cookies_str: str, session: Optional[aiohttp.ClientSession] = None, chunk_size: int = 65536) -> AsyncIterator[str]:
+        """发送GET请求并按块返回解码后的文本，不在内存中保留完整响应体
+
+        Args:
+            url: 请求URL
+            cookies_str: Cookie字符串,格式为 "name1=value1; name2=value2"
+            session: 可选的session对象
+            chunk_size: 每次读取的字节数
+        """
         target_url = urljoin(Request._get_match_host(), url)
 
         headers = Request._get_request_headers()
         if cookies_str:
             headers["cookie"] = cookies_str
+        headers["x-requested-with"] = "XMLHttpRequest"
 
-        if not is_html:
-            headers["x-requested-with"] = "XMLHttpRequest"
-        else:
-            headers["Accept"] = "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8"
-            headers["Accept-Language"] = "zh-CN,zh;q=0.9,en;q=0.8"
-            if "x-requested-with" in headers:
-                del headers["x-requested-with"]
-
-        if _has_debug_logger:
+        if _has_debug_logger and DebugLogger.is_enabled():
             DebugLogger.log_request(target_url, "GET", headers)
 
         ssl_context = False if GLOBAL_CONFIG.disable_ssl else None
         async with Request._get_session(session) as current_session:
             try:
                 async with current_session.get(target_url, headers=headers, ssl=ssl_context) as response:
-                    content = await response.text(errors='replace')
-
-                    if _has_debug_logger:
-                        content_summary = content[:2000] + "..." if len(content) > 2000 else content
-                        DebugLogger.log_response(
-                            response.status,
-                            response.headers,
-                            f"Content length: {len(content)}, Preview: {content_summary}"
-                        )
-
                     if response.status != 200:
-                        error_text = content
-                        Log.error(f"接口请求失败:{url}")
-                        Log.error(f"状态码:{response.status}", detailed=True)
+                        error_text = await response.text(errors='replace')
+                        if _has_debug_logger and DebugLogger.is_enabled():
+                            DebugLogger.log_response(response.status, response.headers, error_text)
+                        Log.error(f"接口请求失败：{url}")
+                        Log.error(f"状态码：{response.status}", detailed=True)
                         clean_text = error_text.replace('\n', '\\n').replace('\r', '')
-                        Log.info(f"请求失败详情: {target_url}")
                         Log.debug(f"响应内容：{clean_text}")
                         raise Exception(f"HTTP {response.status}: {error_text}")
 
-                    if is_html and len(content) < 1000:
-                        Log.warn(f"获取到的HTML内容可能不完整,长度仅为 {len(content)} 字符", detailed=True)
+                    if _has_debug_logger and DebugLogger.is_enabled():
+                        DebugLogger.log_response(
+                            response.status,
+                            response.headers,
+                            f"Streamed body, Content-Length: {response.headers.get('Content-Length', 'unknown')}"
+                        )
 
-                    return content
+                    decoder = codecs.getincrementaldecoder(response.charset or 'utf-8')(errors='replace')
+                    async for chunk in response.content.iter_chunked(chunk_size):
+                        text = decoder.decode(chunk)
+                        if text:
+                            yield text
+                    tail = decoder.decode(b'', final=True)
+                    if tail:
+                        yield tail
             except aiohttp.ClientError as e:
-                Log.error(f"请求失败:{str(e)}")
-                if _has_debug_logger:
+                Log.error(f"请求失败：{str(e)}")
+                if _has_debug_logger and DebugLogger.is_enabled():
                     DebugLogger.log_error(f"请求失败: {str(e)}")
                 raise
 
@@ -240,7 +249,7 @@ class Request:
 
         headers = Request._get_request_headers()
 
-        if _has_debug_logger:
+        if _has_debug_logger and DebugLogger.is_enabled():
             DebugLogger.log_request(target_url, "POST", headers, data)
 
         ssl_context = False if GLOBAL_CONFIG.disable_ssl else None
@@ -254,7 +263,7 @@ class Request:
                     except json.JSONDecodeError:
                         response_data = {"text": response_text}
 
-                    if _has_debug_logger:
+                    if _has_debug_logger and DebugLogger.is_enabled():
                         DebugLogger.log_response(
                             response.status,
                             response.headers,
@@ -287,7 +296,7 @@ class Request:
                     return response_data
             except aiohttp.ClientError as e:
                 Log.error(f"请求失败：{str(e)}")
-                if _has_debug_logger:
+                if _has_debug_logger and DebugLogger.is_enabled():
                     DebugLogger.log_error(f"请求失败: {str(e)}")
                 raise
 
@@ -304,7 +313,7 @@ class Request:
 
         headers = Request._get_request_headers()
 
-        if _has_debug_logger:
+        if _has_debug_logger and DebugLogger.is_enabled():
             DebugLogger.log_request(target_url, "PUT", headers, data)
 
         ssl_context = False if GLOBAL_CONFIG.disable_ssl else None
@@ -318,7 +327,7 @@ class Request:
                     except json.JSONDecodeError:
                         response_data = {"text": response_text}
 
-                    if _has_debug_logger:
+                    if _has_debug_logger and DebugLogger.is_enabled():
                         DebugLogger.log_response(
                             response.status,
                             response.headers,
@@ -354,7 +363,7 @@ class Request:
                     return response_data
             except aiohttp.ClientError as e:
                 Log.error(f"请求失败：{str(e)}")
-                if _has_debug_logger:
+                if _has_debug_logger and DebugLogger.is_enabled():
                     DebugLogger.log_error(f"请求失败: {str(e)}")
                 raise
 
@@ -435,6 +444,7 @@ class Request:
                 if attempt == max_retries - 1:
                     raise e
                 Log.warn(f"请求失败，{delay}秒后重试... (尝试 {attempt + 1}/{max_retries})")
+                Metrics.incr("retries")
                 await asyncio.sleep(delay)
                 delay *= 2
 
@@ -0,0 +1,86 @@
+'''
+Author: Be1k0
+URL: https://github.com/Be1k0/YuQue-BdT
+'''
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from .constants import CacheEntry
+from .log import Log
+
+
+class CacheRevalidator:
+    """本地缓存的 stale-while-revalidate 读取
+
+    - 缓存最新时直接返回
+    - 缓存陈旧时立即返回旧数据，同时在后台刷新
+    - 没有可用缓存时等待刷新结果
+    同一 key 同时只有一个刷新请求，之后的调用者 (前台读取或后台刷新) 都复用它。
+    刷新函数负责写入缓存。
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    def refresh(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """发起 (或复用正在进行的) 刷新，返回刷新任务"""
+        task = self._inflight.get(key)
+        if task is None or task.done():
+            task = asyncio.ensure_future(fetch())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, key=key: self._on_done(key, t))
+        return task
+
+    def _on_done(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled() and task.exception() is not None:
+            Log.warn(f"后台刷新缓存失败 ({key}): {task.exception()}")
+
+    def is_refreshing(self, key: Hashable) -> bool:
+        """指定 key 是否有正在进行的刷新"""
+        task = self._inflight.get(key)
+        return task is not None and not task.done()
+
+    async def get(
+        self,
+        key: Hashable,
+        entry: Optional[CacheEntry],
+        fetch: Callable[[], Awaitable[Any]],
+        on_refresh: Optional[Callable[[Any], None]] = None,
+    ) -> Any:
+        """按 stale-while-revalidate 规则读取
+
+        Args:
+            key: 缓存标识，用于合并同一数据的并发刷新
+            entry: 已读取的缓存条目，没有可用缓存时为 None
+            fetch: 从远程获取数据并写入缓存的协程函数
+            on_refresh: 陈旧数据的后台刷新成功后以新数据调用
+
+        Returns:
+            缓存数据或刷新结果
+        """
+        if entry is not None:
+            if not entry.is_fresh:
+                task = self.refresh(key, fetch)
+                if on_refresh is not None:
+                    task.add_done_callback(lambda t: self._notify(t, on_refresh))
+            return entry.value
+
+        # 调用方被取消时不影响其他等待同一刷新的调用方
+        return await asyncio.shield(self.refresh(key, fetch))
+
+    @staticmethod
+    def _notify(task: asyncio.Task, on_refresh: Callable[[Any], None]) -> None:
+        if task.cancelled() or task.exception() is not None:
+            return
+        result = task.result()
+        if result:
+            on_refresh(result)
+
+    def cancel(self) -> None:
+        """取消全部正在进行的刷新"""
+        for task in list(self._inflight.values()):
+            task.cancel()
+        self._inflight = {}
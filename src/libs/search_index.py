@@ -0,0 +1,101 @@
+'''
+Author: Be1k0
+URL: https://github.com/Be1k0/YuQue-BdT
+'''
+
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Sequence
+
+try:
+    from pypinyin import lazy_pinyin
+    _has_pypinyin = True
+except ImportError:
+    _has_pypinyin = False
+
+_CJK_PATTERN = re.compile(r'[一-鿿]')
+
+
+class SearchIndex:
+    """标题搜索索引
+
+    加载列表时构建一次：每个条目保存小写标题，中文标题额外保存全拼和首字母 (需要 pypinyin)，
+    拼音在后台线程中生成，完成前只按标题匹配。
+    查询结果按查询文本缓存，输入变长时只在上一次 (最长前缀) 的结果中继续筛选。
+    树形列表传入 parents (父条目序号，根为 -1)，可直接得到包含祖先的可见掩码。
+    """
+
+    MAX_CACHED_QUERIES = 32
+
+    def __init__(self, titles: Sequence[str], parents: Optional[Sequence[int]] = None):
+        self.parents = parents
+        self._keys = [str(title or '').lower() for title in titles]
+        self._cache = OrderedDict()
+        self._generation = 0
+        if _has_pypinyin and any(_CJK_PATTERN.search(key) for key in self._keys):
+            threading.Thread(target=self._build_pinyin, args=(list(titles),), daemon=True).start()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @staticmethod
+    def _pinyin_key(title: str) -> str:
+        lower = title.lower()
+        if not _CJK_PATTERN.search(lower):
+            return lower
+        syllables = [s.lower() for s in lazy_pinyin(title) if s]
+        return "\x00".join((lower, "".join(syllables), "".join(s[0] for s in syllables)))
+
+    def _build_pinyin(self, titles: List[str]) -> None:
+        keys = [self._pinyin_key(str(title or '')) for title in titles]
+        # 整体替换后清空缓存，之前基于纯标题的结果不再可用
+        self._keys = keys
+        self._generation += 1
+
+    def search(self, query: str) -> List[int]:
+        """返回标题 (或拼音、首字母) 包含 query 的条目序号，按原顺序排列"""
+        query = query.strip().lower()
+        if not query:
+            return list(range(len(self._keys)))
+
+        generation = self._generation
+        cache = self._cache
+        cached = cache.get((generation, query))
+        if cached is not None:
+            cache.move_to_end((generation, query))
+            return cached
+
+        # 从缓存中找到最长的前缀查询，在其结果范围内继续筛选
+        candidates = None
+        for length in range(len(query) - 1, 0, -1):
+            prefix_result = cache.get((generation, query[:length]))
+            if prefix_result is not None:
+                candidates = prefix_result
+                break
+
+        keys = self._keys
+        if candidates is None:
+            matches = [i for i, key in enumerate(keys) if query in key]
+        else:
+            matches = [i for i in candidates if query in keys[i]]
+
+        cache[(generation, query)] = matches
+        while len(cache) > self.MAX_CACHED_QUERIES:
+            cache.popitem(last=False)
+        return matches
+
+    def visible_mask(self, query: str) -> Optional[bytearray]:
+        """返回可见掩码 (匹配条目及其全部祖先)，查询为空时返回 None 表示不过滤"""
+        if not query.strip():
+            return None
+        mask = bytearray(len(self._keys))
+        parents = self.parents
+        for node in self.search(query):
+            if parents is None:
+                mask[node] = 1
+                continue
+            while node >= 0 and not mask[node]:
+                mask[node] = 1
+                node = parents[node]
+        return mask
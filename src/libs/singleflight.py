@@ -0,0 +1,69 @@
+'''
+Author: Be1k0
+URL: https://github.com/Be1k0/YuQue-BdT
+'''
+
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Tuple
+
+from .metrics import Metrics
+
+
+def cookie_identity(cookies: str) -> str:
+    """Cookie 的短摘要，用作合并请求的键，避免在内存键中保存完整 Cookie"""
+    if not cookies:
+        return ""
+    return hashlib.sha1(cookies.encode("utf-8")).hexdigest()[:16]
+
+
+class SingleFlight:
+    """异步请求合并
+
+    同一事件循环中键相同的并发调用共用一个进行中的任务，只有第一个调用真正执行，
+    其余调用等待同一结果 (或异常)。任务结束后立即移除，不缓存结果。
+    某个调用方被取消时不影响共用任务和其他调用方；所有调用方都被取消时取消共用任务，
+    不让请求在后台继续运行。
+    共用任务使用第一个调用方传入的资源 (如 session)，调用方的资源不同时应放入合并键。
+    """
+
+    def __init__(self, name: str = "request"):
+        self.name = name
+        self._inflight: Dict[Tuple[int, Hashable], List[Any]] = {}  # 合并键 -> [共用任务, 等待的调用方数]
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """执行 (或加入进行中的) 调用
+
+        Args:
+            key: 合并键，如 (方法, URL, Cookie 摘要)
+            factory: 返回协程的函数，只有第一个调用方会执行
+        """
+        flight_key = (id(asyncio.get_running_loop()), key)
+        flight = self._inflight.get(flight_key)
+        if flight is None:
+            task = asyncio.ensure_future(factory())
+            flight = [task, 0]
+            self._inflight[flight_key] = flight
+            task.add_done_callback(lambda t: self._on_done(flight_key, t))
+        else:
+            Metrics.incr(f"{self.name}_coalesced")
+        task = flight[0]
+        flight[1] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            flight[1] -= 1
+            if flight[1] == 0 and not task.done():
+                # 最后一个调用方已离开 (被取消)，之后的调用不再加入这个正在取消的任务
+                self._remove(flight_key, task)
+                task.cancel()
+
+    def _remove(self, flight_key: Tuple[int, Hashable], task: asyncio.Task) -> None:
+        flight = self._inflight.get(flight_key)
+        if flight is not None and flight[0] is task:
+            del self._inflight[flight_key]
+
+    def _on_done(self, flight_key: Tuple[int, Hashable], task: asyncio.Task) -> None:
+        self._remove(flight_key, task)
+        if not task.cancelled():
+            task.exception()  # 所有调用方都已取消时避免 "exception was never retrieved" 警告
@@ -0,0 +1,78 @@
+'''
+Author: Be1k0
+URL: https://github.com/Be1k0/YuQue-BdT
+'''
+
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class StartupProfiler:
+    """启动耗时记录器
+
+    通过环境变量 YUQUE_STARTUP_PROFILE 指定输出文件时启用，记录各启动阶段相对本模块导入时刻的耗时，
+    并统计首个窗口显示时已加载的重量级模块，供 benchmarks/startup_benchmark.py 做回归比较
+    """
+
+    PROFILE_ENV = "YUQUE_STARTUP_PROFILE"  # 输出文件路径
+    EXIT_ENV = "YUQUE_STARTUP_EXIT"  # 首个窗口显示后立即退出
+
+    # 启动阶段不应加载的模块，出现在结果中说明懒加载被破坏
+    HEAVY_MODULES = (
+        "playwright", "requests", "psutil",
+        "src.core.web_login", "src.libs.markdown_asset_localizer",
+    )
+
+    _origin = time.perf_counter()
+    _origin_wall = time.time()
+    _marks: List[Tuple[str, float]] = []
+
+    @classmethod
+    def enabled(cls) -> bool:
+        """是否启用启动耗时记录"""
+        return bool(os.environ.get(cls.PROFILE_ENV))
+
+    @classmethod
+    def should_exit(cls) -> bool:
+        """是否在首个窗口显示后退出程序"""
+        return os.environ.get(cls.EXIT_ENV, "") not in ("", "0")
+
+    @classmethod
+    def mark(cls, stage: str) -> None:
+        """记录一个启动阶段
+
+        Args:
+            stage: 阶段名称
+        """
+        if cls.enabled():
+            cls._marks.append((stage, time.perf_counter()))
+
+    @classmethod
+    def report(cls) -> Dict[str, Any]:
+        """生成启动耗时报告"""
+        return {
+            "origin_wall": cls._origin_wall,
+            "stages": [
+                {"name": name, "ms": round((ts - cls._origin) * 1000, 2)}
+                for name, ts in cls._marks
+            ],
+            "finished_wall": time.time(),
+            "modules_loaded": len(sys.modules),
+            "heavy_modules_loaded": [name for name in cls.HEAVY_MODULES if name in sys.modules],
+        }
+
+    @classmethod
+    def dump(cls) -> Optional[str]:
+        """将启动耗时报告写入环境变量指定的文件，返回文件路径"""
+        output = os.environ.get(cls.PROFILE_ENV)
+        if not output:
+            return None
+        try:
+            with open(output, 'w', encoding='utf-8') as f:
+                json.dump(cls.report(), f, ensure_ascii=False, indent=2)
+            return output
+        except OSError:
+            return None
@@ -9,17 +9,118 @@ from urllib.parse import urlparse
 import threading
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ChunkedEncodingError
+from .exceptions import DownloadInterruptedError
 from .log import Log
+from .metrics import Metrics
+from .tracing import Tracer
+
+
+class _RetryableStatus(Exception):
+    """可重试的 HTTP 状态码"""
+
+    def __init__(self, status_code):
+        super().__init__(f"状态码: {status_code}")
+        self.status_code = status_code
+
 
 class ThreadedImageDownloader:
-    """多线程图片下载器"""
+    """多线程图片下载器
+
+    所有线程共用一个带连接池的 requests.Session (按主机复用连接)，图片按块流式写入临时文件，
+    完成后再重命名为目标文件，中途失败不会留下不完整的图片。
+    连接错误、超时和 429/5xx 等临时错误按退避间隔重试。
+    """
+
+    CHUNK_SIZE = 1024 * 256
+    MAX_RETRIES = 3  # 临时错误的最大重试次数
+    RETRY_BACKOFF = 1.0  # 首次重试等待 (秒)，之后翻倍
+    RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+    TIMEOUT = (10, 30)  # (连接, 读取) 超时
+    DEFAULT_REFERER = "https://www.yuque.com/"
 
-    def __init__(self, max_workers=5, progress_callback=None):
+    def __init__(self, max_workers=5, progress_callback=None, bytes_progress_callback=None, stop_event=None):
+        """
+        Args:
+            max_workers: 下载线程数，同时也是每个主机的连接池大小
+            progress_callback: 图片进度回调 (已完成张数, 总张数)
+            bytes_progress_callback: 字节进度回调 (已下载字节数, 已知总字节数)
+            stop_event: 取消标志 (如 ExportJob.stop_event)，设置后停止下载且不改写 Markdown 文件
+        """
+        self.stop_event = stop_event or threading.Event()
         self.max_workers = max_workers
         self.progress_callback = progress_callback
+        self.bytes_progress_callback = bytes_progress_callback
         self.downloaded_count = 0
         self.total_count = 0
+        self.downloaded_bytes = 0
+        self.expected_bytes = 0
         self.lock = threading.Lock()
+        self.cdn_domains = {"cdn.nlark.com"}
+        self.session = self._create_session(max_workers)
+
+    @staticmethod
+    def _create_session(max_workers):
+        """创建连接池大小与线程数一致的 Session"""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max(1, max_workers), pool_maxsize=max(1, max_workers))
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        Tracer.install_requests_hooks(session)
+        Metrics.install_requests_hooks(session)
+        return session
+
+    def close(self):
+        """关闭连接池"""
+        self.session.close()
+
+    def _headers(self, image_url):
+        """语雀 CDN 的图片需要带 Referer 才能下载"""
+        host = urlparse(image_url).netloc.lower()
+        if host in self.cdn_domains:
+            return {"Referer": self.DEFAULT_REFERER}
+        return {}
+
+    def _add_bytes(self, downloaded=0, expected=0):
+        with self.lock:
+            self.downloaded_bytes += downloaded
+            self.expected_bytes += expected
+            if self.bytes_progress_callback:
+                self.bytes_progress_callback(self.downloaded_bytes, self.expected_bytes)
+
+    def _fetch_to_file(self, image_url, file_path):
+        """流式下载到临时文件并重命名，返回下载的字节数；状态码不是200时返回 None"""
+        temp_path = f"{file_path}.part"
+        written = 0
+        expected = 0
+        try:
+            with self.session.get(image_url, headers=self._headers(image_url), stream=True, timeout=self.TIMEOUT) as r:
+                if r.status_code in self.RETRY_STATUS:
+                    raise _RetryableStatus(r.status_code)
+                if r.status_code != 200:
+                    Log.warn(f'图片下载失败: {image_url}, 状态码: {r.status_code}')
+                    return None
+
+                expected = int(r.headers.get("Content-Length") or 0)
+                self._add_bytes(expected=expected)
+                with open(temp_path, 'wb') as f:
+                    for chunk in r.iter_content(chunk_size=self.CHUNK_SIZE):
+                        if self.stop_event.is_set():
+                            raise DownloadInterruptedError()
+                        if chunk:
+                            f.write(chunk)
+                            written += len(chunk)
+                            self._add_bytes(downloaded=len(chunk))
+                            Metrics.incr("disk_bytes_written", len(chunk))
+            os.replace(temp_path, file_path)
+            return written
+        except BaseException:
+            # 失败时撤销本次计入的字节，重试会重新计数
+            self._add_bytes(downloaded=-written, expected=-expected)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
 
     def download_image(self, image_url, image_dir, image_name_mode, idx, suffix, image_file_prefix):
         """下载单个图片
@@ -32,33 +133,41 @@ class ThreadedImageDownloader:
             suffix: 图片后缀
             image_file_prefix: 图片文件前缀
         """
-        try:
-            r = requests.get(image_url, stream=True, timeout=30)
-            image_name = image_url.split('/')[-1]
-            if image_name_mode == 'asc':
-                image_name = image_file_prefix + str(idx) + suffix
+        image_name = image_url.split('/')[-1]
+        if image_name_mode == 'asc':
+            image_name = image_file_prefix + str(idx) + suffix
+        file_path = os.path.join(image_dir, image_name)
 
-            if r.status_code == 200:
-                file_path = os.path.join(image_dir, image_name)
-                with open(file_path, 'wb') as f:
-                    f.write(r.content)
+        delay = self.RETRY_BACKOFF
+        for attempt in range(self.MAX_RETRIES + 1):
+            if self.stop_event.is_set():
+                return False
+            try:
+                size = self._fetch_to_file(image_url, file_path)
+                if size is None:
+                    return False
 
                 with self.lock:
                     self.downloaded_count += 1
                     if self.progress_callback:
                         self.progress_callback(self.downloaded_count, self.total_count)
 
-                Log.info(f'图片下载成功: {image_name}')
+                Log.info(f'图片下载成功: {image_name} ({size} 字节)')
                 return True
-            else:
-                Log.warn(f'图片下载失败: {image_url}, 状态码: {r.status_code}')
+            except (requests.ConnectionError, requests.Timeout, ChunkedEncodingError, _RetryableStatus) as e:
+                if attempt >= self.MAX_RETRIES:
+                    Log.error(f'图片下载异常: {image_url}, 已重试 {self.MAX_RETRIES} 次, 错误: {str(e)}')
+                    return False
+                Log.warn(f'图片下载失败，{delay:.1f} 秒后重试 ({attempt + 1}/{self.MAX_RETRIES}): {image_url}, 错误: {str(e)}')
+                if self.stop_event.wait(delay):
+                    return False
+                delay *= 2
+            except DownloadInterruptedError:
                 return False
-        except Exception as e:
-            Log.error(f'图片下载异常: {image_url}, 错误: {str(e)}')
-            return False
-        finally:
-            if 'r' in locals():
-                del r
+            except Exception as e:
+                Log.error(f'图片下载异常: {image_url}, 错误: {str(e)}')
+                return False
+        return False
 
     def deal_yuque(self, origin_md_path, output_md_path, image_dir, image_url_prefix,
                    image_rename_mode, image_file_prefix, yuque_cdn_domain):
@@ -110,6 +219,10 @@ class ThreadedImageDownloader:
         # 设置总数
         self.total_count = len(image_tasks)
         self.downloaded_count = 0
+        self.downloaded_bytes = 0
+        self.expected_bytes = 0
+        if yuque_cdn_domain:
+            self.cdn_domains.add(yuque_cdn_domain.strip().lower())
 
         if self.total_count > 0:
             Log.info(f'开始下载 {self.total_count} 张图片，使用 {self.max_workers} 个线程')
@@ -121,13 +234,21 @@ class ThreadedImageDownloader:
                     future = executor.submit(self.download_image, *task)
                     futures.append(future)
 
-                # 等待所有下载完成
+                # 等待所有下载完成，取消时放弃尚未开始的下载
                 for future in as_completed(futures):
+                    if self.stop_event.is_set():
+                        for pending in futures:
+                            pending.cancel()
+                        break
                     try:
                         future.result()
                     except Exception as e:
                         Log.error(f'下载任务异常: {str(e)}')
 
+        if self.stop_event.is_set():
+            Log.warn(f'图片下载已取消，保留原文件: {origin_md_path}')
+            return self.downloaded_count
+
         # 写入处理后的Markdown文件
         with open(output_md_path, 'w', encoding='utf-8', errors='ignore') as f:
             for _output_content in output_content:
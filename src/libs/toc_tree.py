@@ -0,0 +1,150 @@
+'''
+Author: Be1k0
+URL: https://github.com/Be1k0/YuQue-BdT
+'''
+
+from array import array
+from itertools import compress
+from typing import Any, Dict, Iterable, List
+
+
+class TocTree:
+    """数组存储的知识库目录树
+
+    节点按先序遍历顺序编号，每个字段保存在一个平行数组中，
+    子节点以 CSR 形式 (child_start/child_list) 存放，
+    某节点的全部后代恰好是区间 [node + 1, end[node])，级联选中只需一次切片赋值。
+    父节点为 -1 表示根节点；同级节点按 “目录在前、文档在后、标题排序” 排列。
+    """
+
+    def __init__(self, articles: Iterable[Any] = ()):
+        self.items: List[Dict[str, Any]] = []  # 原始文章数据 (先序)
+        self.ids: List[Any] = []
+        self.titles: List[str] = []
+        self.types: List[str] = []
+        self.parent = array('i')
+        self.row = array('i')  # 在父节点下的行号
+        self.end = array('i')  # 子树结束位置 (不含)
+        self.child_start = array('i')  # 节点 i 的子节点位于 child_list[child_start[i]:child_start[i + 1]]
+        self.child_list = array('i')
+        self.roots = array('i')
+        self._build([self._as_dict(article) for article in articles])
+
+    @staticmethod
+    def _as_dict(article: Any) -> Dict[str, Any]:
+        if isinstance(article, dict):
+            return article
+        return {k: v for k, v in getattr(article, '__dict__', {}).items() if not k.startswith('_')}
+
+    @staticmethod
+    def _sort_key(article: Dict[str, Any]):
+        return (article.get('type', 'DOC') != 'TITLE', article.get('title', ''))
+
+    def _build(self, articles: List[Dict[str, Any]]) -> None:
+        uuid_to_pos = {}
+        for pos, article in enumerate(articles):
+            uuid = article.get('uuid')
+            if uuid:
+                uuid_to_pos[uuid] = pos
+
+        # 按父节点分组 (父节点缺失的条目视为根节点，避免被丢弃)
+        children: Dict[int, List[int]] = {}
+        for pos, article in enumerate(articles):
+            parent_pos = uuid_to_pos.get(article.get('parent_uuid') or '', -1)
+            if parent_pos == pos:
+                parent_pos = -1
+            children.setdefault(parent_pos, []).append(pos)
+        for group in children.values():
+            group.sort(key=lambda p: self._sort_key(articles[p]))
+
+        # 迭代式先序遍历生成节点编号，避免深层目录递归过深
+        node_of = {}
+        stack = [(pos, -1) for pos in reversed(children.get(-1, []))]
+        while stack:
+            pos, parent_node = stack.pop()
+            if pos in node_of:
+                continue  # parent_uuid 成环时只保留第一次出现
+            node = len(self.items)
+            node_of[pos] = node
+            article = articles[pos]
+            self.items.append(article)
+            self.ids.append(article.get('id', ''))
+            self.titles.append(article.get('title', 'Untitled') or 'Untitled')
+            self.types.append(str(article.get('type', 'DOC') or 'DOC').upper())
+            self.parent.append(parent_node)
+            self.row.append(0)
+            self.end.append(0)
+            for child_pos in reversed(children.get(pos, [])):
+                stack.append((child_pos, node))
+
+        count = len(self.items)
+        # 先序编号下，子树结束位置可以自底向上一次求出
+        for node in range(count - 1, -1, -1):
+            last = node + 1
+            if self.end[node] > last:
+                last = self.end[node]
+            self.end[node] = last
+            parent_node = self.parent[node]
+            if parent_node >= 0 and self.end[parent_node] < last:
+                self.end[parent_node] = last
+
+        # 子节点列表 (CSR)
+        counts = [0] * (count + 1)
+        for node in range(count):
+            parent_node = self.parent[node]
+            if parent_node >= 0:
+                counts[parent_node + 1] += 1
+        self.child_start = array('i', [0] * (count + 1))
+        for node in range(count):
+            self.child_start[node + 1] = self.child_start[node] + counts[node + 1]
+        self.child_list = array('i', [0] * self.child_start[count])
+        filled = array('i', [0] * count)
+        for node in range(count):
+            parent_node = self.parent[node]
+            if parent_node < 0:
+                self.row[node] = len(self.roots)
+                self.roots.append(node)
+            else:
+                self.row[node] = filled[parent_node]
+                self.child_list[self.child_start[parent_node] + filled[parent_node]] = node
+                filled[parent_node] += 1
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def child_count(self, node: int) -> int:
+        """子节点数量，node 为 -1 时返回根节点数量"""
+        if node < 0:
+            return len(self.roots)
+        return self.child_start[node + 1] - self.child_start[node]
+
+    def child(self, node: int, row: int) -> int:
+        """第 row 个子节点，node 为 -1 时返回第 row 个根节点"""
+        if node < 0:
+            return self.roots[row]
+        return self.child_list[self.child_start[node] + row]
+
+    def ancestors(self, node: int) -> List[int]:
+        """从父节点到根节点的祖先列表"""
+        result = []
+        node = self.parent[node]
+        while node >= 0:
+            result.append(node)
+            node = self.parent[node]
+        return result
+
+    def select_ids(self, mask: bytearray) -> List[Any]:
+        """返回掩码中被选中节点的文章 ID"""
+        return [doc_id for doc_id in compress(self.ids, mask) if doc_id]
+
+
+def mask_union(a: bytearray, b: bytearray) -> bytearray:
+    """两个 0/1 掩码按位或"""
+    value = int.from_bytes(a, 'little') | int.from_bytes(b, 'little')
+    return bytearray(value.to_bytes(len(a), 'little'))
+
+
+def mask_difference(a: bytearray, b: bytearray) -> bytearray:
+    """从掩码 a 中去掉掩码 b 中的节点"""
+    value = int.from_bytes(a, 'little') & ~int.from_bytes(b, 'little')
+    return bytearray(value.to_bytes(len(a), 'little'))
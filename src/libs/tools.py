@@ -7,9 +7,9 @@ import json
 import os
 import time
 from pathlib import Path
-from typing import Optional, List, Any
+from typing import Optional, List, Any, Dict
 from .constants import (
-    GLOBAL_CONFIG, LocalCookiesInfo,
+    GLOBAL_CONFIG, LocalCookiesInfo, CacheEntry,
     LocalCacheUserInfo, YuqueLoginUserInfo, BookItem
 )
 from .file import File
@@ -20,6 +20,34 @@ def gen_timestamp() -> int:
     return int(time.time() * 1000)
 
 
+def gen_cache_times() -> Dict[str, int]:
+    """生成缓存文件的最新期限 (expire_time) 和陈旧期限 (stale_time)"""
+    now = gen_timestamp()
+    return {
+        'expire_time': now + GLOBAL_CONFIG.local_expire,
+        'stale_time': now + max(GLOBAL_CONFIG.local_stale_expire, GLOBAL_CONFIG.local_expire),
+    }
+
+
+def read_cache_entry(cache_file: str, key: str) -> Optional[CacheEntry]:
+    """读取缓存文件中的 key 字段，超过陈旧期限或读取失败时返回None
+
+    旧版本写入的缓存没有 stale_time，按 expire_time 处理。
+    """
+    try:
+        f = File()
+        if not f.exists(cache_file):
+            return None
+        cache_dict = json.loads(f.read(cache_file))
+        fresh_until = cache_dict.get('expire_time', 0)
+        stale_until = cache_dict.get('stale_time', fresh_until)
+        if stale_until < gen_timestamp():
+            return None
+        return CacheEntry(value=cache_dict.get(key), fresh_until=fresh_until, stale_until=stale_until)
+    except Exception:
+        return None
+
+
 def sanitize_cookie_string(cookie_string: str) -> str:
     """过滤并规范化语雀请求需要的 Cookie 字符串"""
     if not cookie_string:
@@ -97,8 +125,24 @@ def has_login_cookie(cookie_string: str) -> bool:
     return bool(cookie_map.get("_yuque_session") and cookie_map.get("yuque_ctoken"))
 
 
+# 进程内的 Cookie (命令行 --cookies)，设置后代替本地缓存的登录信息，且不写入本地缓存
+_cookie_override: Optional[str] = None
+
+
+def set_cookie_override(cookies: Optional[str]) -> None:
+    """设置进程内使用的 Cookie，传入 None 时恢复使用本地缓存
+
+    Args:
+        cookies: Cookie 字符串
+    """
+    global _cookie_override
+    _cookie_override = sanitize_cookie_string(cookies) if cookies is not None else None
+
+
 def get_local_cookies() -> str:
     """获取本地有效cookies，如果cookies过期就返回空字符串"""
+    if _cookie_override is not None:
+        return _cookie_override
     f = File()
     try:
         if f.exists(GLOBAL_CONFIG.cookies_file):
@@ -119,33 +163,42 @@ def get_local_cookies() -> str:
         return ""
 
 
-def get_cache_books_info() -> Optional[List[BookItem]]:
-    """获取本地缓存的知识库信息，如果已过期就返回None"""
-    books_info_file = GLOBAL_CONFIG.books_info_file
+def get_books_cache_entry() -> Optional[CacheEntry]:
+    """获取本地缓存的知识库信息条目 (value 为 BookItem 列表)，超过陈旧期限返回None"""
+    entry = read_cache_entry(GLOBAL_CONFIG.books_info_file, 'books_info')
+    if entry is None:
+        return None
+    try:
+        books = []
+        for book_dict in entry.value or []:
+            # 处理docs字段
+            docs_data = book_dict.get('docs', [])
+            book_dict['docs'] = docs_data
+            books.append(BookItem(**book_dict))
+        entry.value = books
+        return entry
+    except Exception:
+        return None
 
-    if Path(books_info_file).exists():
-        try:
-            f = File()
-            data = f.read(books_info_file)
-            config_dict = json.loads(data)
 
-            # 检查是否过期
-            expire_time = config_dict.get('expire_time', 0)
-            if expire_time < gen_timestamp():
-                return None
-
-            books_info_list = config_dict.get('books_info', [])
-            books = []
-            for book_dict in books_info_list:
-                # 处理docs字段
-                docs_data = book_dict.get('docs', [])
-                book_dict['docs'] = docs_data
-                books.append(BookItem(**book_dict))
-            return books
-        except Exception:
-            return None
-    else:
+def get_cache_books_info(allow_stale: bool = False) -> Optional[List[BookItem]]:
+    """获取本地缓存的知识库信息，如果已过期就返回None
+
+    Args:
+        allow_stale: 为True时陈旧期限内的缓存也会返回
+    """
+    entry = get_books_cache_entry()
+    if entry is None or not (allow_stale or entry.is_fresh):
         return None
+    return entry.value
+
+
+def get_user_info_cache_entry() -> Optional[CacheEntry]:
+    """获取本地缓存的用户信息条目，超过陈旧期限或内容为空时返回None"""
+    entry = read_cache_entry(GLOBAL_CONFIG.user_info_file, 'user_info')
+    if entry is None or not entry.value:
+        return None
+    return entry
 
 
 def get_cache_user_info() -> Optional[YuqueLoginUserInfo]:
@@ -157,7 +210,10 @@ def get_cache_user_info() -> Optional[YuqueLoginUserInfo]:
             f = File()
             data = f.read(user_info_file)
             config_dict = json.loads(data)
-            cache_info = LocalCacheUserInfo(**config_dict)
+            cache_info = LocalCacheUserInfo(
+                expire_time=config_dict.get('expire_time', 0),
+                user_info=config_dict.get('user_info')
+            )
             return cache_info.user_info
         except Exception:
             return None
@@ -210,6 +266,11 @@ def save_cookies(cookies: str, expire_time: Optional[int] = None) -> bool:
         cookies: 要保存的cookies字符串
         expire_time: 可选的过期时间戳（毫秒），如果不提供则默认使用当前时间加上全局配置的过期时间
     """
+    global _cookie_override
+    if _cookie_override is not None:
+        # 使用进程内 Cookie 时只更新内存，不覆盖图形界面保存的登录信息
+        _cookie_override = sanitize_cookie_string(cookies)
+        return True
     try:
         f = File()
         if expire_time is None:
@@ -242,7 +303,7 @@ def save_user_info(user_info: dict) -> bool:
     try:
         f = File()
         cache_info = {
-            'expire_time': gen_timestamp() + GLOBAL_CONFIG.local_expire,
+            **gen_cache_times(),
             'user_info': user_info
         }
 
@@ -261,11 +322,11 @@ def save_books_info(books_info: List[dict]) -> bool:
     try:
         f = File()
         cache_info = {
-            'expire_time': gen_timestamp() + GLOBAL_CONFIG.local_expire,
+            **gen_cache_times(),
             'books_info': books_info
         }
 
-        f.write(GLOBAL_CONFIG.books_info_file, json.dumps(cache_info, ensure_ascii=False, indent=2))
+        f.write_atomic(GLOBAL_CONFIG.books_info_file, json.dumps(cache_info, ensure_ascii=False, indent=2))
         return True
     except Exception:
         return False
@@ -315,7 +376,7 @@ def save_docs_cache(namespace: str, docs: List[dict]) -> bool:
     try:
         f = File()
         cache_info = {
-            'expire_time': gen_timestamp() + GLOBAL_CONFIG.local_expire,
+            **gen_cache_times(),
             'docs': docs
         }
 
@@ -327,37 +388,79 @@ def save_docs_cache(namespace: str, docs: List[dict]) -> bool:
         # 创建文档缓存文件名，使用namespace作为文件名
         docs_cache_file = os.path.join(cache_dir, f"docs_{namespace.replace('/', '_')}.json")
 
-        f.write(docs_cache_file, json.dumps(cache_info, ensure_ascii=False, indent=2))
+        f.write_atomic(docs_cache_file, json.dumps(cache_info, ensure_ascii=False, indent=2))
         return True
     except Exception:
         return False
 
 
-def get_docs_cache(namespace: str) -> Optional[List[dict]]:
+def get_docs_cache_entry(namespace: str) -> Optional[CacheEntry]:
+    """获取本地缓存的文章列表条目，超过陈旧期限返回None
+
+    Args:
+        namespace: 知识库命名空间，用于生成缓存文件名
+    """
+    cache_dir = os.path.join(GLOBAL_CONFIG.meta_dir, "Article_list_caching")
+    docs_cache_file = os.path.join(cache_dir, f"docs_{namespace.replace('/', '_')}.json")
+    entry = read_cache_entry(docs_cache_file, 'docs')
+    if entry is not None and entry.value is None:
+        entry.value = []
+    return entry
+
+
+def get_docs_cache(namespace: str, allow_stale: bool = False) -> Optional[List[dict]]:
     """获取本地缓存的文章列表，如果已过期就返回None
     
     Args:
         namespace: 知识库命名空间，用于生成缓存文件名
+        allow_stale: 为True时陈旧期限内的缓存也会返回
     """
+    entry = get_docs_cache_entry(namespace)
+    if entry is None or not (allow_stale or entry.is_fresh):
+        return None
+    return entry.value
+
+
+def get_markdown_endpoints() -> Dict[str, str]:
+    """获取本地缓存的各知识库可用Markdown导出接口，如果已过期就返回空字典"""
     try:
         f = File()
-        cache_dir = os.path.join(GLOBAL_CONFIG.meta_dir, "Article_list_caching")
-        docs_cache_file = os.path.join(cache_dir, f"docs_{namespace.replace('/', '_')}.json")
+        endpoint_file = GLOBAL_CONFIG.markdown_endpoint_file
 
-        if f.exists(docs_cache_file):
-            data = f.read(docs_cache_file)
+        if f.exists(endpoint_file):
+            data = f.read(endpoint_file)
             cache_dict = json.loads(data)
 
             # 检查是否过期
             expire_time = cache_dict.get('expire_time', 0)
             if expire_time < gen_timestamp():
-                return None
+                return {}
 
-            return cache_dict.get('docs', [])
+            endpoints = cache_dict.get('endpoints', {})
+            return endpoints if isinstance(endpoints, dict) else {}
         else:
-            return None
+            return {}
     except Exception:
-        return None
+        return {}
+
+
+def save_markdown_endpoints(endpoints: Dict[str, str]) -> bool:
+    """保存各知识库可用的Markdown导出接口到本地
+
+    Args:
+        endpoints: 知识库命名空间到接口类型的映射
+    """
+    try:
+        f = File()
+        cache_info = {
+            'expire_time': gen_timestamp() + GLOBAL_CONFIG.local_expire,
+            'endpoints': endpoints
+        }
+
+        f.write_atomic(GLOBAL_CONFIG.markdown_endpoint_file, json.dumps(cache_info, ensure_ascii=False, indent=2))
+        return True
+    except Exception:
+        return False
 
 
 def clean_cache() -> bool:
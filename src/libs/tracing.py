@@ -0,0 +1,368 @@
+'''
+Author: Be1k0
+URL: https://github.com/Be1k0/YuQue-BdT
+'''
+
+import atexit
+import contextlib
+import contextvars
+import itertools
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+
+# 语雀接口路径模板，按顺序匹配，用于把具体地址归并成可统计的端点
+_ENDPOINT_PATTERNS: List[Tuple[re.Pattern, str]] = [
+    (re.compile(r"^/api/docs/\d+/export$"), "/api/docs/{id}/export"),
+    (re.compile(r"^/api/docs/[^/]+/[^/]+/[^/]+/markdown$"), "/api/docs/{login}/{book}/{slug}/markdown"),
+    (re.compile(r"^/api/docs/[^/]+$"), "/api/docs/{slug}"),
+    (re.compile(r"^/attachments/.+"), "/attachments/*"),
+    (re.compile(r"^/yuque/.+"), "/yuque/*"),
+    (re.compile(r"^/[^/]+/[^/]+/[^/]+/markdown$"), "/{login}/{book}/{slug}/markdown"),
+]
+_USER_PATH_PATTERNS: List[Tuple[re.Pattern, str]] = [
+    (re.compile(r"^/[^/]+/[^/]+/[^/]+$"), "/{login}/{book}/{slug}"),
+    (re.compile(r"^/[^/]+/[^/]+$"), "/{login}/{book}"),
+]
+_NUMERIC_SEGMENT_RE = re.compile(r"/\d+(?=/|$)")
+
+
+class Tracer:
+    """请求级耗时追踪器
+
+    通过 aiohttp TraceConfig 与 requests 响应钩子记录每个 HTTP 请求的端点模板、状态码、字节数与
+    排队/DNS/建连/首字节/响应体各阶段耗时，并通过 contextvars 关联当前导出的知识库与文档。
+    结果可导出为 JSON Lines 或 Chrome trace 格式 (chrome://tracing、Perfetto 可直接打开)。
+
+    设置环境变量 YUQUE_TRACE 为输出文件路径时自动启用，并在进程退出时写出
+    """
+
+    TRACE_ENV = "YUQUE_TRACE"  # 输出文件路径，.json 后缀为 Chrome trace，其余为 JSON Lines
+    MAX_SPANS = 200000  # 内存中保留的最大 span 数，超出后丢弃最早的记录
+
+    _enabled = False
+    _spans: Deque[Dict[str, Any]] = deque(maxlen=MAX_SPANS)
+    _lock = threading.Lock()
+    _origin = time.perf_counter()
+    _origin_wall = time.time()
+    _lane_counter = itertools.count(1)
+    _lane_names: Dict[int, str] = {}
+    _context: contextvars.ContextVar = contextvars.ContextVar("yuque_trace_context", default={})
+
+    @classmethod
+    def enable(cls, max_spans: Optional[int] = None) -> None:
+        """启用追踪并清空已有记录
+
+        Args:
+            max_spans: 内存中保留的最大 span 数
+        """
+        with cls._lock:
+            cls._spans = deque(maxlen=max_spans or cls.MAX_SPANS)
+            cls._lane_names = {}
+            cls._origin = time.perf_counter()
+            cls._origin_wall = time.time()
+        cls._enabled = True
+
+    @classmethod
+    def disable(cls) -> None:
+        """停止追踪，已有记录保留到下次 enable"""
+        cls._enabled = False
+
+    @classmethod
+    def enabled(cls) -> bool:
+        """是否正在追踪"""
+        return cls._enabled
+
+    @classmethod
+    def _now_ms(cls) -> float:
+        return (time.perf_counter() - cls._origin) * 1000
+
+    @classmethod
+    @contextlib.contextmanager
+    def bind(cls, **attrs: Any) -> Iterator[None]:
+        """在当前上下文中绑定知识库、文档等属性，期间产生的 span 都会带上这些属性
+
+        绑定了 doc 时会分配独立的时间线 (Chrome trace 中的 tid)，并发导出的文档互不重叠
+        """
+        if not cls._enabled:
+            yield
+            return
+
+        context = dict(cls._context.get())
+        context.update({k: v for k, v in attrs.items() if v not in (None, "")})
+        if attrs.get("doc"):
+            lane = next(cls._lane_counter)
+            context["lane"] = lane
+            cls._lane_names[lane] = f"{context.get('book', '')}/{attrs['doc']}".strip("/")
+        token = cls._context.set(context)
+        try:
+            yield
+        finally:
+            cls._context.reset(token)
+
+    @classmethod
+    def _new_span(cls, name: str, category: str, attrs: Dict[str, Any]) -> Dict[str, Any]:
+        context = cls._context.get()
+        span = {
+            "name": name,
+            "cat": category,
+            "start_ms": round(cls._now_ms(), 3),
+            "dur_ms": 0.0,
+            "lane": context.get("lane", 0),
+            "thread": threading.current_thread().name,
+        }
+        span.update({k: v for k, v in context.items() if k != "lane"})
+        span.update(attrs)
+        with cls._lock:
+            cls._spans.append(span)
+        return span
+
+    @classmethod
+    def _finish(cls, span: Dict[str, Any]) -> None:
+        span["dur_ms"] = round(cls._now_ms() - span["start_ms"], 3)
+
+    @classmethod
+    @contextlib.contextmanager
+    def span(cls, name: str, category: str = "stage", **attrs: Any) -> Iterator[Dict[str, Any]]:
+        """记录一段代码的耗时，返回的字典可用于补充字节数等属性
+
+        Args:
+            name: span 名称
+            category: 分类，如 stage、http、asset
+            **attrs: 附加属性
+        """
+        if not cls._enabled:
+            yield {}
+            return
+
+        current = cls._new_span(name, category, attrs)
+        try:
+            yield current
+        except BaseException as e:
+            current["error"] = type(e).__name__
+            raise
+        finally:
+            cls._finish(current)
+
+    @staticmethod
+    def endpoint_template(url: str) -> Tuple[str, str]:
+        """将请求地址归并为 (host, 端点模板)
+
+        Args:
+            url: 完整请求地址
+        """
+        parsed = urlparse(str(url))
+        path = parsed.path or "/"
+        for pattern, template in _ENDPOINT_PATTERNS:
+            if pattern.match(path):
+                return parsed.netloc, template
+        if path.startswith("/api/"):
+            return parsed.netloc, _NUMERIC_SEGMENT_RE.sub("/{id}", path)
+        for pattern, template in _USER_PATH_PATTERNS:
+            if pattern.match(path):
+                return parsed.netloc, template
+        return parsed.netloc, _NUMERIC_SEGMENT_RE.sub("/{id}", path)
+
+    @classmethod
+    def _http_span(cls, method: str, url: Any) -> Dict[str, Any]:
+        host, endpoint = cls.endpoint_template(str(url))
+        return cls._new_span(
+            f"{method} {endpoint}", "http",
+            {"method": method, "host": host, "endpoint": endpoint, "status": 0,
+             "bytes_in": 0, "bytes_out": 0, "phases": {}},
+        )
+
+    # ---------- aiohttp ----------
+
+    @classmethod
+    def trace_configs(cls) -> List[Any]:
+        """返回创建 aiohttp ClientSession 时使用的 trace_configs，未启用追踪时钩子直接返回"""
+        import aiohttp
+
+        config = aiohttp.TraceConfig(trace_config_ctx_factory=lambda trace_request_ctx=None: SimpleNamespace(span=None, marks={}))
+        config.on_request_start.append(cls._on_request_start)
+        config.on_connection_queued_start.append(cls._mark("queue_start"))
+        config.on_connection_queued_end.append(cls._mark("queue_end"))
+        config.on_dns_resolvehost_start.append(cls._mark("dns_start"))
+        config.on_dns_resolvehost_end.append(cls._mark("dns_end"))
+        config.on_connection_create_start.append(cls._mark("connect_start"))
+        config.on_connection_create_end.append(cls._mark("connect_end"))
+        if hasattr(config, "on_request_headers_sent"):
+            config.on_request_headers_sent.append(cls._mark("headers_sent"))
+        config.on_request_chunk_sent.append(cls._on_request_chunk_sent)
+        config.on_request_end.append(cls._on_request_end)
+        config.on_response_chunk_received.append(cls._on_response_chunk_received)
+        config.on_request_exception.append(cls._on_request_exception)
+        return [config]
+
+    @classmethod
+    def _mark(cls, name: str):
+        async def handler(session, ctx, params):
+            if ctx.span is not None:
+                ctx.marks[name] = cls._now_ms()
+        return handler
+
+    @classmethod
+    async def _on_request_start(cls, session, ctx, params) -> None:
+        if cls._enabled:
+            ctx.span = cls._http_span(params.method, params.url)
+
+    @classmethod
+    async def _on_request_chunk_sent(cls, session, ctx, params) -> None:
+        if ctx.span is not None:
+            ctx.span["bytes_out"] += len(params.chunk or b"")
+
+    @classmethod
+    async def _on_request_end(cls, session, ctx, params) -> None:
+        span = ctx.span
+        if span is None:
+            return
+        now = cls._now_ms()
+        span["status"] = params.response.status
+        marks = ctx.marks
+        phases = span["phases"]
+        for phase, start_key, end_key in (
+            ("queue", "queue_start", "queue_end"),
+            ("dns", "dns_start", "dns_end"),
+            ("connect", "connect_start", "connect_end"),
+        ):
+            if start_key in marks and end_key in marks:
+                phases[phase] = round(marks[end_key] - marks[start_key], 3)
+        request_sent = marks.get("headers_sent") or marks.get("connect_end") or marks.get("queue_end") or span["start_ms"]
+        phases["ttfb"] = round(now - request_sent, 3)
+        marks["response_start"] = now
+        span["dur_ms"] = round(now - span["start_ms"], 3)
+
+    @classmethod
+    async def _on_response_chunk_received(cls, session, ctx, params) -> None:
+        span = ctx.span
+        if span is None:
+            return
+        now = cls._now_ms()
+        span["bytes_in"] += len(params.chunk or b"")
+        span["phases"]["body"] = round(now - ctx.marks.get("response_start", now), 3)
+        span["dur_ms"] = round(now - span["start_ms"], 3)
+
+    @classmethod
+    async def _on_request_exception(cls, session, ctx, params) -> None:
+        span = ctx.span
+        if span is None:
+            return
+        span["error"] = type(params.exception).__name__
+        cls._finish(span)
+
+    # ---------- requests ----------
+
+    @classmethod
+    def install_requests_hooks(cls, session: Any) -> None:
+        """为 requests.Session 安装响应钩子
+
+        requests 只提供响应钩子，span 从发送请求到收到响应头 (response.elapsed)，
+        流式下载的响应体耗时由调用方用 Tracer.span 另行记录
+        """
+        session.hooks.setdefault("response", []).append(cls._requests_response_hook)
+
+    @classmethod
+    def _requests_response_hook(cls, response: Any, *args: Any, **kwargs: Any) -> Any:
+        if not cls._enabled:
+            return response
+        elapsed_ms = response.elapsed.total_seconds() * 1000
+        span = cls._http_span(response.request.method, response.url)
+        span["start_ms"] = round(span["start_ms"] - elapsed_ms, 3)
+        span["dur_ms"] = round(elapsed_ms, 3)
+        span["status"] = response.status_code
+        span["bytes_in"] = int(response.headers.get("Content-Length", 0) or 0)
+        body = response.request.body
+        span["bytes_out"] = len(body) if isinstance(body, (bytes, str)) else 0
+        span["phases"]["ttfb"] = span["dur_ms"]
+        return response
+
+    # ---------- 导出 ----------
+
+    @classmethod
+    def snapshot(cls) -> List[Dict[str, Any]]:
+        """返回当前记录的所有 span (按开始时间排序)"""
+        with cls._lock:
+            spans = [dict(span) for span in cls._spans]
+        spans.sort(key=lambda s: s["start_ms"])
+        return spans
+
+    @classmethod
+    def export_jsonl(cls, path: str) -> str:
+        """以 JSON Lines 格式写出，每行一个 span"""
+        with open(path, 'w', encoding='utf-8') as f:
+            for span in cls.snapshot():
+                f.write(json.dumps(span, ensure_ascii=False, default=str) + "\n")
+        return path
+
+    @classmethod
+    def export_chrome(cls, path: str) -> str:
+        """以 Chrome trace 格式写出，HTTP 各阶段作为子事件嵌套在请求事件下"""
+        pid = os.getpid()
+        events: List[Dict[str, Any]] = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": "main"}},
+        ]
+        for lane, name in sorted(cls._lane_names.items()):
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": lane, "args": {"name": name}})
+
+        for span in cls.snapshot():
+            args = {k: v for k, v in span.items() if k not in ("name", "cat", "start_ms", "dur_ms", "lane", "phases")}
+            ts = span["start_ms"] * 1000
+            events.append({
+                "name": span["name"], "cat": span["cat"], "ph": "X", "pid": pid, "tid": span["lane"],
+                "ts": ts, "dur": span["dur_ms"] * 1000, "args": args,
+            })
+            # 按实际发生顺序依次排布各阶段
+            offset = ts
+            for phase in ("queue", "dns", "connect", "ttfb", "body"):
+                duration = span.get("phases", {}).get(phase)
+                if not duration:
+                    continue
+                events.append({
+                    "name": phase, "cat": "phase", "ph": "X", "pid": pid, "tid": span["lane"],
+                    "ts": offset, "dur": duration * 1000,
+                })
+                offset += duration * 1000
+
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "traceEvents": events,
+                "displayTimeUnit": "ms",
+                "otherData": {"origin_wall": cls._origin_wall},
+            }, f, ensure_ascii=False, default=str)
+        return path
+
+    @classmethod
+    def dump(cls, path: Optional[str] = None, fmt: Optional[str] = None) -> Optional[str]:
+        """写出追踪结果并返回文件路径
+
+        Args:
+            path: 输出路径，为空时写入 debug_logs/trace_<时间>.json
+            fmt: jsonl 或 chrome，为空时根据后缀判断
+        """
+        if not path:
+            log_dir = os.path.join(os.getcwd(), "debug_logs")
+            os.makedirs(log_dir, exist_ok=True)
+            path = os.path.join(log_dir, f"trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        fmt = fmt or ("chrome" if path.lower().endswith(".json") else "jsonl")
+        try:
+            parent = os.path.dirname(os.path.abspath(path))
+            os.makedirs(parent, exist_ok=True)
+            if fmt == "chrome":
+                return cls.export_chrome(path)
+            return cls.export_jsonl(path)
+        except OSError:
+            return None
+
+
+if os.environ.get(Tracer.TRACE_ENV):
+    Tracer.enable()
+    atexit.register(Tracer.dump, os.environ[Tracer.TRACE_ENV])
@@ -3,5 +3,5 @@ Author: Be1k0
 URL: https://github.com/Be1k0/YuQue-BdT
 '''
 
-from .ui_utils import static_resource_path, StdoutRedirector, QPasswordLineEdit, resource_path, create_circular_pixmap, LogSignalHandler
+from .ui_utils import static_resource_path, StdoutRedirector, QPasswordLineEdit, resource_path, create_circular_pixmap, LogSignalHandler, BufferedLogSink, ProgressPublisher, Debouncer, apply_visible_mask
 from .async_worker import AsyncWorker
\ No newline at end of file
@@ -3,11 +3,15 @@ Author: Be1k0
 URL: https://github.com/Be1k0/YuQue-BdT
 '''
 
+import os
 import sys
+import threading
+import time
+from collections import deque
 from io import StringIO
-from PyQt6.QtCore import Qt, pyqtSignal, QMetaObject, Q_ARG, QObject, QSize, QRect, QPoint
-from PyQt6.QtGui import QPixmap, QPainter, QPainterPath
-from PyQt6.QtWidgets import QLayout, QLineEdit, QApplication
+from PyQt6.QtCore import Qt, pyqtSignal, QObject, QSize, QRect, QPoint, QTimer
+from PyQt6.QtGui import QPixmap, QPainter, QPainterPath, QColor, QTextCharFormat, QTextCursor
+from PyQt6.QtWidgets import QLayout, QLineEdit
 from src.libs.path_utils import get_resource_path, get_bundled_resource_path
     
 def resource_path(relative_path):
@@ -176,17 +180,17 @@ class FlowLayout(QLayout):
 
 
 class StdoutRedirector(StringIO):
-    """重定向stdout和stderr到GUI文本框的类"""
-    def __init__(self, text_widget, disable_terminal_output=True):
+    """重定向stdout和stderr到GUI日志缓冲区的类"""
+    def __init__(self, sink, disable_terminal_output=True):
         super().__init__()
-        self.text_widget = text_widget
+        self.sink = sink
         self.old_stdout = sys.stdout
         self.old_stderr = sys.stderr
         self.buffer = ""
         self.disable_terminal_output = disable_terminal_output
 
     def write(self, text):
-        """重写write方法，将输出文本添加到缓冲区并刷新文本框
+        """重写write方法，将输出文本添加到缓冲区并按行交给日志缓冲区
         
          Args:
             text: 要写入的文本
@@ -201,19 +205,242 @@ class StdoutRedirector(StringIO):
             self.flush()
 
     def flush(self):
-        """刷新缓冲区，将缓冲区内容写入文本框"""
+        """刷新缓冲区，将缓冲区内容写入日志缓冲区"""
         if self.buffer:
-            if QApplication.instance():
-                QMetaObject.invokeMethod(
-                    self.text_widget,
-                    "append",
-                    Qt.ConnectionType.QueuedConnection,
-                    Q_ARG(str, self.buffer)
-                )
+            for line in self.buffer.rstrip('\n').split('\n'):
+                self.sink.push(line, timestamp=False)
             self.buffer = ""
         if not self.disable_terminal_output and hasattr(self.old_stdout, 'flush'):
             self.old_stdout.flush()
 
+
+class BufferedLogSink(QObject):
+    """批量写入 GUI 日志面板的缓冲区
+
+    任意线程都可以调用 push 写入日志，消息先进入内存队列，
+    由 GUI 线程上的定时器按固定间隔批量刷新到 QPlainTextEdit，
+    完整日志同时追加写入磁盘文件，控件只保留最近 maximumBlockCount 行。
+    """
+    FLUSH_INTERVAL_MS = 100  # 刷新间隔
+    MAX_PENDING = 50000  # 两次刷新之间最多积压的行数，超出后丢弃最旧的行
+
+    # 按关键字匹配日志级别颜色，顺序即优先级，适合深色背景(#1e1e1e)
+    LEVEL_COLORS = (
+        (("错误",), '#ff6b6b'),  # 亮红色
+        (("成功", "完成"), '#51cf66'),  # 亮绿色
+        (("警告",), '#fcc419'),  # 亮黄色
+        (("调试",), '#adb5bd'),  # 灰色
+        (("加载", "准备"), '#339af0'),  # 亮蓝色
+        (("导出",), '#4dabf7'),  # 浅蓝色
+    )
+    DEFAULT_COLOR = '#f8f9fa'  # 默认白色
+
+    def __init__(self, widget, log_file=None, interval_ms=None, parent=None):
+        """
+        Args:
+            widget: 显示日志的 QPlainTextEdit
+            log_file: 完整日志文件路径，为空时不落盘
+            interval_ms: 刷新间隔 (毫秒)
+            parent: 父对象
+        """
+        super().__init__(parent)
+        self.widget = widget
+        self._pending = deque(maxlen=self.MAX_PENDING)
+        self._lock = threading.Lock()
+        self._formats = [(keywords, self._make_format(color)) for keywords, color in self.LEVEL_COLORS]
+        self._default_format = self._make_format(self.DEFAULT_COLOR)
+
+        self.log_file = log_file
+        self._file = None
+        if log_file:
+            try:
+                os.makedirs(os.path.dirname(log_file), exist_ok=True)
+                self._file = open(log_file, 'a', encoding='utf-8')
+            except OSError:
+                self._file = None
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(interval_ms or self.FLUSH_INTERVAL_MS)
+        self._timer.timeout.connect(self.flush)
+        self._timer.start()
+
+    @staticmethod
+    def _make_format(color):
+        fmt = QTextCharFormat()
+        fmt.setForeground(QColor(color))
+        return fmt
+
+    def _format_for(self, line):
+        """根据日志内容选择预先构建好的文本格式"""
+        for keywords, fmt in self._formats:
+            for keyword in keywords:
+                if keyword in line:
+                    return fmt
+        return self._default_format
+
+    def push(self, text, timestamp=True):
+        """写入一行日志，线程安全
+
+        Args:
+            text: 日志内容
+            timestamp: 是否添加时间戳前缀
+        """
+        if timestamp:
+            text = f"[{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime())}] {text}"
+        with self._lock:
+            self._pending.append(text)
+
+    def _drain(self):
+        with self._lock:
+            lines = list(self._pending)
+            self._pending.clear()
+        return lines
+
+    def flush(self):
+        """将积压的日志批量写入磁盘和日志控件，只能在 GUI 线程调用"""
+        lines = self._drain()
+        if not lines:
+            return
+
+        if self._file:
+            try:
+                self._file.write('\n'.join(lines) + '\n')
+                self._file.flush()
+            except (OSError, ValueError):
+                pass
+
+        # 超过控件可保留行数的部分反正会被立刻丢弃，不再插入控件
+        limit = self.widget.maximumBlockCount() or self.MAX_PENDING
+        if len(lines) > limit:
+            lines = lines[-limit:]
+
+        scrollbar = self.widget.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum() - 4
+
+        cursor = QTextCursor(self.widget.document())
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        cursor.beginEditBlock()
+        first = self.widget.document().isEmpty()
+        for line in lines:
+            if not first:
+                cursor.insertBlock()
+            first = False
+            cursor.insertText(line, self._format_for(line))
+        cursor.endEditBlock()
+
+        if at_bottom:
+            scrollbar.setValue(scrollbar.maximum())
+
+    def read_full_log(self):
+        """读取磁盘上的完整日志，未落盘时返回控件中的内容"""
+        self.flush()
+        if self.log_file and os.path.exists(self.log_file):
+            with open(self.log_file, 'r', encoding='utf-8', errors='replace') as f:
+                return f.read()
+        return self.widget.toPlainText()
+
+    def close(self):
+        """停止定时器，刷新剩余日志并关闭日志文件"""
+        self._timer.stop()
+        self.flush()
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+class ProgressPublisher(QObject):
+    """按固定帧率发布进度快照
+
+    定时读取进度聚合器 (ProgressAggregator)，只有进度发生变化时才发射 snapshot_ready，
+    界面更新次数只取决于帧率，与文档或资源完成的速度无关。
+    """
+    snapshot_ready = pyqtSignal(object)
+    FRAME_INTERVAL_MS = 100  # 默认 10 帧/秒
+
+    def __init__(self, aggregator, interval_ms=None, parent=None):
+        """
+        Args:
+            aggregator: 进度聚合器
+            interval_ms: 发布间隔 (毫秒)
+            parent: 父对象
+        """
+        super().__init__(parent)
+        self.aggregator = aggregator
+        self._last_version = None
+        self._timer = QTimer(self)
+        self._timer.setInterval(interval_ms or self.FRAME_INTERVAL_MS)
+        self._timer.timeout.connect(self.publish)
+
+    def start(self):
+        """开始按帧率发布"""
+        self._last_version = None
+        self._timer.start()
+
+    def stop(self):
+        """停止发布，并补发最后一帧"""
+        self._timer.stop()
+        self.publish()
+
+    def publish(self):
+        """进度有变化时发射一帧快照"""
+        snapshot = self.aggregator.snapshot()
+        if snapshot.version == self._last_version:
+            return
+        self._last_version = snapshot.version
+        self.snapshot_ready.emit(snapshot)
+
+
+def apply_visible_mask(items, mask, previous=None):
+    """按可见掩码设置列表项的隐藏状态，只修改与上一次状态不同的项
+
+    Args:
+        items: QListWidgetItem / QTreeWidgetItem 列表，与掩码一一对应
+        mask: 可见掩码，None 表示全部可见
+        previous: 上一次应用的掩码，None 表示全部可见
+
+    Returns:
+        本次应用的掩码
+    """
+    for i, item in enumerate(items):
+        visible = mask is None or mask[i]
+        was_visible = previous is None or previous[i]
+        if visible != was_visible:
+            item.setHidden(not visible)
+    return mask
+
+
+class Debouncer(QObject):
+    """输入防抖
+
+    连续调用 trigger 时只在最后一次调用后 delay_ms 毫秒执行一次回调，
+    用于搜索框等高频输入。
+    """
+    DEFAULT_DELAY_MS = 150
+
+    def __init__(self, callback, delay_ms=None, parent=None):
+        """
+        Args:
+            callback: 回调函数，参数为最后一次 trigger 的参数
+            delay_ms: 延迟 (毫秒)
+            parent: 父对象
+        """
+        super().__init__(parent)
+        self.callback = callback
+        self._args = ()
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(self.DEFAULT_DELAY_MS if delay_ms is None else delay_ms)
+        self._timer.timeout.connect(self._fire)
+
+    def trigger(self, *args):
+        """记录参数并重新计时"""
+        self._args = args
+        self._timer.start()
+
+    def _fire(self):
+        self.callback(*self._args)
+
+
 class QPasswordLineEdit(QLineEdit):
     """自定义密码输入框类"""
     def __init__(self, parent=None):
@@ -226,13 +453,26 @@ class LogSignalHandler(QObject):
     """日志信号处理器类，用于处理和发射日志信号和进度信号"""
     log_signal = pyqtSignal(str)
     progress_signal = pyqtSignal(int, int)
+
+    def __init__(self, sink=None, parent=None):
+        """
+        Args:
+            sink: 日志缓冲区 (BufferedLogSink)，设置后日志直接写入缓冲区而不再逐条发射信号
+            parent: 父对象
+        """
+        super().__init__(parent)
+        self.sink = sink
+
     def emit_log(self, message):
-        """发射日志信号，并检查是否包含下载进度消息
+        """写入日志 (或发射日志信号)，并检查是否包含下载进度消息
         
          Args:
             message: 日志消息
         """
-        self.log_signal.emit(message)
+        if self.sink is not None:
+            self.sink.push(message)
+        else:
+            self.log_signal.emit(message)
 
         # 检查文档下载进度消息
         if "下载文档" in message and "/" in message and ")" in message: